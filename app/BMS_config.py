@@ -88,6 +88,7 @@ MUSIC_FOLDER    = os.path.join(BASE, "music")
 VIDEO_FOLDER    = os.path.join(BASE, "video")
 UPLOAD_FOLDER   = os.path.join(BASE, "upload")
 DOWNLOADS_FOLDER   = os.path.join(BASE, "downloads")
+CACHE_FOLDER    = os.path.join(BASE, "cache")
 
 DB_PATH = os.path.join(DB_FOLDER, "users.db")
 LOG_PATH = os.path.join(LOG_FOLDER, "system.log")
@@ -100,7 +101,7 @@ for folder in [
     BASE, DB_FOLDER, LOG_FOLDER,
     PICTURES_FOLDER, MUSIC_FOLDER,
     VIDEO_FOLDER, UPLOAD_FOLDER,
-    DOWNLOADS_FOLDER
+    DOWNLOADS_FOLDER, CACHE_FOLDER
 ]:
     try:
         os.makedirs(folder, exist_ok=True)
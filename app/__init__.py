@@ -15,9 +15,21 @@ from app.database.BMS_auto_repair import (
     ensure_mp3_tables
 )
 
+# Pool koneksi SQLite bersama
+from app.database.BMS_db_pool import release_connections
+
 # Register Blueprint (BMS ROUTES INITIALIZER)
 from app.routes import register_blueprints
 
+# Worker pool job background (scan, thumbnail, download)
+from app.routes.BMS_jobs.jobs_queue import start_workers
+
+# Sweeper session upload kedaluwarsa
+from app.routes.BMS_upload.upload_cleanup import start_sweeper
+
+# Watcher pustaka MP3 / video (inotify / polling)
+from app.routes.BMS_library.library_watcher import start_watcher
+
 # Register WebSocket (update system)
 from app.routes.BMS_update import register_ws
 
@@ -59,6 +71,9 @@ def create_app():
     # Inisialisasi Database
     init_database()
 
+    # Batalkan transaksi menggantung di akhir setiap request
+    app.teardown_appcontext(release_connections)
+
     # CORS
     CORS(app, resources={r"/*": {"origins": "*"}})
 
@@ -67,6 +82,13 @@ def create_app():
     # ================================
     register_blueprints(app)
 
+    # ================================
+    # JOB WORKER (BACKGROUND)
+    # ================================
+    start_workers()
+    start_sweeper()
+    start_watcher()
+
     # ================================
     # REGISTER WEBSOCKET
     # ================================
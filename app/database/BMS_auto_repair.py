@@ -1,5 +1,5 @@
-import sqlite3
 from app.BMS_config import DB_PATH
+from app.database.BMS_db_pool import get_connection
 
 # ================================================================================
 #   BMS AUTO REPAIR — FINAL VERSION (USERS + MP3 + VIDEO)
@@ -18,7 +18,7 @@ from app.BMS_config import DB_PATH
 # 1. USERS TABLE + AUTO MIGRASI password → password_hash
 # ================================================================================
 def ensure_users_table():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cur = conn.cursor()
 
     # Tabel dasar jika belum ada
@@ -78,7 +78,7 @@ def ensure_users_table():
 # 2. CREATE ROOT USER (jika tidak ada)
 # ================================================================================
 def ensure_root_user():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cur = conn.cursor()
 
     cur.execute("SELECT id FROM users WHERE username='root'")
@@ -107,7 +107,7 @@ def ensure_root_user():
 # ================================================================================
 
 def ensure_folders_table():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cur = conn.cursor()
 
     cur.execute("""
@@ -148,7 +148,7 @@ def ensure_folders_table():
 # ================================================================================
 
 def ensure_videos_table():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cur = conn.cursor()
 
     # Cek apakah filepath masih UNIQUE
@@ -196,7 +196,7 @@ def ensure_videos_table():
 # 5. MP3 — TABLE mp3_folders
 # ================================================================================
 def ensure_mp3_tables():
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cur = conn.cursor()
 
     print("[DB FIX] Memeriksa tabel MP3...")
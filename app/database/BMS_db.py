@@ -1,6 +1,8 @@
 import sqlite3
 import os
 
+from app.database.BMS_db_pool import get_connection
+
 # =====================================================
 #  PENGATURAN PATH DATABASE
 # =====================================================
@@ -12,10 +14,8 @@ DB_PATH = os.path.join(BASE_DIR, "bms.db")
 #  KONEKSI DATABASE
 # =====================================================
 def BMS_db_connect():
-    """Membuat koneksi SQLite dengan row dict-like."""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Koneksi SQLite (pool bersama) dengan row dict-like."""
+    return get_connection(DB_PATH)
 
 
 # =====================================================
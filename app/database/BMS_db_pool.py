@@ -0,0 +1,143 @@
+# =====================================================
+#  BMS DB POOL — Koneksi SQLite bersama (per-thread)
+#
+#  ✔ 1 koneksi per (thread, file DB) per proses
+#  ✔ WAL + synchronous=NORMAL + busy_timeout diset 1x
+#  ✔ Aman setelah fork (gunicorn worker)
+#  ✔ conn.close() lama tetap aman → hanya rollback
+#  ✔ Koneksi ditutup otomatis saat thread selesai
+#  ✔ Context manager transaksi: with transaction() as conn
+# =====================================================
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from app.BMS_config import DB_PATH
+
+# Waktu tunggu lock (ms) sebelum "database is locked"
+BUSY_TIMEOUT_MS = 10000
+
+# Cache halaman SQLite (KB, nilai negatif = kibibyte)
+CACHE_SIZE_KB = 8192
+
+# Penyimpanan koneksi per-thread
+_local = threading.local()
+
+
+# =====================================================
+#  KONEKSI POOL
+# =====================================================
+class BMSConnection(sqlite3.Connection):
+    """
+    Koneksi SQLite yang dipakai ulang.
+    close() tidak menutup koneksi fisik, hanya membatalkan
+    transaksi yang belum di-commit (perilaku sama seperti close asli).
+    """
+
+    def close(self):
+        try:
+            if self.in_transaction:
+                self.rollback()
+        except sqlite3.ProgrammingError:
+            pass
+
+
+def _open_connection(path, detect_types):
+    conn = sqlite3.connect(
+        path,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        detect_types=detect_types,
+        factory=BMSConnection
+    )
+
+    # PRAGMA dasar (sekali per koneksi)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+    return conn
+
+
+def _thread_connections():
+    """
+    Dict koneksi milik thread aktif.
+    Direset jika proses berganti (fork gunicorn).
+    """
+    pid = os.getpid()
+    if getattr(_local, "pid", None) != pid:
+        _local.pid = pid
+        _local.conns = {}
+    return _local.conns
+
+
+def get_connection(path=DB_PATH, detect_types=0, name="default"):
+    """
+    Ambil koneksi SQLite milik thread ini (dibuat jika belum ada).
+    Row factory selalu sqlite3.Row.
+
+    name: koneksi terpisah dalam thread yang sama, agar commit satu
+          modul tidak ikut meng-commit transaksi modul lain.
+          Tetap 1 lock tulis per file: selama koneksi lain di thread ini
+          masih menulis, koneksi bernama tidak bisa menulis
+          (lihat thread_in_transaction).
+    """
+    conns = _thread_connections()
+    key = (path, detect_types, name)
+
+    conn = conns.get(key)
+    if conn is None:
+        conn = _open_connection(path, detect_types)
+        conns[key] = conn
+
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def thread_in_transaction(exclude=None):
+    """
+    True jika koneksi lain milik thread ini (selain exclude) masih punya
+    transaksi terbuka. Koneksi bernama tetap koneksi terpisah ke file yang
+    sama: menulis dari sana saat transaksi itu terbuka akan menunggu
+    lock tulis yang dipegang thread ini sendiri (busy_timeout → locked).
+    """
+    return any(
+        conn is not exclude and conn.in_transaction
+        for conn in _thread_connections().values()
+    )
+
+
+# =====================================================
+#  CONTEXT MANAGER TRANSAKSI
+# =====================================================
+@contextmanager
+def transaction(path=DB_PATH):
+    """
+    Gunakan:
+        with transaction() as conn:
+            conn.execute(...)
+    Commit otomatis jika sukses, rollback jika error.
+    """
+    conn = get_connection(path)
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+# =====================================================
+#  CLEANUP
+# =====================================================
+def release_connections(exc=None):
+    """
+    Dipanggil di akhir request (teardown_appcontext).
+    Pastikan tidak ada transaksi menggantung yang menahan lock tulis.
+    """
+    for conn in _thread_connections().values():
+        conn.close()
+
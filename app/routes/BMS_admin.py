@@ -4,7 +4,7 @@ from app.BMS_config import (
     DB_PATH, PICTURES_FOLDER, MUSIC_FOLDER,
     VIDEO_FOLDER, UPLOAD_FOLDER
 )
-import sqlite3
+from app.database.BMS_db_pool import get_connection
 import os
 import shutil
 
@@ -15,9 +15,7 @@ admin = Blueprint("admin", __name__, url_prefix="/admin")
 #  DATABASE HANDLER
 # ============================================================
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(DB_PATH)
 
 
 # ============================================================
@@ -1,20 +1,22 @@
 import sqlite3
 from app.BMS_config import DB_PATH
+from app.database.BMS_db_pool import get_connection
 
 def get_db():
     """
-    Membuat dan mengembalikan koneksi database SQLite dengan konfigurasi optimal.
+    Mengembalikan koneksi database SQLite dari pool bersama (WAL, per-thread).
     
-    Fungsi ini membuat koneksi ke database SQLite menggunakan path dari konfigurasi.
+    Fungsi ini mengambil koneksi ke database SQLite menggunakan path dari konfigurasi.
     Menggunakan PARSE_DECLTYPES dan PARSE_COLNAMES untuk konversi tipe data otomatis,
     dan mengatur row_factory ke sqlite3.Row agar hasil query bisa diakses seperti dictionary.
     
     Returns:
         sqlite3.Connection: Objek koneksi database yang sudah dikonfigurasi
     """
-    conn = sqlite3.connect(DB_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(
+        DB_PATH,
+        detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES
+    )
 
 def ensure_auth_tables():
     """
@@ -0,0 +1,76 @@
+# ============================================================
+#   BMS – DISK CACHE (LRU berbasis atime)
+#   Dipakai bersama oleh transcode MP3 & segmen HLS video
+#
+#   ✔ touch() → tandai dipakai lewat atime (mtime tetap → ETag tetap)
+#   ✔ evict_lru() → hapus file paling lama tidak dipakai sampai
+#     total ukuran folder <= batas
+#   ✔ File .tmp (sedang ditulis) tidak pernah dihapus
+# ============================================================
+
+import os
+import time
+import threading
+
+_evict_lock = threading.Lock()
+
+
+def touch(path):
+    """
+    Tandai file cache dipakai: atime saja (mtime tetap → ETag tetap).
+    """
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def folder_size(folder, exts=None):
+    """
+    Total ukuran file cache di folder (rekursif).
+    """
+    return sum(size for _, size, _ in _entries(folder, exts))
+
+
+def _entries(folder, exts):
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith(".tmp"):
+                continue
+            if exts and not name.endswith(exts):
+                continue
+            path = os.path.join(root, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield st.st_atime, st.st_size, path
+
+
+def evict_lru(folder, max_bytes, exts=None, keep=None):
+    """
+    Hapus file dengan atime tertua sampai total <= max_bytes.
+    exts : tuple ekstensi yang boleh dihapus (None = semua).
+    keep : path yang tidak boleh dihapus (file yang baru saja dibuat).
+
+    Return (jumlah dihapus, total sisa bytes)
+    """
+    with _evict_lock:
+        entries = list(_entries(folder, exts))
+        total = sum(size for _, size, _ in entries)
+
+        removed = 0
+        if total > max_bytes:
+            for _, size, path in sorted(entries):
+                if total <= max_bytes:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+
+        return removed, total
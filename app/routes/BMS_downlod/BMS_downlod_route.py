@@ -6,11 +6,12 @@
 from flask import Blueprint,render_template, request,session,jsonify
 from app.routes.BMS_utils import require_root
 from app.routes.BMS_downlod.downloader import unduh_video
-from app.routes.BMS_downlod.file_helper import bersihkan_nama_file
+from app.routes.BMS_downlod.file_helper import bersihkan_nama_file, pakai_file_lama
 from app.routes.BMS_downlod.utils_info import ambil_info_video
 
 from app.routes.BMS_downlod.db import (
     get_db,
+    cari_download,
     ambil_semua_download
 )
 
@@ -19,6 +20,8 @@ from app.routes.BMS_downlod.progress_store import (
     get_task
 )
 
+from app.routes.BMS_jobs.jobs_queue import register_handler, JobCancelled
+
 from app.routes.BMS_downlod.maintenance import (
     cleanup_file_lama,
     hapus_download_id,
@@ -47,6 +50,52 @@ def status():
         "mode": "development"
     })
 
+# ============================================================
+# JOB HANDLER (dijalankan worker BMS_jobs, bukan di request)
+# ============================================================
+
+@register_handler("download.video")
+def job_download_video(ctx, payload):
+    hasil = unduh_video(payload["url"], payload.get("resolusi", 720), task_id=ctx.job_id)
+    if not hasil:
+        raise JobCancelled()
+    return {"tipe": "video", "file": hasil}
+
+
+@register_handler("download.audio")
+def job_download_audio(ctx, payload):
+    # 🔥 LAZY IMPORT (memutus circular import)
+    from app.routes.BMS_downlod.audio import download_mp3
+
+    url = payload["url"]
+
+    # URL yang sama sudah pernah diunduh & file masih ada → lewati
+    lama = cari_download("audio", url)
+    if lama:
+        return {"tipe": "audio", "file": lama, "dilewati": True}
+
+    info = ambil_info_video(url)
+    title = bersihkan_nama_file(info.get("title", "audio"))
+
+    hasil = download_mp3(url, title, task_id=ctx.job_id)
+
+    # Isi identik sudah tersimpan (mis. hasil upload) → pakai file lama
+    hasil = pakai_file_lama(hasil)
+
+    db = get_db()
+    db.execute(
+        """
+        INSERT INTO downloads (tipe, title, file_path, source_url)
+        VALUES (?,?,?,?)
+        """,
+        ("audio", title, hasil, url)
+    )
+    db.commit()
+    db.close()
+
+    return {"tipe": "audio", "file": hasil}
+
+
 # ============================================================
 # ROUTE: DOWNLOAD VIDEO (MP4)
 # ============================================================
@@ -61,29 +110,17 @@ def download_video_route():
     if not url:
         return jsonify({"error": "URL wajib diisi"}), 400
 
-    task_id = buat_task()
-
-    try:
-        hasil = unduh_video(url, resolusi, task_id=task_id)
-        if not hasil:
-            return jsonify({
-                "status": "dibatalkan",
-                "task_id": task_id
-            }), 200
-
-        return jsonify({
-            "status": "sukses",
-            "tipe": "video",
-            "task_id": task_id,
-            "file": hasil
-        })
+    task_id = buat_task(
+        "download.video",
+        {"url": url, "resolusi": resolusi},
+        owner=str(session.get("user_id"))
+    )
 
-    except Exception as e:
-        return jsonify({
-            "status": "gagal",
-            "task_id": task_id,
-            "error": str(e)
-        }), 500
+    return jsonify({
+        "status": "antri",
+        "tipe": "video",
+        "task_id": task_id
+    }), 202
 
 # ============================================================
 # ROUTE: DOWNLOAD AUDIO (MP3)
@@ -91,47 +128,23 @@ def download_video_route():
 
 @BMS_downlod_bp.route("/audio", methods=["POST"])
 def download_audio_route():
-    # 🔥 LAZY IMPORT (memutus circular import)
-    from app.routes.BMS_downlod.audio import download_mp3
-
     data = request.get_json(silent=True) or {}
     url = data.get("url")
 
     if not url:
         return jsonify({"error": "URL wajib diisi"}), 400
 
-    task_id = buat_task()
+    task_id = buat_task(
+        "download.audio",
+        {"url": url},
+        owner=str(session.get("user_id"))
+    )
 
-    try:
-        info = ambil_info_video(url)
-        title = bersihkan_nama_file(info.get("title", "audio"))
-
-        hasil = download_mp3(url, title, task_id=task_id)
-
-        db = get_db()
-        db.execute(
-            """
-            INSERT INTO downloads (tipe, title, file_path, source_url)
-            VALUES (?,?,?,?)
-            """,
-            ("audio", title, hasil, url)
-        )
-        db.commit()
-        db.close()
-
-        return jsonify({
-            "status": "sukses",
-            "tipe": "audio",
-            "task_id": task_id,
-            "file": hasil
-        })
-
-    except Exception as e:
-        return jsonify({
-            "status": "gagal",
-            "task_id": task_id,
-            "error": str(e)
-        }), 500
+    return jsonify({
+        "status": "antri",
+        "tipe": "audio",
+        "task_id": task_id
+    }), 202
 
 # ============================================================
 # ROUTE: PROGRESS CHECK
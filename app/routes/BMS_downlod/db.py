@@ -1,13 +1,11 @@
-import sqlite3
 import os
 from app.BMS_config import DOWNLOADS_FOLDER
+from app.database.BMS_db_pool import get_connection
 
 DB_PATH = os.path.join(DOWNLOADS_FOLDER, "download_history.db")
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(DB_PATH)
 
 def init_db():
     conn = get_db()
@@ -25,6 +23,26 @@ def init_db():
     conn.commit()
     conn.close()
 
+def cari_download(tipe, url):
+    """
+    File unduhan sebelumnya dari URL yang sama (masih ada di disk), atau None.
+    """
+    conn = get_db()
+    rows = conn.execute(
+        """
+        SELECT file_path FROM downloads
+        WHERE tipe=? AND source_url=?
+        ORDER BY created_at DESC
+        """,
+        (tipe, url)
+    ).fetchall()
+    conn.close()
+
+    for r in rows:
+        if r["file_path"] and os.path.exists(r["file_path"]):
+            return r["file_path"]
+    return None
+
 def ambil_semua_download(limit=50):
     conn = get_db()
     cur = conn.cursor()
@@ -11,7 +11,8 @@ from app.routes.BMS_downlod.ffmpeg_merge import merge_video_audio
 from app.routes.BMS_downlod.file_helper import (
     bersihkan_nama_file,
     buat_nama_unik,
-    hapus_jika_ada
+    hapus_jika_ada,
+    pakai_file_lama
 )
 from app.routes.BMS_downlod.utils_info import ambil_info_video
 from app.routes.BMS_downlod.db import get_db
@@ -49,6 +50,9 @@ def unduh_video(url, resolusi=720, task_id=None):
     # 🧹 cleanup temp
     hapus_jika_ada(temp_video, temp_audio)
 
+    # ♻️ isi identik sudah tersimpan → pakai file lama
+    output = pakai_file_lama(output)
+
     # 💾 simpan DB
     db = get_db()
     db.execute(
@@ -1,6 +1,9 @@
 import os
 import re
 
+from app.BMS_config import BASE
+from app.routes.BMS_library.library_hash import find_duplicate, file_hash, MIN_DUP_SIZE
+
 ILLEGAL_CHARS = r'[<>:"/\\|?*]'
 
 def bersihkan_nama_file(nama: str) -> str:
@@ -21,4 +24,18 @@ def buat_nama_unik(folder, nama, ext):
         hasil = f"{base}_{i}.{ext}"
         i += 1
 
-    return hasil
\ No newline at end of file
+    return hasil
+
+def pakai_file_lama(path):
+    """
+    Isi file hasil unduhan sudah tersimpan di BMS (music / video / downloads)?
+    → hapus salinan baru & pakai file lama. Selain itu daftarkan ke index hash.
+    """
+    lama = find_duplicate(path, within=BASE)
+    if lama:
+        hapus_jika_ada(path)
+        return lama
+
+    if os.path.exists(path) and os.path.getsize(path) >= MIN_DUP_SIZE:
+        file_hash(path, full=False)
+    return path
\ No newline at end of file
@@ -3,6 +3,21 @@ import time
 from app.BMS_config import DOWNLOADS_FOLDER
 from app.routes.BMS_downlod.db import get_db
 
+def _boleh_hapus_file(cur, path, download_id):
+    """
+    Hanya file di DOWNLOADS_FOLDER yang tidak dipakai record lain
+    (record hasil dedup bisa menunjuk file music / upload).
+    """
+    folder = os.path.realpath(DOWNLOADS_FOLDER).rstrip("/") + "/"
+    if not os.path.realpath(path).startswith(folder):
+        return False
+
+    cur.execute(
+        "SELECT 1 FROM downloads WHERE file_path=? AND id<>? LIMIT 1",
+        (path, download_id)
+    )
+    return cur.fetchone() is None
+
 def cleanup_file_lama(hari=30):
     batas_waktu = time.time() - (hari * 86400)
     conn = get_db()
@@ -21,10 +36,11 @@ def cleanup_file_lama(hari=30):
             continue
 
         if os.path.getmtime(path) < batas_waktu:
-            try:
-                os.remove(path)
-            except Exception:
-                pass
+            if _boleh_hapus_file(cur, path, r["id"]):
+                try:
+                    os.remove(path)
+                except Exception:
+                    pass
             cur.execute("DELETE FROM downloads WHERE id=?", (r["id"],))
             dihapus += 1
 
@@ -47,7 +63,7 @@ def hapus_download_id(download_id):
         return False
 
     path = row["file_path"]
-    if path and os.path.exists(path):
+    if path and os.path.exists(path) and _boleh_hapus_file(cur, path, download_id):
         try:
             os.remove(path)
         except Exception:
@@ -1,13 +1,18 @@
 from app.routes.BMS_downlod.progress_store import update_task
+from app.routes.BMS_jobs.jobs_queue import is_cancel_requested, JobCancelled
 
 def yt_progress_hook(task_id=None):
     def hook(d):
         if not task_id:
             return
 
+        # Cancel dari /jobs/<id>/cancel → hentikan yt-dlp
+        if is_cancel_requested(task_id):
+            raise JobCancelled()
+
         if d["status"] == "downloading":
             percent = d.get("_percent_str", "").strip()
             update_task(task_id, status="downloading", progress=percent)
         elif d["status"] == "finished":
             update_task(task_id, status="finished", progress="100%")
-    return hook
\ No newline at end of file
+    return hook
@@ -1,21 +1,59 @@
-import uuid
+# ============================================================
+# progress_store.py
+# Progress download di atas job queue (BMS_jobs)
+# task_id == job_id → bisa dicek dari worker gunicorn manapun
+# ============================================================
 
-PROGRESS_STORE = {}
+import re
+
+from app.routes.BMS_jobs.jobs_queue import submit, get_job, update_progress
+
+# Pemetaan status job → status lama yang dipakai UI downloader
+_STATUS_MAP = {
+    "queued": "init",
+    "done": "finished",
+    "failed": "gagal",
+    "cancelled": "dibatalkan",
+}
+
+
+def buat_task(kind, payload=None, owner=None):
+    """Buat job download baru, return task_id (job_id)."""
+    return submit(kind, payload, owner=owner, max_retries=1)
 
-def buat_task():
-    task_id = str(uuid.uuid4())
-    PROGRESS_STORE[task_id] = {
-        "status": "init",
-        "progress": "0%"
-    }
-    return task_id
 
 def update_task(task_id, status=None, progress=None):
-    if task_id in PROGRESS_STORE:
-        if status:
-            PROGRESS_STORE[task_id]["status"] = status
-        if progress:
-            PROGRESS_STORE[task_id]["progress"] = progress
+    """
+    status   : teks status yt-dlp (downloading / finished)
+    progress : string persen "45.3%" (format lama)
+    """
+    persen = None
+    if progress:
+        # _percent_str yt-dlp bisa mengandung kode warna ANSI
+        m = re.search(r"(\d+(?:\.\d+)?)%", str(progress))
+        if m:
+            persen = float(m.group(1))
+
+    update_progress(task_id, progress=persen, message=status)
+
 
 def get_task(task_id):
-    return PROGRESS_STORE.get(task_id)
\ No newline at end of file
+    job = get_job(task_id)
+    if not job:
+        return None
+
+    status = job["status"]
+    if status == "running":
+        status = job.get("message") or "running"
+        # "finished" dari yt-dlp = bagian selesai, merge masih jalan
+        if status == "finished":
+            status = "processing"
+    else:
+        status = _STATUS_MAP.get(status, status)
+
+    return {
+        "status": status,
+        "progress": f"{job.get('progress') or 0:.1f}%",
+        "file": (job.get("result") or {}).get("file"),
+        "error": job.get("error"),
+    }
@@ -1,14 +1,37 @@
 import os
-import zipfile
-import tarfile
 import shutil
-import hashlib
 import time
 import base64
 import mimetypes
-from flask import request, jsonify, Response, send_file
-
+from flask import request, jsonify, Response, send_file, session
+
+from app.routes.BMS_library.library_search import (
+    search as search_index,
+    schedule_files_index,
+    index_file,
+    remove_file
+)
+from app.routes.BMS_library.library_hash import (
+    request_file_hash,
+    duplicate_groups,
+    schedule_index as schedule_hash_index,
+    forget as forget_hash
+)
+from app.routes.BMS_library.library_archive import (
+    collect as collect_archive,
+    walk_paths,
+    archive_response,
+    parse_archive_args
+)
+from app.routes.BMS_jobs.jobs_queue import submit
 from .fm_security import safe, ROOT, TRASH, SHARE
+from .fm_jobs import (
+    COMPRESS_JOB,
+    EXTRACT_JOB,
+    EXTRACT_EXTS,
+    COMPRESS_MODES,
+    compress_output
+)
 
 
 # =====================================================
@@ -20,16 +43,15 @@ def action_info():
         return jsonify({"error": "Tidak ditemukan"}), 404
 
     stat = os.stat(path)
-    md5 = None
+    digest, md5, pending = None, None, False
 
+    # Checksum dari index hash (cache per size + mtime);
+    # file besar yang belum ter-hash → job latar, cek lagi nanti
+    # md5 tetap dikirim untuk klien lama
     if os.path.isfile(path):
         try:
-            h = hashlib.md5()
-            with open(path, "rb") as f:
-                for chunk in iter(lambda: f.read(8192), b""):
-                    h.update(chunk)
-            md5 = h.hexdigest()
-        except:
+            digest, md5, pending = request_file_hash(path)
+        except OSError:
             pass
 
     return jsonify({
@@ -38,10 +60,34 @@ def action_info():
         "created": stat.st_ctime,
         "modified": stat.st_mtime,
         "md5": md5,
+        "blake2b": digest,
+        "hash_pending": pending,
         "is_dir": os.path.isdir(path)
     })
 
 
+# =====================================================
+# DUPLIKAT (index hash isi file)
+# =====================================================
+def action_duplicates():
+    limit = max(1, min(request.args.get("limit", 100, type=int), 500))
+    offset = max(0, request.args.get("offset", 0, type=int))
+
+    groups = duplicate_groups(limit, offset)
+    return jsonify({
+        "groups": groups,
+        "wasted": sum(g["wasted"] for g in groups)
+    })
+
+
+def action_duplicates_scan():
+    full = request.form.get("full") == "1"
+    job_id = schedule_hash_index(full=full)
+    if job_id is None:
+        return jsonify({"status": "running"}), 409
+    return jsonify({"status": "queued", "job_id": job_id}), 202
+
+
 # =====================================================
 # EDITOR
 # =====================================================
@@ -68,64 +114,75 @@ def action_edit_write():
 
 
 # =====================================================
-# COMPRESS
+# COMPRESS (job latar → /jobs/<job_id> untuk progress / cancel)
 # =====================================================
 def action_compress():
     path = safe(request.form.get("path"))
     mode = request.form.get("mode", "zip")
 
-    base = os.path.basename(path)
-    out = safe(os.path.join(os.path.dirname(path), base + f".{mode}"))
+    if mode not in COMPRESS_MODES:
+        return jsonify({"error": "mode harus zip / tar / gz"}), 400
+    if path == os.path.realpath(ROOT):
+        return jsonify({"error": "Folder root tidak bisa dikompres"}), 400
+    if not os.path.exists(path):
+        return jsonify({"error": "Tidak ditemukan"}), 404
 
-    try:
-        if mode == "zip":
-            with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
-                if os.path.isfile(path):
-                    zf.write(path, arcname=base)
-                else:
-                    for r, _, files in os.walk(path):
-                        for f in files:
-                            full = os.path.join(r, f)
-                            arc = os.path.relpath(full, os.path.dirname(path))
-                            zf.write(full, arcname=arc)
-
-        elif mode == "tar":
-            with tarfile.open(out, "w") as tf:
-                tf.add(path, arcname=base)
-
-        elif mode == "gz":
-            with tarfile.open(out, "w:gz") as tf:
-                tf.add(path, arcname=base)
+    out = safe(compress_output(path, mode))
+    job_id = submit(
+        COMPRESS_JOB,
+        {"path": path, "mode": mode, "out": out},
+        owner=str(session.get("user_id"))
+    )
+    return jsonify({"status": "queued", "job_id": job_id, "file": out}), 202
 
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
 
-    return jsonify({"status": "ok", "file": out})
+# =====================================================
+# ARSIP STREAMING (unduh folder / pilihan file tanpa file sementara)
+# =====================================================
+def action_archive():
+    # ?path=a&path=b (GET) atau form (POST, pilihan banyak)
+    paths = []
+    for p in request.values.getlist("path"):
+        real = safe(p)
+        # Di luar ROOT → safe() memberi ROOT; ditolak, bukan mengarsip seluruh ROOT
+        if p and real == os.path.realpath(p) and os.path.exists(real) and real not in paths:
+            paths.append(real)
+
+    if not paths:
+        return jsonify({"error": "Tidak ditemukan"}), 404
+
+    try:
+        fmt, compress = parse_archive_args(request.values)
+        entries = collect_archive(walk_paths(paths))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    name = request.values.get("name") or (
+        os.path.basename(paths[0]) if len(paths) == 1 else "arsip"
+    )
+    return archive_response(entries, name, fmt, compress)
 
 
 # =====================================================
-# EXTRACT
+# EXTRACT (job latar, aturan safe_extract untuk ZIP & TAR)
 # =====================================================
 def action_extract():
     path = safe(request.form.get("path"))
     dest = safe(request.form.get("dest") or os.path.dirname(path))
 
-    try:
-        if path.endswith(".zip"):
-            with zipfile.ZipFile(path) as zf:
-                for m in zf.namelist():
-                    if ".." in m:
-                        return jsonify({"error": "Zip slip blocked"}), 400
-                zf.extractall(dest)
-
-        elif path.endswith(".tar") or path.endswith(".gz"):
-            with tarfile.open(path) as tf:
-                tf.extractall(dest)
-
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    if not os.path.isfile(path):
+        return jsonify({"error": "Tidak ditemukan"}), 404
+    if not path.endswith(EXTRACT_EXTS):
+        return jsonify({"error": "Format tidak didukung"}), 400
+    if not os.path.isdir(dest):
+        return jsonify({"error": "Folder tujuan tidak ada"}), 404
 
-    return jsonify({"status": "ok"})
+    job_id = submit(
+        EXTRACT_JOB,
+        {"path": path, "dest": dest},
+        owner=str(session.get("user_id"))
+    )
+    return jsonify({"status": "queued", "job_id": job_id, "dest": dest}), 202
 
 
 # =====================================================
@@ -138,6 +195,8 @@ def action_delete():
 
     new = os.path.join(TRASH, f"{int(time.time())}_" + os.path.basename(path))
     shutil.move(path, new)
+    remove_file(path)
+    forget_hash(path)
 
     return jsonify({"status": "trashed", "trash": new})
 
@@ -146,7 +205,8 @@ def action_restore():
     src = safe(request.form.get("path"))
     dest = safe(request.form.get("dest") or ROOT)
 
-    shutil.move(src, dest)
+    moved = shutil.move(src, dest)
+    index_file(moved)
     return jsonify({"status": "restored"})
 
 
@@ -204,14 +264,15 @@ def action_stream():
 def action_search():
     query = request.args.get("q", "").lower()
     start = safe(request.args.get("path") or ROOT)
-
-    results = []
-    for root, dirs, files in os.walk(start):
-        for f in files:
-            if query in f.lower():
-                results.append(os.path.join(root, f))
-        for d in dirs:
-            if query in d.lower():
-                results.append(os.path.join(root, d))
-
-    return jsonify({"query": query, "results": results})
\ No newline at end of file
+    limit = max(1, min(request.args.get("limit", 200, type=int), 1000))
+
+    # Index FTS5 (diperbarui job background), tanpa os.walk per query
+    schedule_files_index()
+    rows = search_index(
+        query,
+        files=True,
+        under=None if start == os.path.realpath(ROOT) else start,
+        limit=limit
+    )
+
+    return jsonify({"query": query, "results": [r["path"] for r in rows]})
\ No newline at end of file
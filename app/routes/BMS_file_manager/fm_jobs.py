@@ -0,0 +1,307 @@
+# =====================================================
+# JOB KOMPRES / EKSTRAK FILE MANAGER (BMS_jobs)
+#   ✔ Request hanya mengantri job → worker gunicorn tidak tertahan
+#   ✔ Progress per byte + bisa dibatalkan (/jobs/<id>/cancel)
+#   ✔ Kompres: ZIP (media STORED), TAR, TAR.GZ; DEFLATE / gzip multi-core
+#   ✔ Hasil ditulis ke .part → rename saat selesai (batal / gagal → dibuang)
+#   ✔ Ekstrak ZIP & TAR dengan aturan safe_extract (BMS_update):
+#       anti slip, batas total ukuran (dihitung dari byte nyata),
+#       batas jumlah file, hanya file & folder biasa (tanpa symlink / device)
+#   ✔ Sisa disk dijaga (BMS_DISK_RESERVE) saat kompres & ekstrak
+#   ✔ Ekstrak ke folder staging tersembunyi → dipindah ke tujuan jika sukses
+# =====================================================
+
+import os
+import shutil
+import zipfile
+import tarfile
+
+from app.routes.BMS_jobs.jobs_queue import register_handler
+from app.routes.BMS_library.library_search import index_file
+from app.routes.BMS_library.library_archive import (
+    collect as collect_archive,
+    walk_paths,
+    plan_zip,
+    zip_stream,
+    tar_stream,
+    gzip_stream
+)
+
+COMPRESS_JOB = "fm.compress"
+EXTRACT_JOB = "fm.extract"
+
+# mode form → ekstensi hasil
+COMPRESS_MODES = {"zip": ".zip", "tar": ".tar", "gz": ".tar.gz"}
+
+# Arsip yang bisa diekstrak (selain .zip dibaca tarfile, kompresi otomatis)
+EXTRACT_EXTS = (".zip", ".tar", ".gz", ".tgz", ".bz2", ".xz")
+
+# Core untuk DEFLATE / gzip paralel
+COMPRESS_WORKERS = max(1, int(os.environ.get(
+    "BMS_COMPRESS_WORKERS", str(min(4, os.cpu_count() or 1))
+)))
+
+# Batas ekstrak (anti archive bomb)
+EXTRACT_MAX_TOTAL = int(os.environ.get("BMS_EXTRACT_MAX", str(20 * 1024 ** 3)))
+EXTRACT_MAX_FILES = int(os.environ.get("BMS_EXTRACT_MAX_FILES", "100000"))
+
+# Ruang disk yang selalu disisakan (bytes)
+DISK_RESERVE = int(os.environ.get("BMS_DISK_RESERVE", str(512 * 1024 ** 2)))
+
+# Blok salin saat ekstrak & jarak cek sisa disk
+COPY_BLOCK = 1024 * 1024
+DISK_CHECK_EVERY = 64 * 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """Arsip ditolak (slip / bomb) atau disk tidak cukup."""
+
+
+def free_space(path):
+    try:
+        return shutil.disk_usage(path).free - DISK_RESERVE
+    except OSError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _mb(n):
+    return f"{n / 1024 / 1024:.1f} MB"
+
+
+# =====================================================
+# KOMPRES
+# =====================================================
+def compress_output(path, mode):
+    return os.path.join(
+        os.path.dirname(path), os.path.basename(path) + COMPRESS_MODES[mode]
+    )
+
+
+@register_handler(COMPRESS_JOB)
+def job_compress(ctx, payload):
+    path, mode, out = payload["path"], payload["mode"], payload["out"]
+
+    ctx.update(progress=0, message="Membaca daftar file...", force=True)
+    entries = collect_archive(walk_paths([path]))
+    total = sum(e["size"] for e in entries)
+
+    if total > free_space(os.path.dirname(out)):
+        raise ArchiveError("Sisa disk tidak cukup")
+
+    done = 0
+
+    def progress(n):
+        nonlocal done
+        done += n
+        ctx.update(
+            progress=done * 100 / max(total, 1),
+            message=f"{_mb(done)} / {_mb(total)}"
+        )
+        ctx.check_cancel()
+
+    if mode == "zip":
+        plan_zip(entries, compress=True)
+        stream = zip_stream(entries, progress, workers=COMPRESS_WORKERS)
+    elif mode == "gz":
+        stream = gzip_stream(tar_stream(entries, progress), workers=COMPRESS_WORKERS)
+    else:
+        stream = tar_stream(entries, progress)
+
+    # Nama .part unik per job → 2 job ke file yang sama tidak saling tindih
+    tmp = f"{out}.{ctx.job_id[:8]}.part"
+    try:
+        with open(tmp, "wb") as f:
+            for chunk in stream:
+                f.write(chunk)
+        os.replace(tmp, out)
+    except BaseException:
+        stream.close()
+        _remove(tmp)
+        raise
+
+    index_file(out)
+    ctx.update(progress=100, message="Selesai", force=True)
+
+    return {"file": out, "files": len(entries), "size": os.path.getsize(out)}
+
+
+# =====================================================
+# EKSTRAK
+# =====================================================
+class _Budget:
+    """
+    Hitung byte nyata yang ditulis (ukuran di header arsip bisa bohong):
+    batas total, sisa disk, progress & cancel.
+    position() / total = progress; tanpa position → byte tertulis.
+    """
+
+    def __init__(self, ctx, staging, position, total):
+        self.ctx = ctx
+        self.staging = staging
+        self.position = position
+        self.total = max(total, 1)
+        self.written = 0
+        self.files = 0
+        self.skipped = 0
+        self._next_disk_check = 0
+
+    def add_file(self):
+        self.files += 1
+        if self.files > EXTRACT_MAX_FILES:
+            raise ArchiveError(f"Terlalu banyak file (maks {EXTRACT_MAX_FILES})")
+
+    def take(self, n):
+        self.written += n
+        if self.written > EXTRACT_MAX_TOTAL:
+            raise ArchiveError("Total ukuran extract terlalu besar (possible zip bomb)")
+
+        if self.written >= self._next_disk_check:
+            self._next_disk_check = self.written + DISK_CHECK_EVERY
+            if free_space(self.staging) < COPY_BLOCK:
+                raise ArchiveError("Disk hampir penuh, ekstrak dihentikan")
+
+        done = self.position() if self.position else self.written
+        self.ctx.update(
+            progress=min(99.0, done * 100 / self.total),
+            message=f"{self.files} file, {_mb(self.written)}"
+        )
+        self.ctx.check_cancel()
+
+
+def _target(root, name):
+    """
+    Path tujuan member; anti slip (sama seperti safe_extract, tapi
+    batas folder ketat: /tmp/x tidak lolos sebagai /tmp/xy).
+    """
+    target = os.path.realpath(os.path.join(root, name))
+    if target != root and not target.startswith(root + os.sep):
+        raise ArchiveError("ZIP Slip attempt blocked")
+    return target
+
+
+def _copy(src, target, budget):
+    parent = os.path.dirname(target)
+    os.makedirs(parent, exist_ok=True)
+
+    with open(target, "wb") as out:
+        while True:
+            chunk = src.read(COPY_BLOCK)
+            if not chunk:
+                break
+            budget.take(len(chunk))
+            out.write(chunk)
+
+
+def _extract_zip(ctx, path, staging):
+    with zipfile.ZipFile(path) as zf:
+        infos = zf.infolist()
+
+        # Cek awal dari ukuran yang diklaim (cepat gagal)
+        declared = sum(i.file_size for i in infos)
+        if declared > EXTRACT_MAX_TOTAL:
+            raise ArchiveError("Total ukuran extract terlalu besar (possible zip bomb)")
+        if declared > free_space(staging):
+            raise ArchiveError("Sisa disk tidak cukup")
+
+        budget = _Budget(ctx, staging, None, declared)
+
+        for info in infos:
+            target = _target(staging, info.filename)
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+
+            budget.add_file()
+            with zf.open(info) as src:
+                _copy(src, target, budget)
+
+        return budget
+
+
+def _extract_tar(ctx, path, staging):
+    size = os.path.getsize(path)
+
+    with open(path, "rb") as raw:
+        # Mode stream → dibaca 1x berurutan (gz / bz2 / xz tanpa seek mundur)
+        budget = _Budget(ctx, staging, raw.tell, size)
+
+        with tarfile.open(fileobj=raw, mode="r|*") as tf:
+            for member in tf:
+                target = _target(staging, member.name)
+
+                if member.isdir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+
+                # Symlink / hardlink / device / fifo → dilewati
+                if not member.isreg():
+                    budget.skipped += 1
+                    continue
+
+                budget.add_file()
+                src = tf.extractfile(member)
+                _copy(src, target, budget)
+
+    return budget
+
+
+def _merge(staging, dest):
+    """
+    Pindahkan isi staging ke tujuan (menimpa seperti extractall).
+    Return path level atas yang dipindah.
+    """
+    top = []
+    for r, dirs, files in os.walk(staging):
+        rel = os.path.relpath(r, staging)
+        # Symlink yang sudah ada di tujuan tidak boleh membawa keluar
+        target_dir = _target(dest, rel)
+        os.makedirs(target_dir, exist_ok=True)
+
+        for f in files:
+            os.replace(os.path.join(r, f), os.path.join(target_dir, f))
+
+        if rel == ".":
+            top = [os.path.join(dest, n) for n in dirs + files]
+
+    return top
+
+
+@register_handler(EXTRACT_JOB)
+def job_extract(ctx, payload):
+    path, dest = payload["path"], os.path.realpath(payload["dest"])
+
+    # Staging di dalam tujuan → rename (bukan salin) di FS yang sama;
+    # tersembunyi → tidak ikut dibaca scanner / watcher pustaka
+    staging = os.path.join(dest, f".extract-{ctx.job_id[:8]}")
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    ctx.update(progress=0, message="Membuka arsip...", force=True)
+    try:
+        if path.endswith(".zip"):
+            budget = _extract_zip(ctx, path, staging)
+        else:
+            budget = _extract_tar(ctx, path, staging)
+
+        ctx.update(progress=99, message="Memindahkan file...", force=True)
+        top = _merge(staging, dest)
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+    for p in top:
+        index_file(p)
+
+    ctx.update(progress=100, message="Selesai", force=True)
+    return {
+        "dest": dest,
+        "files": budget.files,
+        "size": budget.written,
+        "skipped": budget.skipped
+    }
@@ -32,6 +32,25 @@ def info():
     return act.action_info()
 
 
+# =====================================================
+# DUPLIKAT
+# =====================================================
+@fm_premium.route("/duplicates")
+def duplicates():
+    check = fm_auth()
+    if check: return check
+
+    return act.action_duplicates()
+
+
+@fm_premium.route("/duplicates/scan", methods=["POST"])
+def duplicates_scan():
+    check = fm_auth()
+    if check: return check
+
+    return act.action_duplicates_scan()
+
+
 # =====================================================
 # EDITOR
 # =====================================================
@@ -70,6 +89,14 @@ def extract():
     return act.action_extract()
 
 
+@fm_premium.route("/archive", methods=["GET", "POST"])
+def archive():
+    check = fm_auth()
+    if check: return check
+
+    return act.action_archive()
+
+
 # =====================================================
 # TRASH
 # =====================================================
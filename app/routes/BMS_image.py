@@ -0,0 +1,167 @@
+# ============================================================
+#   BMS – IMAGE VARIANTS (thumbnail & cover)
+#   Dipakai bersama oleh modul MP3 & Video
+#
+#   ✔ Varian 64 / 256 / 512 px dibuat saat ekstraksi
+#   ✔ Format ringkas (WebP, fallback JPEG)
+#   ✔ Pilih ukuran via ?w=
+#   ✔ Varian lama / hilang → dibuat ulang otomatis (lazy)
+#   ✔ ETag kuat + Cache-Control panjang + 304 (via BMS_stream)
+# ============================================================
+
+import os
+import mimetypes
+
+from PIL import Image, features
+
+from app.routes.BMS_stream import send_media
+
+# Lebar varian yang disediakan (px)
+VARIANT_WIDTHS = (64, 256, 512)
+
+# Varian default jika ?w= tidak dikirim (tampilan list)
+DEFAULT_WIDTH = 256
+
+# Cache browser untuk gambar (30 hari, validasi ulang via ETag)
+IMAGE_MAX_AGE = 30 * 24 * 3600
+
+# Format varian
+if features.check("webp"):
+    VARIANT_EXT, VARIANT_FORMAT, VARIANT_MIME = ".webp", "WEBP", "image/webp"
+else:
+    VARIANT_EXT, VARIANT_FORMAT, VARIANT_MIME = ".jpg", "JPEG", "image/jpeg"
+
+SAVE_OPTIONS = {"quality": 80}
+if VARIANT_FORMAT == "WEBP":
+    SAVE_OPTIONS["method"] = 4
+else:
+    SAVE_OPTIONS["optimize"] = True
+
+
+# ============================================================
+#  HELPER: path & ukuran varian
+# ============================================================
+def pick_width(value):
+    """
+    Terjemahkan ?w= ke varian terdekat (>= yang diminta).
+    Nilai kosong / tidak valid → DEFAULT_WIDTH.
+    """
+    try:
+        w = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_WIDTH
+
+    for vw in VARIANT_WIDTHS:
+        if w <= vw:
+            return vw
+    return VARIANT_WIDTHS[-1]
+
+
+def variant_path(src_path, width):
+    """<folder>/<nama>.jpg → <folder>/<nama>_<width>.webp"""
+    base = os.path.splitext(src_path)[0]
+    return f"{base}_{width}{VARIANT_EXT}"
+
+
+def _is_fresh(path, src_mtime):
+    try:
+        return os.path.getmtime(path) >= src_mtime
+    except OSError:
+        return False
+
+
+# ============================================================
+#  BUAT VARIAN
+# ============================================================
+def build_variants(src_path, widths=VARIANT_WIDTHS):
+    """
+    Buat semua varian dari gambar sumber (1x decode).
+    Gambar tidak pernah diperbesar. Return list path varian.
+    """
+    created = []
+
+    with Image.open(src_path) as img:
+        img.draft("RGB", (max(widths), max(widths)))
+        img = img.convert("RGB")
+
+        for w in sorted(widths, reverse=True):
+            out = variant_path(src_path, w)
+            tmp = out + ".tmp"
+
+            im = img.copy()
+            im.thumbnail((w, w * 4), Image.LANCZOS)
+            im.save(tmp, VARIANT_FORMAT, **SAVE_OPTIONS)
+
+            os.replace(tmp, out)
+            created.append(out)
+
+            # Varian kecil diturunkan dari yang lebih besar (lebih cepat)
+            img = im
+
+    return created
+
+
+def safe_build_variants(src_path):
+    """Versi aman build_variants: tidak pernah melempar error."""
+    try:
+        return build_variants(src_path)
+    except Exception:
+        return []
+
+
+def remove_variants(src_path):
+    """Hapus semua varian milik gambar sumber."""
+    for w in VARIANT_WIDTHS:
+        try:
+            os.remove(variant_path(src_path, w))
+        except OSError:
+            pass
+
+
+# ============================================================
+#  SERVE
+# ============================================================
+# Magic bytes → mimetype (cover APIC PNG bisa tersimpan dengan nama .jpg)
+_MAGIC = (
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF8", "image/gif"),
+    (b"BM", "image/bmp"),
+)
+
+
+def image_mimetype(path):
+    """Mimetype dari isi file (magic bytes), fallback dari ekstensi."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        head = b""
+
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, mime in _MAGIC:
+        if head.startswith(magic):
+            return mime
+
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def send_image_variant(src_path, width=None):
+    """
+    Kirim varian gambar sesuai ?w=.
+    Varian belum ada / lebih tua dari sumber → dibuat dulu.
+    Gagal membuat varian → kirim gambar sumber.
+    Harus dipanggil di dalam request context Flask.
+    """
+    w = pick_width(width)
+    out = variant_path(src_path, w)
+    src_mtime = os.path.getmtime(src_path)
+
+    if not _is_fresh(out, src_mtime):
+        safe_build_variants(src_path)
+
+    if _is_fresh(out, src_mtime):
+        return send_media(out, VARIANT_MIME, max_age=IMAGE_MAX_AGE)
+
+    return send_media(src_path, image_mimetype(src_path), max_age=IMAGE_MAX_AGE)
@@ -0,0 +1 @@
+from .jobs_routes import jobs
@@ -0,0 +1,75 @@
+# ============================================================================
+#   BMS JOBS — DATABASE
+#   Tabel jobs persisten (dibagi antar worker gunicorn & tahan restart)
+#
+#   status : queued | running | done | failed | cancelled
+# ============================================================================
+
+import json
+
+from app.database.BMS_db_pool import get_connection
+
+# Penanda inisialisasi tabel
+_db_initialized = False
+
+JOB_COLUMNS = (
+    "id, kind, owner, status, progress, message, payload, result, error, "
+    "attempts, max_retries, cancel_requested, created_at, started_at, finished_at"
+)
+
+
+def get_db():
+    """Koneksi pool + pastikan tabel jobs ada."""
+    global _db_initialized
+    conn = get_connection(name="jobs")
+
+    if not _db_initialized:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                owner TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                progress REAL DEFAULT 0,
+                message TEXT,
+                payload TEXT,
+                result TEXT,
+                error TEXT,
+                attempts INTEGER DEFAULT 0,
+                max_retries INTEGER DEFAULT 0,
+                cancel_requested INTEGER DEFAULT 0,
+                run_after REAL DEFAULT 0,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL,
+                worker TEXT
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_status
+            ON jobs(status, run_after)
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_jobs_owner
+            ON jobs(owner, created_at)
+        """)
+        conn.commit()
+        _db_initialized = True
+
+    return conn
+
+
+def row_to_job(row):
+    """Konversi row jobs → dict JSON-friendly."""
+    if row is None:
+        return None
+
+    job = dict(row)
+    for key in ("payload", "result"):
+        try:
+            job[key] = json.loads(job[key]) if job.get(key) else None
+        except Exception:
+            pass
+    job["cancel_requested"] = bool(job.get("cancel_requested"))
+    return job
@@ -0,0 +1,470 @@
+# ============================================================================
+#   BMS JOBS — QUEUE & WORKER POOL
+#   ✔ submit() langsung return job_id (request tidak menunggu)
+#   ✔ Worker pool terbatas per proses (BMS_JOB_WORKERS)
+#   ✔ Klaim job atomik di SQLite → aman untuk banyak worker gunicorn
+#   ✔ Progress, cancel, retry (backoff), heartbeat
+#   ✔ Job yang tertinggal (proses mati / restart) diantrikan ulang
+#     selama jatah retry masih ada, selebihnya failed
+# ============================================================================
+
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app.database.BMS_db_pool import release_connections, thread_in_transaction
+from app.routes.BMS_logger import BMS_write_log, BMS_write_error
+from .jobs_db import get_db, row_to_job, JOB_COLUMNS
+
+# Jumlah job paralel per proses
+MAX_WORKERS = max(1, int(os.environ.get("BMS_JOB_WORKERS", "2")))
+
+# Interval dispatcher mengecek antrian (detik)
+POLL_INTERVAL = 2.0
+
+# Job "running" tanpa heartbeat selama ini dianggap yatim → antri ulang
+STALE_AFTER = 120
+
+# Batas frekuensi tulis progress ke DB (detik)
+PROGRESS_INTERVAL = 0.5
+
+# Batas frekuensi cek flag cancel ke DB (detik)
+CANCEL_CHECK_INTERVAL = 1.0
+
+_handlers = {}
+_wakeup = threading.Event()
+_start_lock = threading.Lock()
+_started_pid = None
+_executor = None
+_slots = None
+
+# Job yang sedang jalan di proses ini: job_id → JobContext
+_running = {}
+_running_lock = threading.Lock()
+
+# Throttle progress: job_id → waktu tulis terakhir
+_last_progress = {}
+
+
+class JobCancelled(Exception):
+    """Dilempar handler saat job diminta berhenti."""
+
+
+# ============================================================================
+#   REGISTRASI HANDLER
+# ============================================================================
+def register_handler(kind):
+    """
+    Decorator:
+        @register_handler("mp3.scan")
+        def handler(ctx, payload): ...
+    Nilai return handler disimpan sebagai result (harus JSON-able).
+    """
+    def deco(fn):
+        _handlers[kind] = fn
+        return fn
+    return deco
+
+
+# ============================================================================
+#   KONTEKS JOB (dipakai di dalam handler)
+# ============================================================================
+class JobContext:
+    def __init__(self, job_id, owner, attempts):
+        self.job_id = job_id
+        self.owner = owner
+        self.attempts = attempts
+        self._cancelled = False
+        self._last_cancel_check = 0.0
+
+    def update(self, progress=None, message=None, force=False):
+        update_progress(self.job_id, progress, message, force=force)
+
+    def is_cancelled(self, force=False):
+        if self._cancelled:
+            return True
+
+        now = time.time()
+        if not force and now - self._last_cancel_check < CANCEL_CHECK_INTERVAL:
+            return False
+
+        self._last_cancel_check = now
+        self._cancelled = is_cancel_requested(self.job_id)
+        return self._cancelled
+
+    def check_cancel(self):
+        if self.is_cancelled():
+            raise JobCancelled()
+
+
+# ============================================================================
+#   API PUBLIK
+# ============================================================================
+def submit(kind, payload=None, owner=None, max_retries=0):
+    """Masukkan job ke antrian, return job_id."""
+    job_id = uuid.uuid4().hex
+    now = time.time()
+
+    conn = get_db()
+    conn.execute("""
+        INSERT INTO jobs
+            (id, kind, owner, status, payload, max_retries, created_at, run_after)
+        VALUES (?,?,?,'queued',?,?,?,?)
+    """, (job_id, kind, owner, json.dumps(payload or {}), max_retries, now, now))
+    conn.commit()
+
+    start_workers()
+    _wakeup.set()
+    return job_id
+
+
+def submit_unique(kind, payload=None, owner=None, max_retries=0):
+    """
+    Seperti submit(), tapi hanya jika belum ada job `kind` yang queued /
+    running. Cek & insert dalam 1 statement (atomik antar worker gunicorn).
+    Return job_id, atau None jika sudah ada.
+    """
+    job_id = uuid.uuid4().hex
+    now = time.time()
+
+    conn = get_db()
+    cur = conn.execute("""
+        INSERT INTO jobs
+            (id, kind, owner, status, payload, max_retries, created_at, run_after)
+        SELECT ?,?,?,'queued',?,?,?,?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM jobs WHERE kind=? AND status IN ('queued', 'running')
+        )
+    """, (job_id, kind, owner, json.dumps(payload or {}), max_retries, now, now, kind))
+    conn.commit()
+
+    if cur.rowcount != 1:
+        return None
+
+    start_workers()
+    _wakeup.set()
+    return job_id
+
+
+def get_job(job_id):
+    conn = get_db()
+    row = conn.execute(
+        f"SELECT {JOB_COLUMNS} FROM jobs WHERE id=?", (job_id,)
+    ).fetchone()
+    return row_to_job(row)
+
+
+def list_jobs(owner=None, status=None, limit=50):
+    sql = f"SELECT {JOB_COLUMNS} FROM jobs WHERE 1=1"
+    args = []
+
+    if owner is not None:
+        sql += " AND owner=?"
+        args.append(owner)
+
+    if status:
+        sql += " AND status=?"
+        args.append(status)
+
+    sql += " ORDER BY created_at DESC LIMIT ?"
+    args.append(limit)
+
+    conn = get_db()
+    return [row_to_job(r) for r in conn.execute(sql, args).fetchall()]
+
+
+def has_active_job(kind, owner=None):
+    """True jika ada job `kind` yang masih queued / running."""
+    sql = "SELECT 1 FROM jobs WHERE kind=? AND status IN ('queued', 'running')"
+    args = [kind]
+
+    if owner is not None:
+        sql += " AND owner=?"
+        args.append(owner)
+
+    conn = get_db()
+    return conn.execute(sql + " LIMIT 1", args).fetchone() is not None
+
+
+def update_progress(job_id, progress=None, message=None, force=False):
+    """
+    Update progress (0-100) / pesan job.
+    Ditahan maksimal 1 tulis per PROGRESS_INTERVAL kecuali force=True.
+    """
+    now = time.time()
+    if not force and now - _last_progress.get(job_id, 0) < PROGRESS_INTERVAL:
+        return
+
+    # Handler masih memegang lock tulis (transaksi scan belum commit) →
+    # UPDATE dari koneksi "jobs" hanya menunggu busy_timeout lalu gagal.
+    # Lewati; progress berikutnya setelah commit akan tertulis.
+    conn = get_db()
+    if thread_in_transaction(exclude=conn):
+        return
+
+    _last_progress[job_id] = now
+
+    sets = ["heartbeat_at=?"]
+    args = [now]
+
+    if progress is not None:
+        sets.append("progress=?")
+        args.append(max(0.0, min(100.0, float(progress))))
+
+    if message is not None:
+        sets.append("message=?")
+        args.append(str(message))
+
+    args.append(job_id)
+
+    try:
+        conn.execute(f"UPDATE jobs SET {', '.join(sets)} WHERE id=?", args)
+        conn.commit()
+    except Exception as e:
+        BMS_write_error(f"[JOBS] Gagal update progress {job_id}: {e}")
+
+
+def is_cancel_requested(job_id):
+    conn = get_db()
+    row = conn.execute(
+        "SELECT cancel_requested FROM jobs WHERE id=?", (job_id,)
+    ).fetchone()
+    return bool(row and row["cancel_requested"])
+
+
+def cancel_job(job_id):
+    """
+    Job queued → langsung cancelled.
+    Job running → tandai cancel_requested (handler berhenti sendiri).
+    """
+    now = time.time()
+    conn = get_db()
+
+    cur = conn.execute("""
+        UPDATE jobs SET status='cancelled', cancel_requested=1, finished_at=?
+        WHERE id=? AND status='queued'
+    """, (now, job_id))
+
+    if cur.rowcount == 0:
+        cur = conn.execute("""
+            UPDATE jobs SET cancel_requested=1
+            WHERE id=? AND status='running'
+        """, (job_id,))
+
+    conn.commit()
+    return cur.rowcount > 0
+
+
+def retry_job(job_id):
+    """Antrikan ulang job yang gagal / dibatalkan."""
+    now = time.time()
+    conn = get_db()
+    cur = conn.execute("""
+        UPDATE jobs
+        SET status='queued', attempts=0, cancel_requested=0, error=NULL,
+            progress=0, run_after=?, started_at=NULL, finished_at=NULL
+        WHERE id=? AND status IN ('failed', 'cancelled')
+    """, (now, job_id))
+    conn.commit()
+
+    if cur.rowcount:
+        start_workers()
+        _wakeup.set()
+    return cur.rowcount > 0
+
+
+# ============================================================================
+#   DISPATCHER
+# ============================================================================
+def start_workers():
+    """Jalankan dispatcher (1x per proses, aman setelah fork)."""
+    global _started_pid, _executor, _slots
+
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+
+    with _start_lock:
+        if _started_pid == pid:
+            return
+
+        _executor = ThreadPoolExecutor(
+            max_workers=MAX_WORKERS,
+            thread_name_prefix="bms-job"
+        )
+        _slots = threading.BoundedSemaphore(MAX_WORKERS)
+        _running.clear()
+
+        t = threading.Thread(target=_dispatch_loop, name="bms-job-dispatcher", daemon=True)
+        t.start()
+        _started_pid = pid
+
+    BMS_write_log(f"[JOBS] Worker pool aktif ({MAX_WORKERS} worker, pid {pid})")
+
+
+def _worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _dispatch_loop():
+    while True:
+        try:
+            _heartbeat()
+            _requeue_stale()
+
+            while _slots.acquire(blocking=False):
+                job = _claim_next()
+                if job is None:
+                    _slots.release()
+                    break
+                _executor.submit(_run_job, job)
+
+        except Exception as e:
+            BMS_write_error(f"[JOBS] Dispatcher error: {e}")
+
+        _wakeup.wait(POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def _heartbeat():
+    with _running_lock:
+        ids = list(_running)
+
+    if not ids:
+        return
+
+    conn = get_db()
+    conn.executemany(
+        "UPDATE jobs SET heartbeat_at=? WHERE id=?",
+        [(time.time(), i) for i in ids]
+    )
+    conn.commit()
+
+
+def _requeue_stale():
+    """
+    Job yatim (worker mati / restart) dihitung sebagai 1 percobaan gagal
+    (attempts sudah naik saat diklaim): masih ada jatah → antri ulang,
+    habis → failed. Job yang selalu membuat worker crash tidak berulang terus.
+    """
+    now = time.time()
+    limit = now - STALE_AFTER
+    error = "Worker berhenti tanpa heartbeat"
+
+    conn = get_db()
+    cur = conn.execute("""
+        UPDATE jobs SET status='failed', error=?, finished_at=?, worker=NULL
+        WHERE status='running' AND heartbeat_at < ? AND attempts > max_retries
+    """, (error, now, limit))
+    failed = cur.rowcount
+
+    conn.execute("""
+        UPDATE jobs SET status='queued', error=?, run_after=?, worker=NULL
+        WHERE status='running' AND heartbeat_at < ?
+    """, (error, now, limit))
+    conn.commit()
+
+    if failed > 0:
+        BMS_write_error(f"[JOBS] {failed} job yatim melewati batas retry → failed")
+
+
+def _claim_next():
+    kinds = list(_handlers)
+    if not kinds:
+        return None
+
+    now = time.time()
+    q = ",".join("?" * len(kinds))
+    conn = get_db()
+
+    row = conn.execute(f"""
+        SELECT id FROM jobs
+        WHERE status='queued' AND run_after<=? AND kind IN ({q})
+        ORDER BY created_at ASC
+        LIMIT 1
+    """, [now] + kinds).fetchone()
+
+    if not row:
+        return None
+
+    # Klaim atomik: hanya 1 worker yang berhasil mengubah status
+    cur = conn.execute("""
+        UPDATE jobs
+        SET status='running', attempts=attempts+1, started_at=?,
+            heartbeat_at=?, worker=?
+        WHERE id=? AND status='queued'
+    """, (now, now, _worker_name(), row["id"]))
+    conn.commit()
+
+    if cur.rowcount != 1:
+        return None
+
+    return conn.execute(
+        "SELECT id, kind, owner, payload, attempts, max_retries FROM jobs WHERE id=?",
+        (row["id"],)
+    ).fetchone()
+
+
+def _finish(job_id, status, result=None, error=None, run_after=None):
+    conn = get_db()
+    if status == "queued":
+        conn.execute("""
+            UPDATE jobs SET status='queued', error=?, run_after=?, worker=NULL
+            WHERE id=?
+        """, (error, run_after, job_id))
+    else:
+        conn.execute("""
+            UPDATE jobs
+            SET status=?, result=?, error=?, finished_at=?,
+                progress=CASE WHEN ?='done' THEN 100 ELSE progress END
+            WHERE id=?
+        """, (
+            status,
+            json.dumps(result) if result is not None else None,
+            error,
+            time.time(),
+            status,
+            job_id
+        ))
+    conn.commit()
+
+
+def _run_job(job):
+    job_id = job["id"]
+    ctx = JobContext(job_id, job["owner"], job["attempts"])
+
+    with _running_lock:
+        _running[job_id] = ctx
+
+    try:
+        payload = json.loads(job["payload"] or "{}")
+        result = _handlers[job["kind"]](ctx, payload)
+        _finish(job_id, "done", result=result)
+
+    except JobCancelled:
+        _finish(job_id, "cancelled")
+
+    except Exception as e:
+        if ctx.is_cancelled(force=True):
+            _finish(job_id, "cancelled")
+        elif job["attempts"] <= job["max_retries"]:
+            # Backoff eksponensial: 5s, 10s, 20s, ...
+            delay = 5 * (2 ** (job["attempts"] - 1))
+            _finish(job_id, "queued", error=str(e), run_after=time.time() + delay)
+        else:
+            BMS_write_error(f"[JOBS] {job['kind']} {job_id} gagal: {e}")
+            _finish(job_id, "failed", error=str(e))
+
+    finally:
+        # Transaksi handler yang tidak di-commit → batalkan
+        release_connections()
+
+        with _running_lock:
+            _running.pop(job_id, None)
+        _last_progress.pop(job_id, None)
+        _slots.release()
+        _wakeup.set()
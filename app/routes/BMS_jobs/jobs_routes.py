@@ -0,0 +1,94 @@
+# ============================================================================
+#   BMS JOBS — API
+#   GET  /jobs/               → daftar job milik user (root/admin: semua)
+#   GET  /jobs/<id>           → status, progress, result
+#   POST /jobs/<id>/cancel    → batalkan job
+#   POST /jobs/<id>/retry     → jalankan ulang job gagal / batal
+#   Semua route wajib login; job hanya bisa diakses pemiliknya
+#   (root/admin: semua job, termasuk job sistem tanpa owner)
+# ============================================================================
+
+from flask import Blueprint, jsonify, request, session
+
+from app.routes.BMS_utils import require_login
+from .jobs_queue import get_job, list_jobs, cancel_job, retry_job
+
+jobs = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+def _is_admin():
+    return session.get("role") in ("admin", "root")
+
+
+def _own_job(job_id):
+    """
+    (job, None) jika login & job milik user (atau admin),
+    selain itu (None, response error).
+    Job milik user lain → 404 (keberadaan job tidak dibocorkan).
+    """
+    cek = require_login()
+    if cek:
+        return None, cek
+
+    job = get_job(job_id)
+    if not job or not (_is_admin() or job["owner"] == str(session.get("user_id"))):
+        return None, (jsonify({"error": "Job tidak ditemukan"}), 404)
+
+    return job, None
+
+
+# ============================================================================
+#   LIST JOB
+# ============================================================================
+@jobs.route("/")
+def jobs_list():
+    cek = require_login()
+    if cek:
+        return cek
+
+    limit = min(request.args.get("limit", 50, type=int), 500)
+    status = request.args.get("status")
+
+    owner = None
+    if not _is_admin():
+        owner = str(session.get("user_id"))
+
+    return jsonify(list_jobs(owner=owner, status=status, limit=limit))
+
+
+# ============================================================================
+#   DETAIL JOB
+# ============================================================================
+@jobs.route("/<job_id>")
+def jobs_detail(job_id):
+    job, err = _own_job(job_id)
+    if err:
+        return err
+    return jsonify(job)
+
+
+# ============================================================================
+#   CANCEL / RETRY
+# ============================================================================
+@jobs.route("/<job_id>/cancel", methods=["POST"])
+def jobs_cancel(job_id):
+    _, err = _own_job(job_id)
+    if err:
+        return err
+
+    if not cancel_job(job_id):
+        return jsonify({"error": "Job sudah selesai"}), 409
+
+    return jsonify({"status": "ok", "job": get_job(job_id)})
+
+
+@jobs.route("/<job_id>/retry", methods=["POST"])
+def jobs_retry(job_id):
+    _, err = _own_job(job_id)
+    if err:
+        return err
+
+    if not retry_job(job_id):
+        return jsonify({"error": "Hanya job gagal / dibatalkan yang bisa diulang"}), 409
+
+    return jsonify({"status": "ok", "job": get_job(job_id)})
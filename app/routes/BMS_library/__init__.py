@@ -0,0 +1,3 @@
+# ============================================================================
+#   BMS LIBRARY — layanan bersama untuk pustaka media (MP3 & Video)
+# ============================================================================
@@ -0,0 +1,121 @@
+# ============================================================================
+#   BMS LIBRARY — KATALOG BERSAMA + AKSES PER USER
+#   ✔ mp3_tracks / videos = katalog: 1 baris per file fisik (semua user)
+#   ✔ mp3_library / video_library = pustaka per user (ACL):
+#       user_id, id item, is_favorite, play_count, added_at
+#   ✔ Item katalog dihapus → baris pustaka semua user ikut terhapus (trigger)
+#   ✔ Scan cukup memperbarui katalog 1x, lalu grant_all() ke user yang scan
+#   ✔ library_members: user yang pernah scan (pustaka boleh masih kosong)
+#   ✔ File baru dari watcher → grant_paths() ke semua anggota pustaka
+# ============================================================================
+
+# kind → (tabel pustaka, kolom id item, tabel katalog)
+LIBRARIES = {
+    "track": ("mp3_library", "track_id", "mp3_tracks"),
+    "video": ("video_library", "video_id", "videos"),
+}
+
+
+def _table_exists(cur, name):
+    return cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def ensure_library(cur, kind):
+    """
+    Buat tabel pustaka + trigger cascade.
+    Return True jika tabel baru dibuat (pemanggil menjalankan migrasi data lama).
+    """
+    table, col, catalog = LIBRARIES[kind]
+    is_new = not _table_exists(cur, table)
+
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            user_id TEXT NOT NULL,
+            {col} INTEGER NOT NULL,
+            is_favorite INTEGER NOT NULL DEFAULT 0,
+            play_count INTEGER NOT NULL DEFAULT 0,
+            added_at TEXT,
+            PRIMARY KEY (user_id, {col})
+        ) WITHOUT ROWID
+    """)
+    # Cascade hapus item katalog → semua user
+    cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_{table}_item
+        ON {table}({col})
+    """)
+    # User yang pernah scan jenis ini → ikut menerima file baru dari watcher
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS library_members (
+            kind TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            PRIMARY KEY (kind, user_id)
+        ) WITHOUT ROWID
+    """)
+    # BEFORE: trigger lain (counter folder) masih bisa membaca baris katalog
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{catalog}_library_del
+        BEFORE DELETE ON {catalog}
+        BEGIN
+            DELETE FROM {table} WHERE {col} = OLD.id;
+        END
+    """)
+    return is_new
+
+
+def grant_all(cur, kind, user_id, added_at):
+    """
+    Masukkan seluruh isi katalog ke pustaka user (yang belum ada saja).
+    Return jumlah item baru di pustaka user.
+    """
+    table, col, catalog = LIBRARIES[kind]
+    cur.execute(
+        "INSERT OR IGNORE INTO library_members (kind, user_id) VALUES (?,?)",
+        (kind, user_id)
+    )
+    cur.execute(f"""
+        INSERT OR IGNORE INTO {table} (user_id, {col}, added_at)
+        SELECT ?, id, ? FROM {catalog}
+    """, (user_id, added_at))
+    return cur.rowcount
+
+
+def grant_paths(cur, kind, paths, added_at):
+    """
+    Masukkan item katalog (berdasarkan filepath) ke pustaka setiap anggota
+    (user yang pernah scan / sudah punya pustaka dari migrasi).
+    Return jumlah baris pustaka baru.
+    """
+    table, col, catalog = LIBRARIES[kind]
+    granted = 0
+    for i in range(0, len(paths), 500):
+        batch = paths[i:i + 500]
+        cur.execute(f"""
+            INSERT OR IGNORE INTO {table} (user_id, {col}, added_at)
+            SELECT u.user_id, c.id, ?
+            FROM (
+                SELECT user_id FROM library_members WHERE kind=?
+                UNION
+                SELECT DISTINCT user_id FROM {table}
+            ) u
+            JOIN {catalog} c ON c.filepath IN ({",".join("?" * len(batch))})
+        """, [added_at, kind] + batch)
+        granted += cur.rowcount
+    return granted
+
+
+def in_library(conn, kind, user_id, item_id):
+    table, col, _ = LIBRARIES[kind]
+    return conn.execute(
+        f"SELECT 1 FROM {table} WHERE user_id=? AND {col}=?",
+        (user_id, item_id)
+    ).fetchone() is not None
+
+
+def visible_sql(kind, item_expr):
+    """
+    Potongan SQL: item (ekspresi id) ada di pustaka user (1 parameter: user_id).
+    """
+    table, col, _ = LIBRARIES[kind]
+    return f"EXISTS (SELECT 1 FROM {table} WHERE user_id=? AND {col}={item_expr})"
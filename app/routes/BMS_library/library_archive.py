@@ -0,0 +1,563 @@
+# ============================================================================
+#   BMS LIBRARY — ARSIP STREAMING (ZIP64 / TAR)
+#   ✔ Arsip dibangun on-the-fly sebagai generator → tanpa file sementara,
+#     tanpa 2× disk, worker hanya menyalin blok ke socket
+#   ✔ ZIP: media / format yang sudah terkompresi → STORED, lainnya → DEFLATE
+#   ✔ ZIP64 otomatis (file / offset > 4 GB, > 65535 entri)
+#   ✔ TAR (PAX) atau ZIP yang semua entrinya STORED → Content-Length dihitung
+#     di awal (progress bar browser + resume manager unduhan)
+#   ✔ Dipakai file manager (folder / pilihan file), MP3 & video (folder,
+#     playlist) + job kompres file manager (ditulis ke disk)
+#   ✔ DEFLATE / gzip multi-core opsional ala pigz (blok paralel + kamus 32 KB)
+#
+#   NOTE:
+#   - Ukuran file dikunci saat daftar dibuat: file yang menyusut diisi nol,
+#     yang membesar dipotong → panjang arsip selalu sesuai Content-Length
+# ============================================================================
+
+import os
+import time
+import zlib
+import struct
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+from flask import Response
+
+from app.routes.BMS_logger import BMS_write_error
+
+# Batas jumlah file per arsip
+MAX_FILES = int(os.environ.get("BMS_ARCHIVE_MAX_FILES", "50000"))
+
+# Level DEFLATE untuk file non-media (1 cepat … 9 kecil)
+DEFLATE_LEVEL = int(os.environ.get("BMS_ARCHIVE_LEVEL", "6"))
+
+# Blok baca file & ukuran minimum potongan yang dikirim ke socket
+READ_BLOCK = 256 * 1024
+
+FORMATS = ("zip", "tar")
+
+# Blok DEFLATE paralel & jendela kamus DEFLATE (32 KB)
+PARALLEL_BLOCK = 1024 * 1024
+DEFLATE_WINDOW = 32 * 1024
+
+# Ekstensi yang tidak mengecil jika dikompres lagi → STORED
+STORED_EXTS = {
+    ".mp3", ".m4a", ".aac", ".ogg", ".opus", ".flac", ".wma",
+    ".mp4", ".m4v", ".mkv", ".webm", ".avi", ".mov", ".wmv", ".ts",
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".7z", ".rar", ".zst",
+    ".apk", ".jar", ".docx", ".xlsx", ".pptx", ".pdf",
+}
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP_MAX_ENTRIES = 0xFFFF
+
+# bit 3: CRC & ukuran di data descriptor, bit 11: nama UTF-8
+ZIP_FLAGS = 0x08 | 0x800
+
+# Unix (3) + file biasa 0644
+ZIP_MADE_BY = (3 << 8) | 45
+ZIP_EXTERNAL_ATTR = (0o100644 << 16)
+
+TAR_BLOCK = tarfile.BLOCKSIZE
+TAR_RECORD = tarfile.RECORDSIZE
+
+
+# ============================================================================
+#   DAFTAR ENTRI
+# ============================================================================
+def unique_name(name, used):
+    """
+    Nama entri unik di dalam arsip (playlist boleh berisi nama file sama
+    dari folder berbeda) → "lagu (2).mp3".
+    """
+    if name not in used:
+        used.add(name)
+        return name
+
+    stem, ext = os.path.splitext(name)
+    n = 2
+    while f"{stem} ({n}){ext}" in used:
+        n += 1
+    name = f"{stem} ({n}){ext}"
+    used.add(name)
+    return name
+
+
+def collect(items):
+    """
+    items: iterable (nama di arsip, path file).
+    Return list entri {name, path, size, mtime}; file hilang dilewati.
+    Raise ValueError jika melebihi MAX_FILES.
+    """
+    entries = []
+    used = set()
+
+    for name, path in items:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if not os.path.isfile(path):
+            continue
+
+        if len(entries) >= MAX_FILES:
+            raise ValueError(f"Terlalu banyak file (maks {MAX_FILES})")
+
+        name = name.replace("\\", "/").lstrip("/")
+        entries.append({
+            "name": unique_name(name, used),
+            "path": path,
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+        })
+
+    return entries
+
+
+def library_items(rows, item_ids):
+    """
+    (nama di arsip, path) dari baris katalog (id, filename, filepath,
+    folder_name). Item yang diminta per id (playlist) → urutan permintaan,
+    nama file saja; item dari pilihan folder → "<folder>/<file>".
+    """
+    order = {item_id: n for n, item_id in enumerate(item_ids)}
+    rows = sorted(rows, key=lambda r: (r["id"] not in order, order.get(r["id"], 0)))
+
+    seen = set()
+    for r in rows:
+        if r["id"] in seen:
+            continue
+        seen.add(r["id"])
+
+        if r["id"] in order or not r["folder_name"]:
+            yield r["filename"], r["filepath"]
+        else:
+            yield f"{r['folder_name']}/{r['filename']}", r["filepath"]
+
+
+def walk_paths(paths):
+    """
+    (nama di arsip, path) untuk pilihan file / folder file manager.
+    Folder → isi rekursif dengan nama folder sebagai awalan.
+    """
+    for path in paths:
+        parent = os.path.dirname(path)
+
+        if os.path.isfile(path):
+            yield os.path.basename(path), path
+            continue
+
+        for r, dirs, files in os.walk(path):
+            dirs.sort()
+            for f in sorted(files):
+                full = os.path.join(r, f)
+                yield os.path.relpath(full, parent), full
+
+
+# ============================================================================
+#   BACA FILE (panjang tetap)
+# ============================================================================
+def _read_fixed(entry, progress=None):
+    """
+    Tepat entry["size"] byte: file menyusut / hilang → diisi nol.
+    progress(n) dipanggil tiap blok (job: progress + cek cancel).
+    """
+    left = entry["size"]
+
+    try:
+        f = open(entry["path"], "rb")
+    except OSError as e:
+        BMS_write_error(f"[ARCHIVE] Gagal membuka {entry['path']}: {e}")
+        f = None
+
+    try:
+        while left > 0 and f is not None:
+            chunk = f.read(min(READ_BLOCK, left))
+            if not chunk:
+                break
+            left -= len(chunk)
+            if progress:
+                progress(len(chunk))
+            yield chunk
+    finally:
+        if f is not None:
+            f.close()
+
+    while left > 0:
+        n = min(READ_BLOCK, left)
+        left -= n
+        if progress:
+            progress(n)
+        yield bytes(n)
+
+
+def _coalesce(gen):
+    """
+    Gabungkan potongan kecil (header, file kecil) → lebih sedikit write().
+    """
+    buf = []
+    size = 0
+    for chunk in gen:
+        buf.append(chunk)
+        size += len(chunk)
+        if size >= READ_BLOCK:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+# ============================================================================
+#   DEFLATE (1 core / paralel ala pigz)
+# ============================================================================
+def _blocks(chunks, size):
+    buf = bytearray()
+    for chunk in chunks:
+        buf += chunk
+        while len(buf) >= size:
+            yield bytes(buf[:size])
+            del buf[:size]
+    if buf:
+        yield bytes(buf)
+
+
+def _deflate_block(block, zdict, last):
+    if zdict:
+        comp = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        comp = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15)
+    # Z_SYNC_FLUSH: blok berakhir di batas byte tanpa BFINAL → bisa disambung
+    return comp.compress(block) + comp.flush(
+        zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+    )
+
+
+def deflate_raw(chunks, pool=None, depth=4):
+    """
+    Raw DEFLATE dari iterable bytes.
+    pool (ThreadPoolExecutor) → blok PARALLEL_BLOCK dikompres paralel
+    (zlib melepas GIL); 32 KB akhir blok sebelumnya jadi kamus sehingga
+    rasio hampir sama dengan 1 stream. depth = maks blok di memori.
+    """
+    if pool is None:
+        comp = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -15)
+        for chunk in chunks:
+            out = comp.compress(chunk)
+            if out:
+                yield out
+        yield comp.flush()
+        return
+
+    pending = deque()
+    prev = block = None
+
+    for nxt in _blocks(chunks, PARALLEL_BLOCK):
+        if block is not None:
+            zdict = prev[-DEFLATE_WINDOW:] if prev else None
+            pending.append(pool.submit(_deflate_block, block, zdict, False))
+            while len(pending) >= depth:
+                yield pending.popleft().result()
+        prev, block = block, nxt
+
+    zdict = prev[-DEFLATE_WINDOW:] if prev else None
+    pending.append(pool.submit(_deflate_block, block or b"", zdict, True))
+    while pending:
+        yield pending.popleft().result()
+
+
+def gzip_stream(chunks, workers=1, mtime=0):
+    """
+    Satu member gzip dari iterable bytes (tar → .tar.gz).
+    workers > 1 → DEFLATE paralel (hasil tetap 1 stream gzip standar).
+    """
+    state = {"crc": 0, "size": 0}
+
+    def counted():
+        for chunk in chunks:
+            state["crc"] = zlib.crc32(chunk, state["crc"])
+            state["size"] += len(chunk)
+            yield chunk
+
+    # magic, CM=8, FLG=0, MTIME, XFL=0, OS=3 (Unix)
+    yield b"\x1f\x8b\x08\x00" + struct.pack("<I", int(mtime)) + b"\x00\x03"
+
+    if workers > 1:
+        with ThreadPoolExecutor(workers, thread_name_prefix="bms-gzip") as pool:
+            yield from deflate_raw(counted(), pool, 2 * workers)
+    else:
+        yield from deflate_raw(counted())
+
+    yield struct.pack("<II", state["crc"], state["size"] & 0xFFFFFFFF)
+
+
+# ============================================================================
+#   ZIP64 STREAMING
+# ============================================================================
+def _dos_datetime(ts):
+    t = time.localtime(ts)
+    year = min(max(t.tm_year, 1980), 2107)
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+def _zip_name(entry):
+    return entry["name"].encode("utf-8", "replace")
+
+
+def plan_zip(entries, compress):
+    """
+    Tentukan metode & kebutuhan ZIP64 tiap entri (sebelum streaming).
+    """
+    for e in entries:
+        ext = os.path.splitext(e["name"])[1].lower()
+        stored = not compress or ext in STORED_EXTS or e["size"] == 0
+        e["method"] = ZIP_STORED if stored else ZIP_DEFLATED
+        # DEFLATE bisa sedikit membesar (data acak) → margin 5% seperti zipfile
+        e["zip64"] = (e["size"] if stored else e["size"] * 1.05) >= ZIP64_LIMIT
+
+
+def _local_header(e):
+    name = _zip_name(e)
+    tm, dt = _dos_datetime(e["mtime"])
+    # STORED: ukuran sudah pasti → ditulis; DEFLATE: 0, menyusul di descriptor
+    size = e["size"] if e["method"] == ZIP_STORED else 0
+
+    extra = b""
+    size32 = size
+    if e["zip64"]:
+        extra = struct.pack("<HHQQ", 1, 16, size, size)
+        size32 = ZIP64_LIMIT
+
+    return struct.pack(
+        "<4sHHHHHIIIHH",
+        b"PK\x03\x04", 45 if e["zip64"] else 20, ZIP_FLAGS, e["method"],
+        tm, dt, 0, size32, size32, len(name), len(extra)
+    ) + name + extra
+
+
+def _descriptor(e, crc, csize):
+    if e["zip64"]:
+        return struct.pack("<4sIQQ", b"PK\x07\x08", crc, csize, e["size"])
+    return struct.pack("<4sIII", b"PK\x07\x08", crc, csize, e["size"])
+
+
+def _central_header(e, crc, csize, offset):
+    name = _zip_name(e)
+    tm, dt = _dos_datetime(e["mtime"])
+
+    # Field ZIP64 hanya untuk nilai yang meluap, urutan: usize, csize, offset
+    fields = []
+    usize32, csize32, offset32 = e["size"], csize, offset
+    if e["size"] >= ZIP64_LIMIT:
+        fields.append(e["size"])
+        usize32 = ZIP64_LIMIT
+    if csize >= ZIP64_LIMIT:
+        fields.append(csize)
+        csize32 = ZIP64_LIMIT
+    if offset >= ZIP64_LIMIT:
+        fields.append(offset)
+        offset32 = ZIP64_LIMIT
+
+    extra = b""
+    if fields:
+        extra = struct.pack(f"<HH{len(fields)}Q", 1, 8 * len(fields), *fields)
+
+    return struct.pack(
+        "<4sHHHHHHIIIHHHHHII",
+        b"PK\x01\x02", ZIP_MADE_BY, 45 if (fields or e["zip64"]) else 20,
+        ZIP_FLAGS, e["method"], tm, dt, crc, csize32, usize32,
+        len(name), len(extra), 0, 0, 0, ZIP_EXTERNAL_ATTR, offset32
+    ) + name + extra
+
+
+def _end_records(count, cd_offset, cd_size):
+    out = b""
+
+    if count >= ZIP_MAX_ENTRIES or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+        # Zip64 end of central directory record + locator
+        out += struct.pack(
+            "<4sQHHIIQQQQ",
+            b"PK\x06\x06", 44, ZIP_MADE_BY, 45, 0, 0,
+            count, count, cd_size, cd_offset
+        )
+        out += struct.pack("<4sIQI", b"PK\x06\x07", 0, cd_offset + cd_size, 1)
+        count = min(count, ZIP_MAX_ENTRIES)
+        cd_offset = min(cd_offset, ZIP64_LIMIT)
+        cd_size = min(cd_size, ZIP64_LIMIT)
+
+    out += struct.pack(
+        "<4sHHHHIIH",
+        b"PK\x05\x06", 0, 0, count, count, cd_size, cd_offset, 0
+    )
+    return out
+
+
+def zip_size(entries):
+    """
+    Panjang arsip ZIP jika semua entri STORED, selain itu None
+    (hasil DEFLATE baru diketahui setelah dikompres).
+    """
+    if any(e["method"] != ZIP_STORED for e in entries):
+        return None
+
+    offset = cd_size = 0
+    for e in entries:
+        cd_size += len(_central_header(e, 0, e["size"], offset))
+        offset += len(_local_header(e)) + e["size"] + len(_descriptor(e, 0, e["size"]))
+
+    return offset + cd_size + len(_end_records(len(entries), offset, cd_size))
+
+
+def zip_stream(entries, progress=None, workers=1):
+    """
+    Generator byte ZIP (panggil plan_zip dulu).
+    workers > 1 → entri DEFLATE besar dikompres paralel.
+    """
+    pool = None
+    if workers > 1:
+        pool = ThreadPoolExecutor(workers, thread_name_prefix="bms-zip")
+
+    try:
+        yield from _zip_entries(entries, progress, pool, 2 * workers)
+    finally:
+        if pool:
+            pool.shutdown(wait=True)
+
+
+def _zip_entries(entries, progress, pool, depth):
+    offset = 0
+    central = []
+
+    for e in entries:
+        header = _local_header(e)
+        yield header
+
+        state = {"crc": 0}
+
+        def source(e=e):
+            for chunk in _read_fixed(e, progress):
+                state["crc"] = zlib.crc32(chunk, state["crc"])
+                yield chunk
+
+        if e["method"] == ZIP_DEFLATED:
+            # File kecil: overhead thread tidak sepadan
+            big = pool is not None and e["size"] > 2 * PARALLEL_BLOCK
+            data = deflate_raw(source(), pool if big else None, depth)
+        else:
+            data = source()
+
+        csize = 0
+        for chunk in data:
+            if chunk:
+                csize += len(chunk)
+                yield chunk
+
+        desc = _descriptor(e, state["crc"], csize)
+        yield desc
+
+        central.append(_central_header(e, state["crc"], csize, offset))
+        offset += len(header) + csize + len(desc)
+
+    cd = b"".join(central)
+    yield cd
+    yield _end_records(len(entries), offset, len(cd))
+
+
+# ============================================================================
+#   TAR (PAX) STREAMING
+# ============================================================================
+def _tar_header(e):
+    info = tarfile.TarInfo(e["name"])
+    info.size = e["size"]
+    info.mtime = int(e["mtime"])
+    info.mode = 0o644
+    # PAX → nama panjang / non-ASCII & file > 8 GB tetap aman
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+def _tar_padding(size):
+    return (TAR_BLOCK - size % TAR_BLOCK) % TAR_BLOCK
+
+
+def _tar_tail(offset):
+    # 2 blok nol penutup, lalu dibulatkan ke RECORDSIZE (seperti tarfile)
+    offset += 2 * TAR_BLOCK
+    return 2 * TAR_BLOCK + (TAR_RECORD - offset % TAR_RECORD) % TAR_RECORD
+
+
+def tar_size(entries):
+    offset = 0
+    for e in entries:
+        offset += len(_tar_header(e)) + e["size"] + _tar_padding(e["size"])
+    return offset + _tar_tail(offset)
+
+
+def tar_stream(entries, progress=None):
+    offset = 0
+
+    for e in entries:
+        header = _tar_header(e)
+        yield header
+        yield from _read_fixed(e, progress)
+
+        pad = _tar_padding(e["size"])
+        if pad:
+            yield bytes(pad)
+        offset += len(header) + e["size"] + pad
+
+    yield bytes(_tar_tail(offset))
+
+
+# ============================================================================
+#   RESPONSE
+# ============================================================================
+def _disposition(filename):
+    ascii_name = filename.encode("ascii", "replace").decode().replace('"', "")
+    return (
+        f'attachment; filename="{ascii_name}"; '
+        f"filename*=UTF-8''{quote(filename)}"
+    )
+
+
+def archive_response(entries, name, fmt="zip", compress=True):
+    """
+    Response unduhan arsip streaming.
+    fmt: "zip" / "tar"; compress=False → ZIP semua STORED (ada Content-Length).
+    """
+    if fmt == "tar":
+        stream, length = tar_stream(entries), tar_size(entries)
+        mimetype = "application/x-tar"
+    else:
+        plan_zip(entries, compress)
+        stream, length = zip_stream(entries), zip_size(entries)
+        mimetype = "application/zip"
+
+    headers = {
+        "Content-Disposition": _disposition(f"{name or 'arsip'}.{fmt}"),
+        "Cache-Control": "no-store",
+        # Jangan ditampung reverse proxy (nginx) → langsung mengalir
+        "X-Accel-Buffering": "no",
+    }
+    if length is not None:
+        headers["Content-Length"] = str(length)
+
+    return Response(_coalesce(stream), mimetype=mimetype, headers=headers)
+
+
+def parse_archive_args(values):
+    """
+    (format, compress) dari request.values.
+    Raise ValueError jika format tidak dikenal.
+    """
+    fmt = values.get("format", "zip").lower()
+    if fmt not in FORMATS:
+        raise ValueError("format harus zip / tar")
+    return fmt, values.get("compress", "1") != "0"
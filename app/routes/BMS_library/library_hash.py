@@ -0,0 +1,459 @@
+# ============================================================================
+#   BMS LIBRARY — INDEX HASH ISI FILE (DEDUP)
+#   ✔ Tabel file_hashes: cache per (path, size, mtime) → tidak hash ulang
+#   ✔ Bertingkat: size → partial (size + blok awal/akhir) → full BLAKE2b
+#     partial hanya untuk size yang bentrok, full hanya untuk partial bentrok
+#   ✔ Job "hash.index": scan incremental media di BASE + root scan pustaka
+#   ✔ Job "hash.file"  : hash 1 file besar di latar (info file manager)
+#     + md5 (kompatibilitas klien lama) di pass baca yang sama
+#   ✔ find_duplicate(): cek file yang isinya sudah tersimpan (upload / unduh)
+# ============================================================================
+
+import os
+import time
+import hashlib
+
+from app.BMS_config import BASE
+from app.database.BMS_db_pool import get_connection
+from app.routes.BMS_library.library_scanner import (
+    scan_incremental, default_scan_roots, dedupe_roots
+)
+from app.routes.BMS_jobs.jobs_db import get_db as get_jobs_db
+from app.routes.BMS_jobs.jobs_queue import register_handler, submit, has_active_job
+
+INDEX_JOB = "hash.index"
+FILE_JOB = "hash.file"
+
+# Ukuran blok awal / akhir untuk partial hash
+PARTIAL_BLOCK = 64 * 1024
+
+# Blok baca full hash
+READ_BLOCK = 1024 * 1024
+
+# File lebih kecil dari ini di-hash langsung di request (info file manager)
+INLINE_HASH_MAX = 16 * 1024 * 1024
+
+# File lebih kecil dari ini tidak dicari duplikatnya (tidak sepadan)
+MIN_DUP_SIZE = 64 * 1024
+
+# Media yang diindex job hash.index
+MEDIA_EXTS = (
+    ".mp3", ".flac", ".wav", ".ogg", ".opus", ".m4a", ".aac",
+    ".mp4", ".mkv", ".webm", ".avi", ".mov",
+)
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+
+def get_db():
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                partial TEXT,
+                full TEXT,
+                md5 TEXT,
+                hashed_at REAL
+            )
+        """)
+        cols = [r["name"] for r in conn.execute("PRAGMA table_info(file_hashes)")]
+        if "md5" not in cols:
+            conn.execute("ALTER TABLE file_hashes ADD COLUMN md5 TEXT")
+        # Kandidat duplikat: size sama → partial sama → full sama
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_file_hashes_size
+            ON file_hashes(size, partial)
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_file_hashes_full
+            ON file_hashes(full)
+        """)
+        conn.commit()
+        _table_ready = True
+
+    return conn
+
+
+# ============================================================================
+#   HASH
+# ============================================================================
+def partial_hash(path, size):
+    """
+    BLAKE2b(size + 64 KB awal + 64 KB akhir). Cukup membedakan
+    hampir semua file media berbeda dengan 2 kali baca kecil.
+    """
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        h.update(f.read(PARTIAL_BLOCK))
+        if size > PARTIAL_BLOCK:
+            f.seek(max(PARTIAL_BLOCK, size - PARTIAL_BLOCK))
+            h.update(f.read(PARTIAL_BLOCK))
+    return h.hexdigest()
+
+
+def full_hash(path, ctx=None):
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            h.update(block)
+            if ctx is not None:
+                ctx.check_cancel()
+    return h.hexdigest()
+
+
+def info_hash(path, ctx=None):
+    """
+    (full BLAKE2b, md5) dalam 1 kali baca — khusus info file manager,
+    index dedup cukup BLAKE2b.
+    """
+    h = hashlib.blake2b()
+    m = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(READ_BLOCK), b""):
+            h.update(block)
+            m.update(block)
+            if ctx is not None:
+                ctx.check_cancel()
+    return h.hexdigest(), m.hexdigest()
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+def _row(conn, path, sig):
+    """Baris cache yang masih cocok dengan (size, mtime) file saat ini."""
+    row = conn.execute(
+        "SELECT * FROM file_hashes WHERE path=?", (path,)
+    ).fetchone()
+    if row is None or (row["size"], row["mtime_ns"]) != sig:
+        return None
+    return row
+
+
+def _save(conn, path, sig, partial=None, full=None, md5=None):
+    """
+    Simpan hash; nilai None tidak menimpa hash yang sudah ada
+    kecuali versi file (size / mtime) berubah.
+    """
+    conn.execute("""
+        INSERT INTO file_hashes (path, size, mtime_ns, partial, full, md5, hashed_at)
+        VALUES (?,?,?,?,?,?,?)
+        ON CONFLICT(path) DO UPDATE SET
+            partial = CASE WHEN size=excluded.size AND mtime_ns=excluded.mtime_ns
+                           THEN COALESCE(excluded.partial, partial) ELSE excluded.partial END,
+            full = CASE WHEN size=excluded.size AND mtime_ns=excluded.mtime_ns
+                        THEN COALESCE(excluded.full, full) ELSE excluded.full END,
+            md5 = CASE WHEN size=excluded.size AND mtime_ns=excluded.mtime_ns
+                       THEN COALESCE(excluded.md5, md5) ELSE excluded.md5 END,
+            size = excluded.size,
+            mtime_ns = excluded.mtime_ns,
+            hashed_at = excluded.hashed_at
+    """, (path, sig[0], sig[1], partial, full, md5, time.time()))
+
+
+def cached_hash(path):
+    """
+    Full hash dari cache (tanpa membaca file), atau None.
+    """
+    path = os.path.abspath(path)
+    sig = _stat(path)
+    if sig is None:
+        return None
+    row = _row(get_db(), path, sig)
+    return row["full"] if row else None
+
+
+def file_hash(path, full=True, known_full=None):
+    """
+    Hash file (dari cache jika size & mtime sama), simpan ke index.
+    known_full: full hash yang sudah dihitung pemanggil (mis. saat upload).
+    Return dict {size, partial, full} atau None jika file tidak ada.
+    """
+    path = os.path.abspath(path)
+    sig = _stat(path)
+    if sig is None:
+        return None
+
+    conn = get_db()
+    row = _row(conn, path, sig)
+    partial = row["partial"] if row else None
+    digest = known_full or (row["full"] if row else None)
+
+    dirty = row is None or known_full is not None
+    if partial is None:
+        partial = partial_hash(path, sig[0])
+        dirty = True
+    if full and digest is None:
+        digest = full_hash(path)
+        dirty = True
+
+    if dirty:
+        _save(conn, path, sig, partial, digest)
+        conn.commit()
+
+    return {"size": sig[0], "partial": partial, "full": digest}
+
+
+def request_file_hash(path):
+    """
+    Info file: hash langsung jika kecil, selain itu job latar.
+    Return (full hash atau None, md5 atau None, pending).
+    """
+    path = os.path.abspath(path)
+    sig = _stat(path)
+    if sig is None:
+        return None, None, False
+
+    conn = get_db()
+    row = _row(conn, path, sig)
+    if row and row["full"] and row["md5"]:
+        return row["full"], row["md5"], False
+
+    if sig[0] <= INLINE_HASH_MAX:
+        digest, md5 = info_hash(path)
+        _save(conn, path, sig, full=digest, md5=md5)
+        conn.commit()
+        return digest, md5, False
+
+    pending = get_jobs_db().execute("""
+        SELECT 1 FROM jobs
+        WHERE kind=? AND status IN ('queued', 'running') AND json_extract(payload, '$.path')=?
+        LIMIT 1
+    """, (FILE_JOB, path)).fetchone()
+    if pending is None:
+        submit(FILE_JOB, {"path": path})
+    return None, None, True
+
+
+# ============================================================================
+#   CARI DUPLIKAT 1 FILE (upload / unduhan)
+# ============================================================================
+def find_duplicate(path, within=BASE, known_full=None):
+    """
+    Path lain di bawah `within` yang isinya identik dengan `path`, atau None.
+    Kandidat disaring bertingkat: size → partial → full (hasil di-cache).
+    """
+    path = os.path.abspath(path)
+    sig = _stat(path)
+    if sig is None or sig[0] < MIN_DUP_SIZE:
+        return None
+
+    prefix = os.path.realpath(within).rstrip("/") + "/"
+    conn = get_db()
+    # Folder tersembunyi (.trash, .uploads, ...) bukan "tersimpan"
+    candidates = [
+        r["path"] for r in conn.execute(
+            "SELECT path FROM file_hashes WHERE size=? AND path<>?",
+            (sig[0], path)
+        )
+        if r["path"].startswith(prefix) and "/." not in r["path"][len(prefix) - 1:]
+    ]
+    if not candidates:
+        return None
+
+    mine = file_hash(path, full=False, known_full=known_full)
+
+    for other in candidates:
+        theirs = file_hash(other, full=False)
+        if theirs is None or theirs["size"] != mine["size"]:
+            continue
+        if theirs["partial"] != mine["partial"]:
+            continue
+
+        if mine["full"] is None:
+            mine = file_hash(path)
+        theirs = file_hash(other)
+        if theirs is not None and theirs["full"] == mine["full"]:
+            return other
+
+    return None
+
+
+def forget(path):
+    """Hapus file (atau isi folder) dari index."""
+    path = os.path.abspath(path)
+    conn = get_db()
+    conn.execute(
+        "DELETE FROM file_hashes WHERE path=? OR substr(path, 1, ?)=?",
+        (path, len(path) + 1, path.rstrip("/") + "/")
+    )
+    conn.commit()
+
+
+# ============================================================================
+#   DAFTAR DUPLIKAT
+# ============================================================================
+def duplicate_groups(limit=100, offset=0):
+    """
+    Kelompok file dengan full hash sama, urut ruang terbuang terbesar.
+    """
+    conn = get_db()
+    groups = conn.execute("""
+        SELECT full, size, COUNT(*) AS copies, (COUNT(*) - 1) * size AS wasted
+        FROM file_hashes
+        WHERE full IS NOT NULL
+        GROUP BY full, size
+        HAVING COUNT(*) > 1
+        ORDER BY wasted DESC
+        LIMIT ? OFFSET ?
+    """, (limit, offset)).fetchall()
+
+    result = []
+    for g in groups:
+        paths = [
+            r["path"] for r in conn.execute(
+                "SELECT path FROM file_hashes WHERE full=? AND size=? ORDER BY path",
+                (g["full"], g["size"])
+            )
+        ]
+        result.append({
+            "hash": g["full"],
+            "size": g["size"],
+            "copies": g["copies"],
+            "wasted": g["wasted"],
+            "paths": paths
+        })
+    return result
+
+
+# ============================================================================
+#   JOB
+# ============================================================================
+def index_roots():
+    """BASE (music / video / upload / downloads) + root scan pustaka, tanpa tumpang tindih."""
+    return dedupe_roots([BASE] + default_scan_roots())
+
+
+def schedule_index(full=False):
+    if has_active_job(INDEX_JOB):
+        return None
+    return submit(INDEX_JOB, {"full": bool(full)})
+
+
+@register_handler(INDEX_JOB)
+def job_hash_index(ctx, payload):
+    conn = get_db()
+
+    ctx.update(progress=2, message="Membaca file...")
+    try:
+        res = scan_incremental(
+            conn, "hash",
+            lambda name: name.lower().endswith(MEDIA_EXTS),
+            roots=index_roots(),
+            full=bool(payload.get("full"))
+        )
+
+        # File baru / berubah → baris tanpa hash (dihitung hanya jika perlu)
+        now = time.time()
+        rows = []
+        for p, _ in res["new"] + res["changed"]:
+            sig = _stat(p)
+            if sig is not None:
+                rows.append((p, sig[0], sig[1], now))
+        conn.executemany("""
+            INSERT INTO file_hashes (path, size, mtime_ns, hashed_at)
+            VALUES (?,?,?,?)
+            ON CONFLICT(path) DO UPDATE SET
+                size=excluded.size, mtime_ns=excluded.mtime_ns,
+                partial=NULL, full=NULL, hashed_at=excluded.hashed_at
+        """, rows)
+        conn.executemany(
+            "DELETE FROM file_hashes WHERE path=?",
+            [(p,) for p in res["removed"]]
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    # Tahap 1: partial untuk size yang dimiliki > 1 file
+    todo = [r["path"] for r in conn.execute("""
+        SELECT path FROM file_hashes
+        WHERE partial IS NULL AND size IN (
+            SELECT size FROM file_hashes WHERE size >= ?
+            GROUP BY size HAVING COUNT(*) > 1
+        )
+    """, (MIN_DUP_SIZE,))]
+    partial_done = _hash_batch(ctx, todo, full=False, start=10, end=40)
+
+    # Tahap 2: full untuk (size, partial) yang dimiliki > 1 file
+    todo = [r["path"] for r in conn.execute("""
+        SELECT path FROM file_hashes
+        WHERE full IS NULL AND (size, partial) IN (
+            SELECT size, partial FROM file_hashes WHERE partial IS NOT NULL
+            GROUP BY size, partial HAVING COUNT(*) > 1
+        )
+    """)]
+    full_done = _hash_batch(ctx, todo, full=True, start=40, end=98)
+
+    groups = conn.execute("""
+        SELECT COUNT(*) AS n, COALESCE(SUM(wasted), 0) AS wasted FROM (
+            SELECT (COUNT(*) - 1) * size AS wasted FROM file_hashes
+            WHERE full IS NOT NULL GROUP BY full, size HAVING COUNT(*) > 1
+        )
+    """).fetchone()
+
+    return {
+        "files_added": len(res["new"]),
+        "files_changed": len(res["changed"]),
+        "files_removed": len(res["removed"]),
+        "partial_hashed": partial_done,
+        "full_hashed": full_done,
+        "duplicate_groups": groups["n"],
+        "wasted_bytes": groups["wasted"]
+    }
+
+
+def _hash_batch(ctx, paths, full, start, end):
+    conn = get_db()
+    done = 0
+    total = len(paths)
+
+    for i, p in enumerate(paths):
+        ctx.check_cancel()
+        sig = _stat(p)
+        if sig is None:
+            continue
+        try:
+            if full:
+                _save(conn, p, sig, full=full_hash(p, ctx))
+            else:
+                _save(conn, p, sig, partial=partial_hash(p, sig[0]))
+            done += 1
+        except OSError:
+            continue
+
+        if i % 20 == 0:
+            conn.commit()
+            ctx.update(
+                progress=start + int((end - start) * (i + 1) / total),
+                message=f"{'Full' if full else 'Partial'} hash {i + 1}/{total}"
+            )
+
+    conn.commit()
+    return done
+
+
+@register_handler(FILE_JOB)
+def job_hash_file(ctx, payload):
+    path = payload["path"]
+    sig = _stat(path)
+    if sig is None:
+        return {"path": path, "hash": None}
+
+    digest, md5 = info_hash(path, ctx)
+    conn = get_db()
+    _save(conn, path, sig, partial=partial_hash(path, sig[0]), full=digest, md5=md5)
+    conn.commit()
+    return {"path": path, "hash": digest}
@@ -0,0 +1,142 @@
+# ============================================================================
+#   BMS LIBRARY — KEYSET PAGINATION (cursor)
+#   ✔ ?after=<nilai,id>&limit=&sort=&order=
+#   ✔ Urutan stabil: (kolom sort, id) → tidak ada baris dobel / terlewat
+#   ✔ Response berisi cursor "next"
+#   ✔ Tanpa after/limit → perilaku lama (list penuh)
+# ============================================================================
+
+# Batas jumlah baris per halaman
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+# ============================================================================
+#   DEFINISI SORT
+#   nama → (ekspresi SQL, tipe nilai, urutan default)
+# ============================================================================
+def make_sorts(table_alias=""):
+    """Sort standar untuk tabel media (mp3_tracks / videos)."""
+    p = f"{table_alias}." if table_alias else ""
+    return {
+        "name": (f"{p}filename", str, "asc"),
+        "added_at": (f"COALESCE({p}added_at, '')", str, "desc"),
+        "size": (f"COALESCE({p}size, 0)", int, "desc"),
+    }
+
+
+# ============================================================================
+#   PARSE QUERY STRING
+# ============================================================================
+def parse_page_args(args, sorts, default_sort="name"):
+    """
+    Baca parameter paging dari request.args.
+
+    Return dict:
+        sort, expr, desc, after (nilai, id) | None,
+        limit | None, paginated (bool)
+    Raise ValueError jika parameter tidak valid.
+    """
+    sort = args.get("sort", default_sort)
+    if sort not in sorts:
+        raise ValueError(f"sort tidak dikenal: {sort}")
+
+    expr, value_type, default_order = sorts[sort]
+
+    order = args.get("order", default_order).lower()
+    if order not in ("asc", "desc"):
+        raise ValueError("order harus asc / desc")
+
+    paginated = "after" in args or "limit" in args
+
+    limit = None
+    if paginated:
+        try:
+            limit = int(args.get("limit", DEFAULT_LIMIT))
+        except ValueError:
+            raise ValueError("limit harus angka")
+        limit = max(1, min(limit, MAX_LIMIT))
+
+    after = None
+    raw = args.get("after")
+    if raw:
+        # Nilai boleh mengandung koma (nama file) → id selalu bagian terakhir
+        value, sep, last_id = raw.rpartition(",")
+        if not sep:
+            raise ValueError("after harus berformat <nilai>,<id>")
+        try:
+            after = (value_type(value), int(last_id))
+        except ValueError:
+            raise ValueError("cursor after tidak valid")
+
+    return {
+        "sort": sort,
+        "expr": expr,
+        "desc": order == "desc",
+        "after": after,
+        "limit": limit,
+        "paginated": paginated,
+    }
+
+
+# ============================================================================
+#   SQL
+# ============================================================================
+def keyset_sql(page, id_column="id"):
+    """
+    Return (where_sql, params, order_sql, limit_sql).
+    where_sql diawali ' AND ' (atau kosong) agar bisa ditempel ke WHERE lain.
+    """
+    expr = page["expr"]
+    op = "<" if page["desc"] else ">"
+    direction = "DESC" if page["desc"] else "ASC"
+
+    where_sql, params = "", []
+    if page["after"] is not None:
+        where_sql = f" AND ({expr}, {id_column}) {op} (?, ?)"
+        params = list(page["after"])
+
+    order_sql = f" ORDER BY {expr} {direction}, {id_column} {direction}"
+
+    limit_sql = ""
+    if page["limit"] is not None:
+        # +1 baris untuk tahu apakah masih ada halaman berikutnya
+        limit_sql = f" LIMIT {page['limit'] + 1}"
+
+    return where_sql, params, order_sql, limit_sql
+
+
+# ============================================================================
+#   RESPONSE
+# ============================================================================
+def row_to_dict(row):
+    """Row → dict tanpa kolom bantu sort_value."""
+    d = dict(row)
+    d.pop("sort_value", None)
+    return d
+
+
+def build_page(rows, page, serialize=row_to_dict):
+    """
+    Tanpa paging → list (kompatibel dengan response lama).
+    Dengan paging → {"items": [...], "next": "<nilai>,<id>" | None}
+    Query harus memilih kolom ekstra: <expr> AS sort_value
+    """
+    if not page["paginated"]:
+        return [serialize(r) for r in rows]
+
+    has_more = len(rows) > page["limit"]
+    rows = rows[:page["limit"]]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        value = last["sort_value"]
+        next_cursor = f"{'' if value is None else value},{last['id']}"
+
+    return {
+        "items": [serialize(r) for r in rows],
+        "next": next_cursor,
+        "sort": page["sort"],
+        "order": "desc" if page["desc"] else "asc",
+    }
@@ -0,0 +1,335 @@
+# ============================================================================
+#   BMS LIBRARY — INCREMENTAL SCANNER (mtime-aware)
+#   ✔ Index file persisten di tabel scan_state (path, size, mtime, inode)
+#   ✔ Folder yang mtime-nya tidak berubah → tidak di-list ulang
+#   ✔ Deteksi file baru, berubah & hilang
+#   ✔ Tulis state dengan executemany (batch)
+#   ✔ Tanpa batas MAX_FOLDERS / MAX_FILES
+#   ✔ scan_paths(): scan sebagian (path dari watcher) tanpa walk penuh
+# ============================================================================
+
+import os
+import stat
+import time
+from collections import defaultdict
+
+from app.BMS_config import MUSIC_FOLDER, VIDEO_FOLDER, DOWNLOADS_FOLDER
+
+# Penanda inisialisasi tabel (agar tidak jalan berulang)
+_table_ready = False
+
+
+# ============================================================================
+#   ROOT SCAN (Android / Termux friendly)
+# ============================================================================
+def default_scan_roots():
+    """
+    Folder awal scan pustaka media.
+    Android → /storage/emulated/0, selain itu → home user.
+    """
+    root = "/storage/emulated/0"
+    if not os.path.exists(root):
+        root = os.path.expanduser("~")
+    return [root]
+
+
+def dedupe_roots(paths):
+    """
+    Path absolut unik; root yang berada di dalam root lain dibuang
+    (agar folder yang sama tidak di-walk 2x).
+    """
+    roots = []
+    for r in sorted({os.path.realpath(p) for p in paths}):
+        if not any(r == x or r.startswith(x.rstrip("/") + "/") for x in roots):
+            roots.append(r)
+    return roots
+
+
+def media_roots():
+    """
+    Root pustaka MP3 / video: folder media aplikasi (upload & download)
+    + root scan storage.
+    """
+    return dedupe_roots(
+        [MUSIC_FOLDER, VIDEO_FOLDER, DOWNLOADS_FOLDER] + default_scan_roots()
+    )
+
+
+# ============================================================================
+#   TABEL scan_state
+# ============================================================================
+def ensure_scan_state_table(conn):
+    """
+    scope  : ruang lingkup index (mis. 'mp3:<owner>' / 'video:<owner>')
+    is_dir : 1 = folder (mtime dipakai untuk skip), 0 = file media
+    missing: 1 = file/folder sudah hilang dari disk
+    """
+    global _table_ready
+    if _table_ready:
+        return
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scan_state (
+            scope TEXT NOT NULL,
+            path TEXT NOT NULL,
+            parent TEXT,
+            is_dir INTEGER DEFAULT 0,
+            size INTEGER DEFAULT 0,
+            mtime_ns INTEGER DEFAULT 0,
+            inode INTEGER DEFAULT 0,
+            missing INTEGER DEFAULT 0,
+            seen_at INTEGER,
+            PRIMARY KEY (scope, path)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scan_state_parent
+        ON scan_state(scope, parent)
+    """)
+    conn.commit()
+    _table_ready = True
+
+
+def _load_state(conn, scope):
+    rows = conn.execute("""
+        SELECT path, parent, is_dir, size, mtime_ns, inode, missing
+        FROM scan_state
+        WHERE scope=?
+    """, (scope,)).fetchall()
+
+    state = {}
+    children = defaultdict(list)
+
+    for r in rows:
+        state[r["path"]] = r
+        if r["parent"] is not None:
+            children[r["parent"]].append(r["path"])
+
+    return state, children
+
+
+# ============================================================================
+#   WALK INCREMENTAL
+# ============================================================================
+def _walk(roots, state, children, is_media, full, root_parent=None):
+    seen = set()
+    dir_rows = []
+    new, changed = [], []
+    dirs_scanned = dirs_skipped = 0
+
+    stack = [
+        (os.path.abspath(r), root_parent(r) if root_parent else None)
+        for r in roots
+    ]
+
+    while stack:
+        d, parent = stack.pop()
+
+        try:
+            st = os.stat(d)
+        except OSError:
+            continue
+
+        seen.add(d)
+        old = state.get(d)
+
+        # ---------------------------------------------
+        # Folder tidak berubah → pakai isi dari index
+        # (tambah/hapus/rename file selalu mengubah mtime folder)
+        # ---------------------------------------------
+        if (
+            not full and old is not None and old["is_dir"]
+            and not old["missing"] and old["mtime_ns"] == st.st_mtime_ns
+        ):
+            dirs_skipped += 1
+            for child in children.get(d, ()):
+                c = state[child]
+                if c["missing"]:
+                    continue
+                if c["is_dir"]:
+                    stack.append((child, d))
+                else:
+                    seen.add(child)
+            continue
+
+        dirs_scanned += 1
+        dir_rows.append((d, parent, 1, 0, st.st_mtime_ns, st.st_ino))
+
+        try:
+            with os.scandir(d) as it:
+                entries = list(it)
+        except OSError:
+            continue
+
+        for e in entries:
+            # Lewati folder / file tersembunyi (.trash, .uploads, cache, dll)
+            if e.name.startswith("."):
+                continue
+
+            try:
+                if e.is_dir(follow_symlinks=False):
+                    stack.append((e.path, d))
+                    continue
+
+                if not is_media(e.name) or not e.is_file():
+                    continue
+
+                est = e.stat()
+            except OSError:
+                continue
+
+            seen.add(e.path)
+            o = state.get(e.path)
+            row = (e.path, d, 0, est.st_size, est.st_mtime_ns, est.st_ino)
+
+            if o is None or o["missing"]:
+                new.append(row)
+            elif (o["size"], o["mtime_ns"], o["inode"]) != row[3:]:
+                changed.append(row)
+
+    removed = [
+        p for p, r in state.items()
+        if p not in seen and not r["missing"]
+    ]
+
+    return {
+        "dir_rows": dir_rows,
+        "new": new,
+        "changed": changed,
+        "removed": removed,
+        "dirs_scanned": dirs_scanned,
+        "dirs_skipped": dirs_skipped
+    }
+
+
+# ============================================================================
+#   API UTAMA
+# ============================================================================
+def scan_incremental(conn, scope, is_media, roots=None, full=False):
+    """
+    Scan pustaka secara incremental & simpan state ke scan_state.
+    Commit dilakukan oleh pemanggil (satu transaksi bersama data pustaka).
+
+    Return dict:
+        new     : [(path, size)]  file media baru
+        changed : [(path, size)]  file yang size/mtime/inode berubah
+        removed : [path]          file yang hilang dari disk
+        dirs_scanned / dirs_skipped
+    """
+    ensure_scan_state_table(conn)
+
+    if roots is None:
+        roots = default_scan_roots()
+
+    state, children = _load_state(conn, scope)
+    res = _walk(roots, state, children, is_media, full)
+    return _save(conn, scope, state, res)
+
+
+def _save(conn, scope, state, res):
+    # Kunci tulis diambil sekarang (setelah walk): pemanggil lanjut membaca
+    # lalu menulis di transaksi ini. Transaksi baca yang baru naik jadi tulis
+    # saat watcher / scan lain sudah commit → "database is locked" tanpa menunggu
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    now = int(time.time())
+    upsert = [
+        (scope, p, parent, is_dir, size, mtime, inode, now)
+        for (p, parent, is_dir, size, mtime, inode)
+        in res["dir_rows"] + res["new"] + res["changed"]
+    ]
+
+    conn.executemany("""
+        INSERT INTO scan_state
+            (scope, path, parent, is_dir, size, mtime_ns, inode, missing, seen_at)
+        VALUES (?,?,?,?,?,?,?,0,?)
+        ON CONFLICT(scope, path) DO UPDATE SET
+            parent=excluded.parent,
+            is_dir=excluded.is_dir,
+            size=excluded.size,
+            mtime_ns=excluded.mtime_ns,
+            inode=excluded.inode,
+            missing=0,
+            seen_at=excluded.seen_at
+    """, upsert)
+
+    conn.executemany(
+        "UPDATE scan_state SET missing=1 WHERE scope=? AND path=?",
+        [(scope, p) for p in res["removed"]]
+    )
+
+    removed_files = [p for p in res["removed"] if not state[p]["is_dir"]]
+
+    return {
+        "new": [(r[0], r[3]) for r in res["new"]],
+        "changed": [(r[0], r[3]) for r in res["changed"]],
+        "removed": removed_files,
+        "dirs_scanned": res["dirs_scanned"],
+        "dirs_skipped": res["dirs_skipped"]
+    }
+
+
+# ============================================================================
+#   SCAN SEBAGIAN (WATCHER)
+# ============================================================================
+def _load_subtree(conn, scope, path, state, children):
+    """State path + seluruh isinya (range PK, tanpa LIKE)."""
+    for r in conn.execute("""
+        SELECT path, parent, is_dir, size, mtime_ns, inode, missing
+        FROM scan_state
+        WHERE scope=? AND (path=? OR (path>=? AND path<?))
+    """, (scope, path, path + "/", path + "0")):
+        if r["path"] in state:
+            continue
+        state[r["path"]] = r
+        if r["parent"] is not None:
+            children[r["parent"]].append(r["path"])
+
+
+def scan_paths(conn, scope, is_media, paths):
+    """
+    Sinkronkan hanya path tertentu (file / folder) ke scan_state.
+    Folder → isinya di-walk incremental; path yang sudah tidak ada
+    → file di bawahnya dilaporkan hilang. File lain di scope tidak disentuh.
+    Return dict sama dengan scan_incremental().
+    """
+    ensure_scan_state_table(conn)
+
+    paths = dedupe_roots(paths)
+    state, children = {}, defaultdict(list)
+    for p in paths:
+        _load_subtree(conn, scope, p, state, children)
+
+    dirs, file_rows, file_seen = [], {"new": [], "changed": []}, set()
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError:
+            continue        # hilang → ditangani sebagai removed
+
+        if stat.S_ISDIR(st.st_mode):
+            dirs.append(p)
+            continue
+        if not stat.S_ISREG(st.st_mode) or not is_media(os.path.basename(p)):
+            continue
+
+        file_seen.add(p)
+        o = state.get(p)
+        row = (p, os.path.dirname(p), 0, st.st_size, st.st_mtime_ns, st.st_ino)
+        if o is None or o["missing"]:
+            file_rows["new"].append(row)
+        elif (o["size"], o["mtime_ns"], o["inode"]) != row[3:]:
+            file_rows["changed"].append(row)
+
+    # Folder yang dipantau tetap tercatat di bawah parent-nya
+    def parent_of(d):
+        old = state.get(d)
+        return old["parent"] if old is not None else os.path.dirname(d)
+
+    res = _walk(dirs, state, children, is_media, False, root_parent=parent_of)
+    res["new"] += file_rows["new"]
+    res["changed"] += file_rows["changed"]
+    res["removed"] = [p for p in res["removed"] if p not in file_seen]
+
+    return _save(conn, scope, state, res)
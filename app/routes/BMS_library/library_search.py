@@ -0,0 +1,395 @@
+# ============================================================================
+#   BMS LIBRARY — INDEX PENCARIAN (FTS5)
+#   ✔ search_docs  : 1 baris per track / video / file (katalog bersama,
+#                    hasil track / video disaring pustaka user saat query)
+#   ✔ search_fts   : FTS5 external-content di atas search_docs
+#   ✔ Track & video disinkronkan otomatis via trigger (scan / hapus / update)
+#   ✔ File disinkronkan via job "search.files" (scan incremental BASE)
+#     + hook upload selesai / hapus / restore di file manager
+#   ✔ Query ter-ranking (bm25), tanpa menyentuh filesystem
+# ============================================================================
+
+import os
+import re
+import time
+
+from app.BMS_config import BASE
+from app.database.BMS_db_pool import get_connection
+from app.routes.BMS_library.library_scanner import scan_incremental
+from app.routes.BMS_library.library_acl import visible_sql
+from app.routes.BMS_jobs.jobs_queue import register_handler, submit, has_active_job
+
+FILES_JOB = "search.files"
+
+# Index file dianggap basi setelah ini (detik) → jalankan job incremental
+FILES_REINDEX_INTERVAL = 600
+
+# Bobot bm25 per kolom: name, folder, title, artist, album, genre
+BM25_WEIGHTS = (10.0, 2.0, 8.0, 6.0, 4.0, 1.0)
+
+# Batas jumlah kata dalam 1 query
+MAX_TERMS = 8
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+# Waktu job index file terakhir dijadwalkan (per proses)
+_files_indexed_at = 0.0
+
+
+# ============================================================================
+#   SCHEMA
+# ============================================================================
+def ensure_search_tables(cur):
+    """Buat search_docs + search_fts + trigger sinkronisasi FTS."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS search_docs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            owner TEXT NOT NULL DEFAULT '',
+            path TEXT NOT NULL,
+            ref_id INTEGER,
+            name TEXT,
+            folder TEXT,
+            title TEXT,
+            artist TEXT,
+            album TEXT,
+            genre TEXT,
+            UNIQUE (kind, owner, path)
+        )
+    """)
+
+    cur.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+            name, folder, title, artist, album, genre,
+            content='search_docs',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_docs_ai
+        AFTER INSERT ON search_docs
+        BEGIN
+            INSERT INTO search_fts (rowid, name, folder, title, artist, album, genre)
+            VALUES (NEW.id, NEW.name, NEW.folder, NEW.title, NEW.artist, NEW.album, NEW.genre);
+        END
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_docs_ad
+        AFTER DELETE ON search_docs
+        BEGIN
+            INSERT INTO search_fts (search_fts, rowid, name, folder, title, artist, album, genre)
+            VALUES ('delete', OLD.id, OLD.name, OLD.folder, OLD.title, OLD.artist, OLD.album, OLD.genre);
+        END
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_search_docs_au
+        AFTER UPDATE ON search_docs
+        BEGIN
+            INSERT INTO search_fts (search_fts, rowid, name, folder, title, artist, album, genre)
+            VALUES ('delete', OLD.id, OLD.name, OLD.folder, OLD.title, OLD.artist, OLD.album, OLD.genre);
+            INSERT INTO search_fts (rowid, name, folder, title, artist, album, genre)
+            VALUES (NEW.id, NEW.name, NEW.folder, NEW.title, NEW.artist, NEW.album, NEW.genre);
+        END
+    """)
+
+
+def _trigger_exists(cur, name):
+    return cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def _legacy_trigger(cur, name):
+    """
+    Trigger versi per-user (owner = user_id) → harus diganti.
+    """
+    row = cur.execute(
+        "SELECT sql FROM sqlite_master WHERE type='trigger' AND name=?", (name,)
+    ).fetchone()
+    return row is not None and "user_id" in row["sql"]
+
+
+def _ensure_media_triggers(cur, kind, table, folder_table):
+    """
+    Trigger sinkron tabel media (mp3_tracks / videos) → search_docs.
+    Trigger baru dibuat → isi awal dari data yang sudah ada.
+    """
+    ensure_search_tables(cur)
+
+    prefix = f"trg_{table}_search"
+
+    # Trigger lama per-user → bangun ulang sebagai katalog bersama
+    if _legacy_trigger(cur, f"{prefix}_ins"):
+        for name in ("ins", "del", "upd"):
+            cur.execute(f"DROP TRIGGER IF EXISTS {prefix}_{name}")
+
+    is_new = not _trigger_exists(cur, f"{prefix}_ins")
+
+    upsert = f"""
+        INSERT INTO search_docs (kind, owner, path, ref_id, name, folder)
+        SELECT '{kind}', '', NEW.filepath, NEW.id, NEW.filename,
+               (SELECT folder_name FROM {folder_table} WHERE id = NEW.folder_id)
+        ON CONFLICT(kind, owner, path) DO UPDATE SET
+            ref_id=excluded.ref_id,
+            name=excluded.name,
+            folder=excluded.folder;
+    """
+    delete = f"""
+        DELETE FROM search_docs
+        WHERE kind='{kind}' AND owner='' AND path=OLD.filepath;
+    """
+
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {prefix}_ins
+        AFTER INSERT ON {table}
+        BEGIN {upsert} END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {prefix}_del
+        AFTER DELETE ON {table}
+        BEGIN {delete} END
+    """)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {prefix}_upd
+        AFTER UPDATE OF filename, filepath, folder_id ON {table}
+        BEGIN {delete} {upsert} END
+    """)
+
+    if is_new:
+        # Sisa index lama per-user (owner = user_id)
+        cur.execute(
+            "DELETE FROM search_docs WHERE kind=? AND owner<>''", (kind,)
+        )
+        cur.execute(f"""
+            INSERT OR IGNORE INTO search_docs (kind, owner, path, ref_id, name, folder)
+            SELECT '{kind}', '', t.filepath, t.id, t.filename, f.folder_name
+            FROM {table} t
+            LEFT JOIN {folder_table} f ON f.id = t.folder_id
+        """)
+
+
+def ensure_track_index(cur):
+    """Dipanggil dari BMS_mp3_db.get_db() setelah tabel & kolom MP3 siap."""
+    _ensure_media_triggers(cur, "track", "mp3_tracks", "mp3_folders")
+
+    # Tag ID3 (title/artist/album/genre) ikut diindex saat stage metadata
+    if _legacy_trigger(cur, "trg_mp3_tracks_search_meta"):
+        cur.execute("DROP TRIGGER trg_mp3_tracks_search_meta")
+    is_new = not _trigger_exists(cur, "trg_mp3_tracks_search_meta")
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mp3_tracks_search_meta
+        AFTER UPDATE OF title, artist, album, genre ON mp3_tracks
+        BEGIN
+            UPDATE search_docs
+            SET title=NEW.title, artist=NEW.artist,
+                album=NEW.album, genre=NEW.genre
+            WHERE kind='track' AND owner='' AND path=NEW.filepath;
+        END
+    """)
+
+    if is_new:
+        cur.execute("""
+            UPDATE search_docs
+            SET (title, artist, album, genre) = (
+                SELECT t.title, t.artist, t.album, t.genre
+                FROM mp3_tracks t
+                WHERE t.filepath = search_docs.path
+            )
+            WHERE kind='track'
+        """)
+
+
+def ensure_video_index(cur):
+    """Dipanggil dari BMS_video_db.get_db() setelah tabel video siap."""
+    _ensure_media_triggers(cur, "video", "videos", "folders")
+
+
+def get_db():
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        ensure_search_tables(conn.cursor())
+        conn.commit()
+        _table_ready = True
+
+    return conn
+
+
+# ============================================================================
+#   FILE (file manager / upload)
+# ============================================================================
+def _file_row(path):
+    return (
+        "file", "", path, None,
+        os.path.basename(path),
+        os.path.basename(os.path.dirname(path))
+    )
+
+
+def _upsert_files(conn, paths):
+    conn.executemany("""
+        INSERT INTO search_docs (kind, owner, path, ref_id, name, folder)
+        VALUES (?,?,?,?,?,?)
+        ON CONFLICT(kind, owner, path) DO UPDATE SET
+            name=excluded.name,
+            folder=excluded.folder
+    """, [_file_row(p) for p in paths])
+
+
+def index_file(path):
+    """Tambah / perbarui 1 file (atau isi folder) di index."""
+    path = os.path.abspath(path)
+    if os.path.isdir(path):
+        paths = [
+            os.path.join(root, f)
+            for root, _, files in os.walk(path)
+            for f in files
+        ]
+    else:
+        paths = [path]
+
+    conn = get_db()
+    _upsert_files(conn, paths)
+    conn.commit()
+
+
+def remove_file(path):
+    """Hapus file (atau semua isi folder) dari index."""
+    path = os.path.abspath(path)
+    conn = get_db()
+    conn.execute("""
+        DELETE FROM search_docs
+        WHERE kind='file' AND (path=? OR path LIKE ? ESCAPE '\\')
+    """, (path, _like_prefix(path)))
+    conn.commit()
+
+
+def _like_prefix(folder):
+    escaped = (
+        folder.rstrip("/")
+        .replace("\\", "\\\\")
+        .replace("%", "\\%")
+        .replace("_", "\\_")
+    )
+    return escaped + "/%"
+
+
+def schedule_files_index(force=False):
+    """Jadwalkan job index file jika index basi (non-blocking)."""
+    global _files_indexed_at
+    now = time.time()
+
+    if not force and now - _files_indexed_at < FILES_REINDEX_INTERVAL:
+        return None
+
+    _files_indexed_at = now
+    if has_active_job(FILES_JOB):
+        return None
+    return submit(FILES_JOB, {})
+
+
+@register_handler(FILES_JOB)
+def job_index_files(ctx, payload):
+    conn = get_db()
+
+    try:
+        ctx.update(progress=5, message="Membaca file...")
+        res = scan_incremental(conn, "files", lambda name: True, roots=[BASE])
+        ctx.check_cancel()
+
+        ctx.update(progress=70, message="Menyimpan index...")
+        _upsert_files(conn, [p for p, _ in res["new"]])
+        conn.executemany(
+            "DELETE FROM search_docs WHERE kind='file' AND owner='' AND path=?",
+            [(p,) for p in res["removed"]]
+        )
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {
+        "files_added": len(res["new"]),
+        "files_removed": len(res["removed"]),
+        "dirs_scanned": res["dirs_scanned"],
+        "dirs_skipped": res["dirs_skipped"]
+    }
+
+
+# ============================================================================
+#   QUERY
+# ============================================================================
+def build_match(text):
+    """
+    Ubah input user → ekspresi MATCH FTS5 yang aman.
+    Tiap kata jadi prefix query ("kata"*), digabung AND.
+    """
+    terms = _TOKEN_RE.findall((text or "").lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{t}"*' for t in terms)
+
+
+def search(text, track_owner=None, video_owner=None, files=False,
+           under=None, limit=50, offset=0):
+    """
+    Cari di index.
+    track_owner / video_owner = None → jenis itu tidak diikutkan;
+    selain itu hanya item di pustaka user tersebut.
+    files=True → ikutkan file (opsional dibatasi folder `under`).
+    Return list dict (urut relevansi).
+    """
+    match = build_match(text)
+    if match is None:
+        return []
+
+    scopes, args = [], []
+
+    if track_owner is not None:
+        scopes.append(
+            f"(d.kind='track' AND d.owner='' AND {visible_sql('track', 'd.ref_id')})"
+        )
+        args.append(track_owner)
+
+    if video_owner is not None:
+        scopes.append(
+            f"(d.kind='video' AND d.owner='' AND {visible_sql('video', 'd.ref_id')})"
+        )
+        args.append(video_owner)
+
+    if files:
+        if under:
+            scopes.append("(d.kind='file' AND d.path LIKE ? ESCAPE '\\')")
+            args.append(_like_prefix(os.path.abspath(under)))
+        else:
+            scopes.append("(d.kind='file')")
+
+    if not scopes:
+        return []
+
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    conn = get_db()
+
+    rows = conn.execute(f"""
+        SELECT d.kind, d.ref_id AS id, d.path, d.name, d.folder,
+               d.title, d.artist, d.album, d.genre,
+               bm25(search_fts, {weights}) AS score
+        FROM search_fts
+        JOIN search_docs d ON d.id = search_fts.rowid
+        WHERE search_fts MATCH ? AND ({" OR ".join(scopes)})
+        ORDER BY score, d.id
+        LIMIT ? OFFSET ?
+    """, [match] + args + [limit, offset]).fetchall()
+
+    return [dict(r) for r in rows]
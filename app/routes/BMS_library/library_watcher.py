@@ -0,0 +1,401 @@
+# ============================================================================
+#   BMS LIBRARY — WATCHER PUSTAKA REAL-TIME
+#   ✔ Pantau folder music / video / downloads + root scan pustaka
+#   ✔ Linux inotify via ctypes (tanpa dependency baru)
+#   ✔ Fallback polling (Termux / FS tanpa inotify / batas watch penuh)
+#   ✔ Event di-debounce → 1 batch: katalog MP3 & video diperbarui
+#     (scan_paths), metadata / thumbnail masuk antrian job
+#   ✔ Rescan incremental berkala sebagai jaring pengaman
+#     (event terlewat, queue overflow, storage FUSE Android)
+#   ✔ 1 watcher untuk semua worker gunicorn (flock)
+#
+#   ENV:
+#     BMS_WATCH          auto | inotify | poll | off   (default auto)
+#     BMS_WATCH_DEBOUNCE jeda tenang sebelum batch diproses (detik, default 2)
+#     BMS_WATCH_POLL     interval polling folder aplikasi (detik, default 15)
+#     BMS_WATCH_RESCAN   interval rescan seluruh root (detik, default 900)
+# ============================================================================
+
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+from app.BMS_config import DB_FOLDER, MUSIC_FOLDER, VIDEO_FOLDER, DOWNLOADS_FOLDER
+from app.routes.BMS_logger import BMS_write_log, BMS_write_error
+from app.routes.BMS_library.library_scanner import media_roots, dedupe_roots
+from app.routes.BMS_mp3.BMS_mp3_db import is_mp3
+from app.routes.BMS_video.BMS_video_db import is_video_file
+
+try:
+    import fcntl
+except ImportError:     # Windows → tanpa kunci antar proses
+    fcntl = None
+
+WATCH_MODE = os.environ.get("BMS_WATCH", "auto").lower()
+DEBOUNCE = float(os.environ.get("BMS_WATCH_DEBOUNCE", "2"))
+POLL_INTERVAL = int(os.environ.get("BMS_WATCH_POLL", "15"))
+RESCAN_INTERVAL = int(os.environ.get("BMS_WATCH_RESCAN", "900"))
+
+# Batch tetap diproses walau event terus mengalir (detik)
+MAX_DELAY = 10.0
+
+# Proses lain memegang kunci → coba lagi tiap (detik)
+LOCK_RETRY = 60
+
+LOCK_PATH = os.path.join(DB_FOLDER, "library_watcher.lock")
+
+# Konstanta inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_EVENT = struct.Struct("iIII")
+
+_start_lock = threading.Lock()
+_started_pid = None
+_lock_fd = None
+
+
+# ============================================================================
+#   INOTIFY (ctypes)
+# ============================================================================
+class Inotify:
+    """Watch per folder (inotify tidak rekursif) + peta wd ↔ path."""
+
+    MASK = (
+        IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+        | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+    )
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify tidak tersedia")
+
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+        self.fd = fd
+        self.wd_path = {}
+        self.path_wd = {}
+        self.limit_hit = False      # fs.inotify.max_user_watches habis
+
+    def add(self, path):
+        wd = self._add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC:
+                self.limit_hit = True
+            return False
+        self.wd_path[wd] = path
+        self.path_wd[path] = wd
+        return True
+
+    def add_tree(self, root):
+        """Watch root + semua subfolder (kecuali tersembunyi). Return jumlah watch baru."""
+        added = 0
+        stack = [root]
+        while stack and not self.limit_hit:
+            d = stack.pop()
+            if d in self.path_wd or not self.add(d):
+                continue
+            added += 1
+            try:
+                with os.scandir(d) as it:
+                    for e in it:
+                        if not e.name.startswith(".") and e.is_dir(follow_symlinks=False):
+                            stack.append(e.path)
+            except OSError:
+                pass
+        return added
+
+    def forget_tree(self, path):
+        """Lepas watch folder yang dipindah / dihapus beserta isinya."""
+        prefix = path.rstrip("/") + "/"
+        for p in [p for p in self.path_wd if p == path or p.startswith(prefix)]:
+            wd = self.path_wd.pop(p)
+            self.wd_path.pop(wd, None)
+            self._rm_watch(self.fd, wd)     # folder sudah hilang → EINVAL, aman
+
+    def read(self, timeout):
+        """
+        Tunggu event maks. timeout detik.
+        Return list (mask, path); path None = queue overflow.
+        """
+        ready, _, _ = select.select([self.fd], [], [], max(0.0, timeout))
+        if not ready:
+            return []
+
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        i = 0
+        while i + _EVENT.size <= len(data):
+            wd, mask, _cookie, length = _EVENT.unpack_from(data, i)
+            name = data[i + _EVENT.size:i + _EVENT.size + length].split(b"\0", 1)[0]
+            i += _EVENT.size + length
+
+            if mask & IN_Q_OVERFLOW:
+                events.append((mask, None))
+                continue
+
+            base = self.wd_path.get(wd)
+            if mask & IN_IGNORED:
+                if base is not None:
+                    self.wd_path.pop(wd, None)
+                    self.path_wd.pop(base, None)
+                continue
+            if base is None:
+                continue
+
+            events.append((mask, os.path.join(base, os.fsdecode(name)) if name else base))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+# ============================================================================
+#   WATCHER
+# ============================================================================
+def _kinds(path):
+    """Pustaka yang terpengaruh path: ('mp3',), ('video',) atau keduanya (folder)."""
+    # Filter yang sama dengan scanner (is_mp3 / is_video_file)
+    if is_mp3(path):
+        return ("mp3",)
+    if is_video_file(path):
+        return ("video",)
+    return ("mp3", "video")
+
+
+def app_roots():
+    """Folder media milik aplikasi (tujuan upload & download)."""
+    return dedupe_roots([MUSIC_FOLDER, VIDEO_FOLDER, DOWNLOADS_FOLDER])
+
+
+def _log_result(mp3, video):
+    summary = []
+    if mp3 and (mp3["total_tracks_added"] or mp3["tracks_updated"] or mp3["tracks_removed"]):
+        summary.append(
+            f"mp3 +{mp3['total_tracks_added']} ~{mp3['tracks_updated']} -{mp3['tracks_removed']}"
+        )
+    if video and (video["total_videos_added"] or video["videos_updated"] or video["videos_removed"]):
+        summary.append(
+            f"video +{video['total_videos_added']} ~{video['videos_updated']} -{video['videos_removed']}"
+        )
+    if summary:
+        BMS_write_log("[WATCHER] " + ", ".join(summary))
+
+
+class LibraryWatcher:
+
+    def __init__(self):
+        self.pending = set()
+        self.first_at = self.last_at = 0.0
+        self.rescan_due = False
+
+    # ----------------------------------------------------------------
+    #   SINKRON KE DB
+    # ----------------------------------------------------------------
+    def sync(self, paths):
+        """Proses 1 batch path (file / folder) → katalog MP3 & video."""
+        # Import di sini: modul scan memuat blueprint & handler job
+        from app.routes.BMS_mp3.BMS_mp3_scan import run_mp3_scan
+        from app.routes.BMS_video.BMS_video_scan import run_video_scan
+
+        split = {"mp3": [], "video": []}
+        for p in paths:
+            for kind in _kinds(p):
+                split[kind].append(p)
+
+        _log_result(
+            run_mp3_scan(None, paths=split["mp3"]) if split["mp3"] else None,
+            run_video_scan(None, paths=split["video"]) if split["video"] else None
+        )
+
+    def rescan(self):
+        """Rescan incremental seluruh root (folder yang mtime-nya sama dilewati)."""
+        from app.routes.BMS_mp3.BMS_mp3_scan import run_mp3_scan
+        from app.routes.BMS_video.BMS_video_scan import run_video_scan
+
+        self.rescan_due = False
+        _log_result(run_mp3_scan(None), run_video_scan(None))
+
+    def _safe(self, fn, *args):
+        try:
+            fn(*args)
+        except Exception as e:
+            BMS_write_error(f"[WATCHER] {fn.__name__} gagal: {e}")
+
+    def flush(self):
+        paths, self.pending = list(self.pending), set()
+        self._safe(self.sync, paths)
+
+    def due(self, now):
+        """Batch siap diproses: sudah tenang DEBOUNCE detik / tertunda MAX_DELAY."""
+        return self.pending and (
+            now - self.last_at >= DEBOUNCE or now - self.first_at >= MAX_DELAY
+        )
+
+    # ----------------------------------------------------------------
+    #   EVENT INOTIFY
+    # ----------------------------------------------------------------
+    def handle(self, ino, mask, path):
+        if path is None:            # queue overflow → event hilang
+            self.rescan_due = True
+            return
+
+        name = os.path.basename(path)
+        if name.startswith("."):
+            return
+
+        if mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                ino.add_tree(path)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                ino.forget_tree(path)
+            else:
+                return
+        elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # Root yang dipantau hilang / dipindah
+            ino.forget_tree(path)
+        elif not (mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE | IN_MOVED_FROM)):
+            return      # IN_CREATE file: tunggu CLOSE_WRITE
+        elif not (is_mp3(name) or is_video_file(name)):
+            return
+
+        now = time.time()
+        if not self.pending:
+            self.first_at = now
+        self.last_at = now
+        self.pending.add(path)
+
+    # ----------------------------------------------------------------
+    #   LOOP
+    # ----------------------------------------------------------------
+    def run_inotify(self, ino):
+        # Folder aplikasi dulu: tetap terpantau walau batas watch habis
+        roots = app_roots()
+        roots += [r for r in media_roots() if r not in roots]
+        for r in roots:
+            ino.add_tree(r)
+
+        BMS_write_log(
+            f"[WATCHER] inotify aktif: {len(ino.path_wd)} folder"
+            + (" (batas watch penuh → sisanya via rescan)" if ino.limit_hit else "")
+        )
+
+        self._safe(self.rescan)
+        next_rescan = time.time() + RESCAN_INTERVAL
+
+        while True:
+            now = time.time()
+            if self.pending:
+                timeout = min(DEBOUNCE - (now - self.last_at), MAX_DELAY - (now - self.first_at))
+            else:
+                timeout = next_rescan - now
+
+            for mask, path in ino.read(timeout):
+                self.handle(ino, mask, path)
+
+            now = time.time()
+            if self.due(now):
+                self.flush()
+            if now >= next_rescan or (self.rescan_due and not self.pending):
+                self._safe(self.rescan)
+                next_rescan = now + RESCAN_INTERVAL
+
+    def run_poll(self):
+        BMS_write_log(f"[WATCHER] mode polling tiap {POLL_INTERVAL} detik")
+
+        self._safe(self.rescan)
+        next_rescan = time.time() + RESCAN_INTERVAL
+        roots = app_roots()
+
+        while True:
+            time.sleep(POLL_INTERVAL)
+            if time.time() >= next_rescan:
+                self._safe(self.rescan)
+                next_rescan = time.time() + RESCAN_INTERVAL
+            else:
+                # Folder aplikasi saja (upload / download), mtime-aware
+                self._safe(self.sync, roots)
+
+
+# ============================================================================
+#   START (1x per proses, 1 watcher aktif antar proses)
+# ============================================================================
+def _acquire_lock():
+    global _lock_fd
+    if fcntl is None:
+        return True
+
+    fd = os.open(LOCK_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return False
+
+    _lock_fd = fd
+    return True
+
+
+def _watch_loop():
+    while not _acquire_lock():
+        time.sleep(LOCK_RETRY)
+
+    watcher = LibraryWatcher()
+
+    if WATCH_MODE in ("auto", "inotify"):
+        try:
+            ino = Inotify()
+        except OSError as e:
+            BMS_write_error(f"[WATCHER] inotify tidak bisa dipakai: {e}")
+        else:
+            try:
+                watcher.run_inotify(ino)
+            except Exception as e:
+                BMS_write_error(f"[WATCHER] inotify berhenti: {e}")
+            finally:
+                ino.close()
+
+    watcher.run_poll()
+
+
+def start_watcher():
+    """Thread watcher 1x per proses (dipanggil dari create_app)."""
+    global _started_pid
+    if WATCH_MODE == "off":
+        return
+
+    pid = os.getpid()
+    with _start_lock:
+        if _started_pid == pid:
+            return
+        threading.Thread(
+            target=_watch_loop, name="bms-library-watch", daemon=True
+        ).start()
+        _started_pid = pid
@@ -0,0 +1,402 @@
+# ============================================================================
+#   BMS MP3 MODULE — BROWSE ARTIST / ALBUM / GENRE
+#   ✔ Entitas dibangun dari metadata ID3 (stage metadata)
+#   ✔ Agregat tersimpan: jumlah track, total durasi, cover perwakilan
+#   ✔ Update incremental: hanya entitas yang tersentuh yang dihitung ulang
+#   ✔ Entitas bersama (katalog), user hanya melihat entitas yang punya
+#     track di pustakanya (mp3_library)
+#   ✔ API: /mp3/artists, /mp3/artists/<id>, /mp3/albums, /mp3/albums/<id>,
+#          /mp3/genres, /mp3/genres/<id>
+# ============================================================================
+
+import re
+from flask import Blueprint, jsonify, request
+
+from app.routes.BMS_library.library_pagination import (
+    parse_page_args, keyset_sql, build_page
+)
+from app.routes.BMS_library.library_acl import visible_sql
+from .BMS_mp3_db import get_db, current_user_identifier
+
+mp3_browse = Blueprint("mp3_browse", __name__, url_prefix="/mp3")
+
+# Sort list entitas (?sort=)
+ENTITY_SORTS = {
+    "name": ("name_key", str, "asc"),
+    "track_count": ("track_count", int, "desc"),
+    "duration": ("total_duration", float, "desc"),
+}
+ALBUM_SORTS = {
+    "name": ("title_key", str, "asc"),
+    "year": ("COALESCE(year, 0)", int, "desc"),
+    "track_count": ("track_count", int, "desc"),
+}
+
+# Entitas dibagi semua user (kolom user_id lama diisi konstanta ini)
+SHARED = ""
+
+_SPACE_RE = re.compile(r"\s+")
+
+
+def name_key(value):
+    """Kunci pencocokan nama: huruf kecil, spasi dirapikan."""
+    if not value:
+        return None
+    key = _SPACE_RE.sub(" ", str(value)).strip().casefold()
+    return key or None
+
+
+def _in_clause(ids):
+    return ",".join("?" * len(ids))
+
+
+# ============================================================================
+#   MAINTENANCE (dipanggil stage metadata & scan)
+# ============================================================================
+def _get_or_create(cur, cache, table, name, key_col="name_key",
+                   name_col="name", extra=None):
+    """Ambil id entitas (buat jika belum ada). extra: kolom kunci tambahan."""
+    key = name_key(name)
+    if key is None:
+        return None
+
+    extra = extra or {}
+    user_id = SHARED
+    cache_key = (table, key) + tuple(extra.values())
+    if cache_key in cache:
+        return cache[cache_key]
+
+    where = " AND ".join(
+        ["user_id=?", f"{key_col}=?"] + [f"{c} IS ?" for c in extra]
+    )
+    row = cur.execute(
+        f"SELECT id FROM {table} WHERE {where}",
+        [user_id, key] + list(extra.values())
+    ).fetchone()
+
+    if row:
+        entity_id = row["id"]
+    else:
+        cols = ["user_id", key_col, name_col] + list(extra)
+        cur.execute(
+            f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({_in_clause(cols)})",
+            [user_id, key, str(name).strip()] + list(extra.values())
+        )
+        entity_id = cur.lastrowid
+
+    cache[cache_key] = entity_id
+    return entity_id
+
+
+def collect_entities(cur, track_ids):
+    """Id artist/album/genre yang dipakai track tertentu (sebelum dihapus)."""
+    affected = {"artist": set(), "album": set(), "genre": set()}
+
+    for i in range(0, len(track_ids), 500):
+        batch = track_ids[i:i + 500]
+        for r in cur.execute(f"""
+            SELECT artist_id, album_id, genre_id FROM mp3_tracks
+            WHERE id IN ({_in_clause(batch)})
+        """, batch):
+            affected["artist"].add(r["artist_id"])
+            affected["album"].add(r["album_id"])
+            affected["genre"].add(r["genre_id"])
+
+    for ids in affected.values():
+        ids.discard(None)
+    return affected
+
+
+def link_tracks(cur, filepaths):
+    """
+    Hubungkan track → artist/album/genre sesuai tag terbaru,
+    lalu hitung ulang agregat entitas yang tersentuh.
+    """
+    cache = {}
+    updates = []
+    affected = {"artist": set(), "album": set(), "genre": set()}
+
+    for i in range(0, len(filepaths), 500):
+        batch = filepaths[i:i + 500]
+        rows = cur.execute(f"""
+            SELECT id, artist, album_artist, album, genre,
+                   artist_id, album_id, genre_id
+            FROM mp3_tracks
+            WHERE filepath IN ({_in_clause(batch)})
+        """, batch).fetchall()
+
+        for r in rows:
+            artist_id = _get_or_create(cur, cache, "mp3_artists", r["artist"])
+
+            # Album milik album_artist (kompilasi), fallback artist track
+            album_artist_id = artist_id
+            if r["album_artist"]:
+                album_artist_id = _get_or_create(
+                    cur, cache, "mp3_artists", r["album_artist"]
+                )
+
+            album_id = _get_or_create(
+                cur, cache, "mp3_albums", r["album"],
+                key_col="title_key", name_col="title",
+                extra={"artist_id": album_artist_id}
+            )
+
+            genre_id = _get_or_create(cur, cache, "mp3_genres", r["genre"])
+
+            for kind, old, new in (
+                ("artist", r["artist_id"], artist_id),
+                ("album", r["album_id"], album_id),
+                ("genre", r["genre_id"], genre_id),
+            ):
+                affected[kind].update((old, new))
+
+            affected["artist"].add(album_artist_id)
+            updates.append((artist_id, album_id, genre_id, r["id"]))
+
+    cur.executemany(
+        "UPDATE mp3_tracks SET artist_id=?, album_id=?, genre_id=? WHERE id=?",
+        updates
+    )
+
+    for ids in affected.values():
+        ids.discard(None)
+
+    recompute_entities(cur, affected)
+    return len(updates)
+
+
+def recompute_entities(cur, affected):
+    """Hitung ulang agregat (via indeks *_id) & hapus entitas kosong."""
+    albums = list(affected.get("album", ()))
+    if albums:
+        # Artist pemilik album ikut dihitung ulang (album_count)
+        for r in cur.execute(
+            f"SELECT artist_id FROM mp3_albums WHERE id IN ({_in_clause(albums)})",
+            albums
+        ).fetchall():
+            if r["artist_id"] is not None:
+                affected.setdefault("artist", set()).add(r["artist_id"])
+
+        cur.execute(f"""
+            UPDATE mp3_albums SET
+                track_count = (SELECT COUNT(*) FROM mp3_tracks t
+                               WHERE t.album_id = mp3_albums.id),
+                total_duration = (SELECT COALESCE(SUM(t.duration), 0) FROM mp3_tracks t
+                                  WHERE t.album_id = mp3_albums.id),
+                year = (SELECT MAX(t.year) FROM mp3_tracks t
+                        WHERE t.album_id = mp3_albums.id),
+                cover_track_id = (SELECT t.id FROM mp3_tracks t
+                                  WHERE t.album_id = mp3_albums.id
+                                  ORDER BY t.disc_no, t.track_no, t.filename
+                                  LIMIT 1)
+            WHERE id IN ({_in_clause(albums)})
+        """, albums)
+        cur.execute(f"""
+            DELETE FROM mp3_albums
+            WHERE id IN ({_in_clause(albums)}) AND track_count = 0
+        """, albums)
+
+    artists = list(affected.get("artist", ()))
+    if artists:
+        cur.execute(f"""
+            UPDATE mp3_artists SET
+                track_count = (SELECT COUNT(*) FROM mp3_tracks t
+                               WHERE t.artist_id = mp3_artists.id),
+                total_duration = (SELECT COALESCE(SUM(t.duration), 0) FROM mp3_tracks t
+                                  WHERE t.artist_id = mp3_artists.id),
+                album_count = (SELECT COUNT(*) FROM mp3_albums a
+                               WHERE a.artist_id = mp3_artists.id)
+            WHERE id IN ({_in_clause(artists)})
+        """, artists)
+        cur.execute(f"""
+            DELETE FROM mp3_artists
+            WHERE id IN ({_in_clause(artists)})
+              AND track_count = 0 AND album_count = 0
+        """, artists)
+
+    genres = list(affected.get("genre", ()))
+    if genres:
+        cur.execute(f"""
+            UPDATE mp3_genres SET
+                track_count = (SELECT COUNT(*) FROM mp3_tracks t
+                               WHERE t.genre_id = mp3_genres.id),
+                total_duration = (SELECT COALESCE(SUM(t.duration), 0) FROM mp3_tracks t
+                                  WHERE t.genre_id = mp3_genres.id)
+            WHERE id IN ({_in_clause(genres)})
+        """, genres)
+        cur.execute(f"""
+            DELETE FROM mp3_genres
+            WHERE id IN ({_in_clause(genres)}) AND track_count = 0
+        """, genres)
+
+
+# ============================================================================
+#   HELPER ROUTE
+# ============================================================================
+def _page_args(sorts):
+    try:
+        return parse_page_args(request.args, sorts), None
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+
+
+def _visible(table, link_col):
+    """Entitas punya minimal 1 track di pustaka user (1 parameter: user_id)."""
+    return f"""EXISTS (
+            SELECT 1 FROM mp3_tracks vt
+            WHERE vt.{link_col} = {table}.id AND {visible_sql("track", "vt.id")}
+        )"""
+
+
+def _list_entities(table, link_col, columns, sorts, extra_where="", extra_args=()):
+    owner = current_user_identifier()
+    page, err = _page_args(sorts)
+    if err:
+        return err
+
+    where_sql, params, order_sql, limit_sql = keyset_sql(page)
+    conn = get_db()
+
+    rows = conn.execute(f"""
+        SELECT {columns}, {page["expr"]} AS sort_value
+        FROM {table}
+        WHERE {_visible(table, link_col)}{extra_where}{where_sql}
+        {order_sql}{limit_sql}
+    """, [owner] + list(extra_args) + params).fetchall()
+
+    return jsonify(build_page(rows, page))
+
+
+def _tracks(owner, where, args, order="t.disc_no, t.track_no, t.filename, t.id"):
+    conn = get_db()
+    rows = conn.execute(f"""
+        SELECT t.id, t.filename, t.filepath, t.size, l.is_favorite, l.play_count,
+               t.title, t.artist, t.album, t.duration, t.track_no, t.disc_no
+        FROM mp3_library l
+        JOIN mp3_tracks t ON t.id = l.track_id
+        WHERE l.user_id=? AND {where}
+        ORDER BY {order}
+    """, [owner] + list(args)).fetchall()
+    return [dict(r) for r in rows]
+
+
+# ============================================================================
+#   ARTIST
+# ============================================================================
+@mp3_browse.route("/artists")
+def list_artists():
+    return _list_entities(
+        "mp3_artists", "artist_id",
+        "id, name, track_count, album_count, total_duration",
+        ENTITY_SORTS,
+        extra_where=" AND (track_count > 0 OR album_count > 0)"
+    )
+
+
+@mp3_browse.route("/artists/<int:artist_id>")
+def artist_detail(artist_id):
+    owner = current_user_identifier()
+    conn = get_db()
+
+    artist = conn.execute(f"""
+        SELECT id, name, track_count, album_count, total_duration
+        FROM mp3_artists WHERE id=? AND {_visible("mp3_artists", "artist_id")}
+    """, (artist_id, owner)).fetchone()
+
+    if not artist:
+        return jsonify({"error": "Artist tidak ditemukan"}), 404
+
+    albums = conn.execute(f"""
+        SELECT a.id, a.title, a.year, a.track_count, a.total_duration,
+               c.filepath AS cover_filepath
+        FROM mp3_albums a
+        LEFT JOIN mp3_tracks c ON c.id = a.cover_track_id
+        WHERE a.artist_id=? AND {_visible("a", "album_id")}
+        ORDER BY a.year, a.title_key
+    """, (artist_id, owner)).fetchall()
+
+    return jsonify({
+        **dict(artist),
+        "albums": [dict(r) for r in albums],
+        "tracks": _tracks(
+            owner, "t.artist_id=?", (artist_id,),
+            order="t.album, t.disc_no, t.track_no, t.filename, t.id"
+        )
+    })
+
+
+# ============================================================================
+#   ALBUM
+# ============================================================================
+@mp3_browse.route("/albums")
+def list_albums():
+    artist_id = request.args.get("artist_id", type=int)
+    extra_where, extra_args = "", ()
+    if artist_id is not None:
+        extra_where, extra_args = " AND artist_id=?", (artist_id,)
+
+    return _list_entities(
+        "mp3_albums", "album_id",
+        "id, title, artist_id, year, track_count, total_duration, cover_track_id",
+        ALBUM_SORTS,
+        extra_where=extra_where,
+        extra_args=extra_args
+    )
+
+
+@mp3_browse.route("/albums/<int:album_id>")
+def album_detail(album_id):
+    owner = current_user_identifier()
+    conn = get_db()
+
+    album = conn.execute(f"""
+        SELECT a.id, a.title, a.year, a.track_count, a.total_duration,
+               a.artist_id, ar.name AS artist,
+               c.filepath AS cover_filepath
+        FROM mp3_albums a
+        LEFT JOIN mp3_artists ar ON ar.id = a.artist_id
+        LEFT JOIN mp3_tracks c ON c.id = a.cover_track_id
+        WHERE a.id=? AND {_visible("a", "album_id")}
+    """, (album_id, owner)).fetchone()
+
+    if not album:
+        return jsonify({"error": "Album tidak ditemukan"}), 404
+
+    return jsonify({
+        **dict(album),
+        "tracks": _tracks(owner, "t.album_id=?", (album_id,))
+    })
+
+
+# ============================================================================
+#   GENRE
+# ============================================================================
+@mp3_browse.route("/genres")
+def list_genres():
+    return _list_entities(
+        "mp3_genres", "genre_id",
+        "id, name, track_count, total_duration",
+        ENTITY_SORTS
+    )
+
+
+@mp3_browse.route("/genres/<int:genre_id>")
+def genre_detail(genre_id):
+    owner = current_user_identifier()
+    conn = get_db()
+
+    genre = conn.execute(f"""
+        SELECT id, name, track_count, total_duration
+        FROM mp3_genres WHERE id=? AND {_visible("mp3_genres", "genre_id")}
+    """, (genre_id, owner)).fetchone()
+
+    if not genre:
+        return jsonify({"error": "Genre tidak ditemukan"}), 404
+
+    return jsonify({
+        **dict(genre),
+        "tracks": _tracks(
+            owner, "t.genre_id=?", (genre_id,),
+            order="t.artist, t.album, t.disc_no, t.track_no, t.id"
+        )
+    })
@@ -1,17 +1,46 @@
+from mutagen import File as MutagenFile
 from mutagen.id3 import ID3, APIC
 
+
+def save_apic(tags, save_path):
+    """
+    Simpan frame APIC pertama dari tag ID3 yang SUDAH dibuka.
+    Return True jika ada cover.
+    """
+    if not tags:
+        return False
+
+    for tag in tags.values():
+        if isinstance(tag, APIC):
+            with open(save_path, "wb") as img:
+                img.write(tag.data)
+            return True
+    return False
+
+
+def save_picture(audio, save_path):
+    """
+    Simpan gambar pertama dari blok PICTURE (FLAC) file yang SUDAH dibuka.
+    Return True jika ada cover.
+    """
+    pictures = getattr(audio, "pictures", None)
+    if not pictures:
+        return False
+
+    with open(save_path, "wb") as img:
+        img.write(pictures[0].data)
+    return True
+
+
 def extract_cover(mp3_path, save_path):
     """
-    Ambil cover dari metadata MP3 (ID3 APIC).
+    Ambil cover dari metadata MP3 (ID3 APIC) atau FLAC (PICTURE).
     Return True jika berhasil, False jika tidak ada cover.
     """
     try:
-        tags = ID3(mp3_path)
-        for tag in tags.values():
-            if isinstance(tag, APIC):
-                with open(save_path, "wb") as img:
-                    img.write(tag.data)
-                return True
+        if mp3_path.lower().endswith(".flac"):
+            return save_picture(MutagenFile(mp3_path), save_path)
+        return save_apic(ID3(mp3_path), save_path)
     except Exception:
         pass
-    return False
\ No newline at end of file
+    return False
@@ -0,0 +1,250 @@
+# ============================================================================
+#   BMS MP3 — COVER RESOLVER (ASYNC, MusicBrainz)
+#   ✔ Lookup online TIDAK dilakukan di request (request langsung dapat default)
+#   ✔ Antrian lookup di tabel cover_lookup (hit & miss disimpan + TTL)
+#   ✔ Baca dulu: entri negatif yang masih berlaku → tanpa tulis DB
+#   ✔ 1 job "mp3.cover_resolve" menguras antrian (tidak membanjiri worker)
+#     dijamin di DB (submit_unique) → antar worker gunicorn pun hanya 1
+#   ✔ Baris diklaim atomik (pending → running) sebelum diproses
+#   ✔ Rate limit MusicBrainz: maksimal 1 request / detik
+# ============================================================================
+
+import os
+import time
+import threading
+
+from app.database.BMS_db_pool import get_connection
+from app.routes.BMS_jobs.jobs_queue import register_handler, submit_unique
+from app.routes.BMS_image import safe_build_variants
+from app.routes.BMS_mp3.BMS_mp3_online_cover import (
+    lookup_musicbrainz_cover,
+    download_image,
+    CoverLookupError
+)
+from app.routes.BMS_mp3.BMS_mp3_dominant_color import save_dominant_color
+from app.routes.BMS_mp3.BMS_mp3_db import get_db as get_mp3_db
+
+JOB_KIND = "mp3.cover_resolve"
+
+# Cover ketemu & tersimpan → tidak dicari lagi selama ini (detik)
+HIT_TTL = 90 * 24 * 3600
+
+# Tidak ketemu → coba lagi setelah ini
+MISS_TTL = 7 * 24 * 3600
+
+# Gagal jaringan / HTTP → coba lagi lebih cepat
+ERROR_TTL = 3600
+
+# Pending / running yang tidak pernah selesai (job mati) → boleh diantrikan ulang
+PENDING_TTL = 600
+
+# Jarak minimum antar request ke MusicBrainz (detik)
+MIN_INTERVAL = 1.0
+
+_rate_lock = threading.Lock()
+_last_request = 0.0
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+
+# ============================================================================
+#   DATABASE
+# ============================================================================
+def get_db():
+    """
+    status : pending | running | hit | miss | error
+    """
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cover_lookup (
+                path TEXT PRIMARY KEY,
+                thumb_path TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                source_url TEXT,
+                error TEXT,
+                requested_at REAL,
+                checked_at REAL,
+                expires_at REAL
+            )
+        """)
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_cover_lookup_status
+            ON cover_lookup(status, requested_at)
+        """)
+        conn.commit()
+        _table_ready = True
+
+    return conn
+
+
+# ============================================================================
+#   API: minta cover (dipanggil dari route, tidak blocking)
+# ============================================================================
+def _negative(row, now):
+    """
+    Entri pending / running / miss / error yang belum kadaluarsa.
+    ('hit' tanpa file = cover terhapus → bukan negatif)
+    """
+    return row is not None and row["status"] != "hit" and row["expires_at"] >= now
+
+
+def _lookup_row(conn, mp3_path):
+    return conn.execute(
+        "SELECT status, expires_at FROM cover_lookup WHERE path=?", (mp3_path,)
+    ).fetchone()
+
+
+def cover_negative(mp3_path):
+    """
+    True jika cover file ini sudah diketahui tidak ada di ID3 dan lookup
+    online masih antri / belum ketemu → route langsung kirim default
+    (tanpa membuka file dengan mutagen).
+    """
+    return _negative(_lookup_row(get_db(), mp3_path), time.time())
+
+
+def request_cover(mp3_path, thumb_path):
+    """
+    Antrikan lookup cover online untuk mp3_path.
+    Tidak melakukan apa-apa (tanpa tulis DB) jika hasil sebelumnya
+    masih berlaku. Return True jika masuk antrian.
+    """
+    now = time.time()
+    conn = get_db()
+
+    if _negative(_lookup_row(conn, mp3_path), now):
+        return False
+
+    # WHERE tetap dicek: request lain bisa sudah mengantrikan lebih dulu
+    cur = conn.execute("""
+        INSERT INTO cover_lookup
+            (path, thumb_path, status, requested_at, expires_at)
+        VALUES (?,?,'pending',?,?)
+        ON CONFLICT(path) DO UPDATE SET
+            thumb_path=excluded.thumb_path,
+            status='pending',
+            requested_at=excluded.requested_at,
+            expires_at=excluded.expires_at
+        WHERE cover_lookup.expires_at < ? OR cover_lookup.status='hit'
+    """, (mp3_path, thumb_path, now, now + PENDING_TTL, now))
+    conn.commit()
+
+    if cur.rowcount == 0:
+        return False
+
+    submit_unique(JOB_KIND, {})
+    return True
+
+
+# ============================================================================
+#   RATE LIMIT
+# ============================================================================
+def _wait_rate_limit():
+    global _last_request
+    with _rate_lock:
+        delay = _last_request + MIN_INTERVAL - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        _last_request = time.time()
+
+
+# ============================================================================
+#   RESOLVE 1 FILE
+# ============================================================================
+def resolve_one(mp3_path, thumb_path):
+    """
+    Return (status, source_url, error)
+    """
+    # Tag ID3 (stage metadata) lebih akurat daripada nama file
+    tags = get_mp3_db().execute(
+        "SELECT title, artist FROM mp3_tracks WHERE filepath=?", (mp3_path,)
+    ).fetchone()
+
+    _wait_rate_limit()
+
+    try:
+        url = lookup_musicbrainz_cover(
+            os.path.basename(mp3_path),
+            title=tags["title"] if tags else None,
+            artist=tags["artist"] if tags else None
+        )
+    except CoverLookupError as e:
+        return "error", None, str(e)
+
+    if not url:
+        return "miss", None, None
+
+    if not download_image(url, thumb_path):
+        return "miss", url, None
+
+    save_dominant_color(thumb_path)
+    safe_build_variants(thumb_path)
+    return "hit", url, None
+
+
+def _claim_next(conn):
+    """
+    Ambil 1 baris pending & tandai running (klaim atomik, pola sama dengan
+    jobs_queue._claim_next). Return row atau None jika antrian kosong.
+    """
+    while True:
+        row = conn.execute("""
+            SELECT path, thumb_path FROM cover_lookup
+            WHERE status='pending'
+            ORDER BY requested_at ASC
+            LIMIT 1
+        """).fetchone()
+        if row is None:
+            return None
+
+        now = time.time()
+        cur = conn.execute("""
+            UPDATE cover_lookup SET status='running', checked_at=?, expires_at=?
+            WHERE path=? AND status='pending'
+        """, (now, now + PENDING_TTL, row["path"]))
+        conn.commit()
+
+        if cur.rowcount == 1:
+            return row
+
+
+# ============================================================================
+#   JOB HANDLER: kuras antrian pending
+# ============================================================================
+@register_handler(JOB_KIND)
+def job_cover_resolve(ctx, payload):
+    ttl = {"hit": HIT_TTL, "miss": MISS_TTL, "error": ERROR_TTL}
+    counts = {"hit": 0, "miss": 0, "error": 0}
+
+    conn = get_db()
+
+    while True:
+        ctx.check_cancel()
+
+        row = _claim_next(conn)
+        if row is None:
+            break
+
+        if os.path.exists(row["thumb_path"]):
+            # Sudah didapat dari jalur lain (ID3 / scan)
+            status, url, err = "hit", None, None
+        else:
+            status, url, err = resolve_one(row["path"], row["thumb_path"])
+
+        now = time.time()
+        conn.execute("""
+            UPDATE cover_lookup
+            SET status=?, source_url=?, error=?, checked_at=?, expires_at=?
+            WHERE path=?
+        """, (status, url, err, now, now + ttl[status], row["path"]))
+        conn.commit()
+
+        counts[status] += 1
+        done = sum(counts.values())
+        ctx.update(message=f"Cover online {done} (hit {counts['hit']})")
+
+    return counts
@@ -1,18 +1,30 @@
 # ============================================================================
 #   BMS MP3 MODULE — DATABASE & HELPER (FINAL)
 #   Mengelola:
-#     ✔ Koneksi SQLite
-#     ✔ Inisialisasi tabel
-#     ✔ Migrasi kolom baru
+#     ✔ Koneksi SQLite (pool bersama, WAL)
+#     ✔ Inisialisasi tabel (folder, track, palette)
+#     ✔ Migrasi kolom baru, indeks & counter per folder
+#     ✔ Katalog bersama: 1 baris mp3_tracks per file, akses per user
+#       lewat mp3_library (favorit & play_count per user)
 #     ✔ Helper user_id & validasi MP3
 # ============================================================================
 
 import os
-import sqlite3
 from flask import session
 
-from app.BMS_config import DB_PATH, MUSIC_FOLDER
+from app.BMS_config import MUSIC_FOLDER
+from app.database.BMS_db_pool import get_connection
 from app.routes.BMS_logger import BMS_write_log
+from app.routes.BMS_library.library_search import ensure_track_index
+from app.routes.BMS_library.library_acl import ensure_library
+from .BMS_mp3_metadata import META_COLUMNS
+
+# Kolom relasi entitas browse di mp3_tracks
+BROWSE_COLUMNS = {
+    "artist_id": "INTEGER",
+    "album_id": "INTEGER",
+    "genre_id": "INTEGER",
+}
 
 # Pastikan folder media ada
 os.makedirs(MUSIC_FOLDER, exist_ok=True)
@@ -26,8 +38,7 @@ def get_db():
     Membuka koneksi ke database SQLite dan memastikan struktur tabel siap.
     """
     global _db_initialized
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    conn = get_connection()
 
     if not _db_initialized:
         try:
@@ -61,6 +72,61 @@ def get_db():
                 )
             """)
 
+            # ================== PALETTE TABLE ==================
+            # key = nama thumbnail (md5 path MP3), lihat BMS_mp3_thumbnail
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS mp3_palette (
+                    thumb_name TEXT PRIMARY KEY,
+                    dominant TEXT,
+                    vibrant TEXT,
+                    muted TEXT,
+                    updated_at INTEGER
+                )
+            """)
+
+            # ================== ARTIST / ALBUM / GENRE ==================
+            # Entitas hasil metadata (per user) + agregat yang dijaga
+            # oleh stage metadata (lihat BMS_mp3_browse)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS mp3_artists (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    name TEXT,
+                    name_key TEXT NOT NULL,
+                    track_count INTEGER DEFAULT 0,
+                    album_count INTEGER DEFAULT 0,
+                    total_duration REAL DEFAULT 0,
+                    UNIQUE (user_id, name_key)
+                )
+            """)
+
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS mp3_albums (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    artist_id INTEGER,
+                    title TEXT,
+                    title_key TEXT NOT NULL,
+                    year INTEGER,
+                    track_count INTEGER DEFAULT 0,
+                    total_duration REAL DEFAULT 0,
+                    cover_track_id INTEGER,
+                    UNIQUE (user_id, artist_id, title_key)
+                )
+            """)
+
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS mp3_genres (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id TEXT NOT NULL,
+                    name TEXT,
+                    name_key TEXT NOT NULL,
+                    track_count INTEGER DEFAULT 0,
+                    total_duration REAL DEFAULT 0,
+                    UNIQUE (user_id, name_key)
+                )
+            """)
+
             conn.commit()
 
             # ================== MIGRATION CHECK ==================
@@ -93,12 +159,60 @@ def get_db():
                     "ALTER TABLE mp3_tracks ADD COLUMN cover_path TEXT;"
                 )
 
+            # Kolom metadata ID3 (BMS_mp3_metadata) + relasi artist/album/genre
+            for col, tipe in {**META_COLUMNS, **BROWSE_COLUMNS}.items():
+                if col not in existing_cols:
+                    add_cols.append(
+                        f"ALTER TABLE mp3_tracks ADD COLUMN {col} {tipe};"
+                    )
+
             for cmd in add_cols:
                 try:
                     cur.execute(cmd)
                 except Exception:
                     pass  # kolom sudah ada → aman
 
+            # ================== INDEKS ==================
+            # List track per folder (katalog bersama, disaring mp3_library)
+            # → cukup baca indeks, tanpa scan seluruh tabel
+            try:
+                cur.execute("DROP INDEX IF EXISTS idx_mp3_tracks_user_folder")
+                cur.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_mp3_tracks_folder
+                    ON mp3_tracks(folder_id, filename)
+                """)
+            except Exception:
+                pass  # indeks sudah ada → aman
+
+            # Browse artist / album / genre
+            for idx, table, cols in (
+                ("idx_mp3_tracks_artist", "mp3_tracks", "artist_id"),
+                ("idx_mp3_tracks_album", "mp3_tracks", "album_id, disc_no, track_no"),
+                ("idx_mp3_tracks_genre", "mp3_tracks", "genre_id"),
+                ("idx_mp3_albums_artist", "mp3_albums", "artist_id"),
+            ):
+                try:
+                    cur.execute(
+                        f"CREATE INDEX IF NOT EXISTS {idx} ON {table}({cols})"
+                    )
+                except Exception:
+                    pass  # indeks sudah ada → aman
+
+            # user_id katalog tidak dipakai lagi (mp3_library) dan query
+            # track tanpa metadata (OR) tetap scan tabel → indeks lama dibuang
+            cur.execute("DROP INDEX IF EXISTS idx_mp3_tracks_meta_pending")
+
+            # ================== PUSTAKA PER USER ==================
+            # Tabel baru → pindahkan data lama (1 baris track per user)
+            if ensure_library(cur, "track"):
+                _migrate_shared_catalog(cur)
+
+            # ================== COUNTER PER FOLDER ==================
+            ensure_folder_stats(cur)
+
+            # ================== INDEX PENCARIAN (FTS5) ==================
+            ensure_track_index(cur)
+
             conn.commit()
             _db_initialized = True
 
@@ -108,6 +222,123 @@ def get_db():
     return conn
 
 
+# ============================================================================
+#   MIGRASI KE KATALOG BERSAMA
+#   Dulu: mp3_tracks.user_id / is_favorite / play_count per baris,
+#   artist / album / genre per user, scan_state per user ('mp3:<owner>')
+# ============================================================================
+def _migrate_shared_catalog(cur):
+    cur.execute("""
+        INSERT OR IGNORE INTO mp3_library
+            (user_id, track_id, is_favorite, play_count, added_at)
+        SELECT user_id, id, COALESCE(is_favorite, 0), COALESCE(play_count, 0), added_at
+        FROM mp3_tracks
+        WHERE user_id IS NOT NULL
+    """)
+
+    # Entitas browse jadi bersama → bangun ulang dari tag yang tersimpan
+    from .BMS_mp3_browse import link_tracks
+
+    cur.execute("DELETE FROM mp3_artists")
+    cur.execute("DELETE FROM mp3_albums")
+    cur.execute("DELETE FROM mp3_genres")
+    cur.execute("UPDATE mp3_tracks SET artist_id=NULL, album_id=NULL, genre_id=NULL")
+    link_tracks(cur, [
+        r["filepath"] for r in cur.execute(
+            "SELECT filepath FROM mp3_tracks WHERE meta_mtime_ns IS NOT NULL"
+        ).fetchall()
+    ])
+
+    # Scan berikutnya memakai 1 scope bersama
+    if cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='scan_state'"
+    ).fetchone():
+        cur.execute("DELETE FROM scan_state WHERE scope LIKE 'mp3:%'")
+
+
+# ============================================================================
+#   COUNTER JUMLAH TRACK PER (USER, FOLDER)
+#   Dijaga otomatis oleh trigger di mp3_library → /mp3/folders tidak perlu COUNT(*)
+# ============================================================================
+def ensure_folder_stats(cur):
+    exists = cur.execute("""
+        SELECT 1 FROM sqlite_master
+        WHERE type='table' AND name='mp3_folder_stats'
+    """).fetchone()
+
+    # Trigger lama (berbasis mp3_tracks.user_id) → ganti
+    legacy = cur.execute("""
+        SELECT 1 FROM sqlite_master
+        WHERE type='trigger' AND name='trg_mp3_tracks_count_ins'
+    """).fetchone()
+    for name in ("ins", "del", "upd"):
+        cur.execute(f"DROP TRIGGER IF EXISTS trg_mp3_tracks_count_{name}")
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS mp3_folder_stats (
+            user_id TEXT NOT NULL,
+            folder_id INTEGER NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, folder_id)
+        )
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mp3_library_count_ins
+        AFTER INSERT ON mp3_library
+        BEGIN
+            INSERT INTO mp3_folder_stats (user_id, folder_id, total)
+            SELECT NEW.user_id, folder_id, 1
+            FROM mp3_tracks
+            WHERE id = NEW.track_id AND folder_id IS NOT NULL
+            ON CONFLICT(user_id, folder_id) DO UPDATE SET total = total + 1;
+        END
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mp3_library_count_del
+        AFTER DELETE ON mp3_library
+        BEGIN
+            UPDATE mp3_folder_stats SET total = total - 1
+            WHERE user_id = OLD.user_id
+              AND folder_id = (SELECT folder_id FROM mp3_tracks WHERE id = OLD.track_id);
+            DELETE FROM mp3_folder_stats
+            WHERE user_id = OLD.user_id AND total <= 0;
+        END
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_mp3_tracks_folder_upd
+        AFTER UPDATE OF folder_id ON mp3_tracks
+        WHEN OLD.folder_id IS NOT NEW.folder_id
+        BEGIN
+            UPDATE mp3_folder_stats SET total = total - 1
+            WHERE folder_id = OLD.folder_id AND user_id IN (
+                SELECT user_id FROM mp3_library WHERE track_id = NEW.id
+            );
+            DELETE FROM mp3_folder_stats
+            WHERE folder_id = OLD.folder_id AND total <= 0;
+            INSERT INTO mp3_folder_stats (user_id, folder_id, total)
+            SELECT user_id, NEW.folder_id, 1
+            FROM mp3_library
+            WHERE track_id = NEW.id AND NEW.folder_id IS NOT NULL
+            ON CONFLICT(user_id, folder_id) DO UPDATE SET total = total + 1;
+        END
+    """)
+
+    # Tabel baru / migrasi → isi ulang dari pustaka
+    if not exists or legacy:
+        cur.execute("DELETE FROM mp3_folder_stats")
+        cur.execute("""
+            INSERT INTO mp3_folder_stats (user_id, folder_id, total)
+            SELECT l.user_id, t.folder_id, COUNT(*)
+            FROM mp3_library l
+            JOIN mp3_tracks t ON t.id = l.track_id
+            WHERE t.folder_id IS NOT NULL
+            GROUP BY l.user_id, t.folder_id
+        """)
+
+
 # ============================================================================
 #   USER IDENTIFIER HELPER
 # ============================================================================
@@ -127,8 +358,29 @@ def current_user_identifier():
 # ============================================================================
 #   FILE HELPER
 # ============================================================================
+# Audio yang masuk library musik (lossless diputar via /mp3/stream)
+AUDIO_EXTS = (".mp3", ".flac", ".wav", ".ogg", ".opus", ".m4a", ".aac")
+
+# Mimetype file asli untuk /mp3/play
+AUDIO_MIMETYPES = {
+    ".mp3": "audio/mpeg",
+    ".flac": "audio/flac",
+    ".wav": "audio/wav",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+}
+
+
 def is_mp3(name):
     """
-    Cek apakah file adalah MP3.
+    Cek apakah file adalah audio library (MP3 / FLAC / WAV / ...).
+    Nama fungsi dipertahankan karena dipakai scanner & modul lain.
     """
-    return isinstance(name, str) and name.lower().endswith(".mp3")
\ No newline at end of file
+    return isinstance(name, str) and name.lower().endswith(AUDIO_EXTS)
+
+
+def audio_mimetype(path):
+    ext = os.path.splitext(path)[1].lower()
+    return AUDIO_MIMETYPES.get(ext, "application/octet-stream")
\ No newline at end of file
@@ -1,38 +1,147 @@
 # ============================================================================
-#   BMS MP3 — DOMINANT COLOR EXTRACTOR
-#   ✔ Ekstrak warna dominan dari cover (Pillow)
-#   ✔ Aman & ringan
-#   ✔ Cocok untuk UI theming
+#   BMS MP3 — PALETTE ENGINE (dominant / vibrant / muted)
+#   ✔ Kuantisasi Pillow (median cut) pada buffer kecil → tanpa list piksel
+#   ✔ Stabil untuk JPEG (warna mirip digabung, bukan dihitung persis)
+#   ✔ Batch: dijalankan untuk semua thumbnail hasil scan
+#   ✔ Disimpan di tabel mp3_palette (bukan file .color)
 # ============================================================================
 
 import os
+import time
+import colorsys
 from PIL import Image
-from collections import Counter
 
+from .BMS_mp3_db import get_db
 
-def extract_dominant_color(image_path: str) -> str | None:
+# Ukuran buffer analisa (px)
+SAMPLE_SIZE = 64
+
+# Jumlah warna hasil kuantisasi
+PALETTE_COLORS = 8
+
+
+def _hex(rgb):
+    r, g, b = rgb
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def extract_palette(image_path: str) -> dict | None:
     """
-    Mengambil warna dominan dari gambar
-    Return: hex color (#rrggbb) atau None
+    Ambil palette dari gambar.
+    Return: {"dominant", "vibrant", "muted"} (hex #rrggbb) atau None
     """
     if not os.path.exists(image_path):
         return None
 
     try:
-        img = Image.open(image_path).convert("RGB")
+        with Image.open(image_path) as img:
+            img.draft("RGB", (SAMPLE_SIZE, SAMPLE_SIZE))
+            img = img.convert("RGB")
+            img.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+
+            q = img.quantize(colors=PALETTE_COLORS, method=Image.Quantize.MEDIANCUT)
+            pal = q.getpalette()
+            counts = q.getcolors(PALETTE_COLORS) or []
+
+    except Exception:
+        return None
+
+    if not counts:
+        return None
+
+    # (jumlah piksel, (r,g,b), (h,s,v))
+    colors = []
+    for count, idx in counts:
+        rgb = tuple(pal[idx * 3: idx * 3 + 3])
+        hsv = colorsys.rgb_to_hsv(*(c / 255 for c in rgb))
+        colors.append((count, rgb, hsv))
 
-        # kecilkan agar cepat
-        img = img.resize((64, 64))
+    colors.sort(key=lambda c: c[0], reverse=True)
+    total = sum(c[0] for c in colors)
 
-        pixels = list(img.getdata())
+    dominant = colors[0][1]
 
-        # ambil warna paling sering
-        most_common = Counter(pixels).most_common(1)
-        if not most_common:
-            return None
+    # Vibrant: saturasi & kecerahan tinggi, berbobot jumlah piksel
+    vibrant = max(
+        colors,
+        key=lambda c: c[2][1] * (0.5 + c[2][2]) * (0.3 + c[0] / total)
+    )[1]
 
-        r, g, b = most_common[0][0]
-        return f"#{r:02x}{g:02x}{b:02x}"
+    # Muted: saturasi rendah, kecerahan sedang
+    muted = max(
+        colors,
+        key=lambda c: (1 - c[2][1]) * (1 - abs(c[2][2] - 0.5)) * (0.3 + c[0] / total)
+    )[1]
 
+    return {
+        "dominant": _hex(dominant),
+        "vibrant": _hex(vibrant),
+        "muted": _hex(muted)
+    }
+
+
+def extract_dominant_color(image_path: str) -> str | None:
+    """
+    Mengambil warna dominan dari gambar
+    Return: hex color (#rrggbb) atau None
+    """
+    palette = extract_palette(image_path)
+    return palette["dominant"] if palette else None
+
+
+# ============================================================================
+#   SIMPAN & BACA (tabel mp3_palette, key = nama thumbnail)
+# ============================================================================
+def save_palettes(thumb_paths, ctx=None):
+    """
+    Hitung palette untuk banyak thumbnail lalu simpan sekaligus.
+    Return jumlah palette tersimpan.
+    """
+    rows = []
+    now = int(time.time())
+    total = len(thumb_paths) or 1
+
+    for i, thumb_path in enumerate(thumb_paths):
+        if ctx:
+            ctx.check_cancel()
+            ctx.update(progress=i * 100 / total, message=f"Palette {i}/{total}")
+
+        palette = extract_palette(thumb_path)
+        if palette:
+            rows.append((
+                os.path.basename(thumb_path),
+                palette["dominant"],
+                palette["vibrant"],
+                palette["muted"],
+                now
+            ))
+
+    if rows:
+        conn = get_db()
+        conn.executemany("""
+            INSERT OR REPLACE INTO mp3_palette
+                (thumb_name, dominant, vibrant, muted, updated_at)
+            VALUES (?,?,?,?,?)
+        """, rows)
+        conn.commit()
+
+    return len(rows)
+
+
+def save_dominant_color(thumb_path: str):
+    """
+    Extract & simpan palette 1 thumbnail (aman, tidak raise)
+    """
+    try:
+        save_palettes([thumb_path])
     except Exception:
-        return None
\ No newline at end of file
+        pass
+
+
+def get_palette(thumb_name: str) -> dict | None:
+    conn = get_db()
+    row = conn.execute("""
+        SELECT dominant, vibrant, muted FROM mp3_palette
+        WHERE thumb_name=?
+    """, (thumb_name,)).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,146 @@
+# ============================================================================
+#   BMS MP3 — METADATA STAGE (ID3 / Vorbis comment + info audio)
+#   ✔ 1x buka file: tag, durasi, bitrate, sample rate, track/disc, cover
+#   ✔ MP3 & WAV lewat frame ID3, FLAC / OGG / M4A lewat tag "easy" mutagen
+#   ✔ Hanya diproses ulang jika mtime file berubah (meta_mtime_ns)
+#   ✔ Disimpan di kolom mp3_tracks → list tidak perlu buka file lagi
+# ============================================================================
+
+import os
+
+from mutagen import File as MutagenFile
+from mutagen.mp3 import MP3, HeaderNotFoundError
+from mutagen.id3 import ID3, ID3NoHeaderError
+
+from .BMS_mp3_cover import save_apic, save_picture
+
+# Kolom metadata di mp3_tracks (nama kolom → tipe SQL)
+META_COLUMNS = {
+    "title": "TEXT",
+    "artist": "TEXT",
+    "album": "TEXT",
+    "album_artist": "TEXT",
+    "genre": "TEXT",
+    "year": "INTEGER",
+    "track_no": "INTEGER",
+    "disc_no": "INTEGER",
+    "duration": "REAL",
+    "bitrate": "INTEGER",
+    "sample_rate": "INTEGER",
+    "channels": "INTEGER",
+    "meta_mtime_ns": "INTEGER",
+}
+
+# Frame ID3 → kolom
+_TEXT_FRAMES = {
+    "title": "TIT2",
+    "artist": "TPE1",
+    "album": "TALB",
+    "album_artist": "TPE2",
+    "genre": "TCON",
+}
+
+# Kunci tag "easy" (Vorbis comment / EasyMP4) → kolom
+_EASY_KEYS = {
+    "title": "title",
+    "artist": "artist",
+    "album": "album",
+    "album_artist": "albumartist",
+    "genre": "genre",
+}
+
+
+def _text(tags, frame):
+    f = tags.get(frame) if tags else None
+    if not f or not getattr(f, "text", None):
+        return None
+    value = str(f.text[0]).strip()
+    return value or None
+
+
+def _easy(tags, key):
+    try:
+        values = tags.get(key)
+    except (KeyError, ValueError):
+        return None
+    if not values:
+        return None
+    value = str(values[0]).strip()
+    return value or None
+
+
+def _number(value):
+    """'3/12' → 3, '2019-05-01' → 2019"""
+    if not value:
+        return None
+    head = str(value).split("/")[0].split("-")[0].strip()
+    return int(head) if head.isdigit() else None
+
+
+def _open(path):
+    """
+    Return (audio, tags, info). audio None jika format tidak dikenali.
+    """
+    if path.lower().endswith(".mp3"):
+        try:
+            audio = MP3(path)
+            return audio, audio.tags, audio.info
+        except HeaderNotFoundError:
+            # Frame audio rusak / tidak ada → tag saja
+            try:
+                return None, ID3(path), None
+            except ID3NoHeaderError:
+                return None, None, None
+
+    audio = MutagenFile(path, easy=True)
+    if audio is None:
+        return None, None, None
+    return audio, audio.tags, audio.info
+
+
+def read_metadata(mp3_path, cover_path=None):
+    """
+    Baca metadata 1 file audio (1x open).
+    cover_path diisi & belum ada → cover APIC / FLAC picture ikut disimpan.
+
+    Return (meta dict, cover_saved)
+    """
+    st = os.stat(mp3_path)
+    meta = {col: None for col in META_COLUMNS}
+    meta["meta_mtime_ns"] = st.st_mtime_ns
+
+    audio, tags, info = _open(mp3_path)
+
+    if info is not None:
+        meta["duration"] = round(float(getattr(info, "length", 0) or 0), 3) or None
+        meta["bitrate"] = int(getattr(info, "bitrate", 0) or 0) or None
+        meta["sample_rate"] = int(getattr(info, "sample_rate", 0) or 0) or None
+        meta["channels"] = int(getattr(info, "channels", 0) or 0) or None
+
+    if isinstance(tags, ID3):
+        for col, frame in _TEXT_FRAMES.items():
+            meta[col] = _text(tags, frame)
+
+        meta["year"] = _number(_text(tags, "TDRC") or _text(tags, "TYER"))
+        meta["track_no"] = _number(_text(tags, "TRCK"))
+        meta["disc_no"] = _number(_text(tags, "TPOS"))
+
+    elif tags:
+        for col, key in _EASY_KEYS.items():
+            meta[col] = _easy(tags, key)
+
+        meta["year"] = _number(_easy(tags, "date"))
+        meta["track_no"] = _number(_easy(tags, "tracknumber"))
+        meta["disc_no"] = _number(_easy(tags, "discnumber"))
+
+    cover_saved = False
+    if cover_path and not os.path.exists(cover_path):
+        try:
+            if isinstance(tags, ID3):
+                cover_saved = save_apic(tags, cover_path)
+            else:
+                cover_saved = save_picture(audio, cover_path)
+        except Exception:
+            cover_saved = False
+
+    return meta, cover_saved
@@ -3,8 +3,10 @@
 #   ✔ Tanpa API Key
 #   ✔ Gratis & legal
 #   ✔ Cari cover 1x lalu cache
+#   ✔ URL bisa diganti via env (server stub lokal untuk uji)
 # ============================================================================
 
+import os
 import re
 import requests
 
@@ -12,6 +14,18 @@ HEADERS = {
     "User-Agent": "BMS-Media-Server/1.0 (contact: local-admin)"
 }
 
+MUSICBRAINZ_URL = os.environ.get(
+    "BMS_MUSICBRAINZ_URL", "https://musicbrainz.org/ws/2"
+).rstrip("/")
+
+COVERART_URL = os.environ.get(
+    "BMS_COVERART_URL", "https://coverartarchive.org"
+).rstrip("/")
+
+
+class CoverLookupError(Exception):
+    """Gagal menghubungi MusicBrainz (jaringan / HTTP error), bukan 'tidak ketemu'."""
+
 # ============================================================
 #   CLEAN TITLE
 # ============================================================
@@ -28,29 +42,47 @@ def clean_title(filename: str) -> str:
 # ============================================================
 #   SEARCH MUSICBRAINZ
 # ============================================================
-def search_musicbrainz_cover(filename: str) -> str | None:
+def build_query(filename: str, title: str = None, artist: str = None) -> str:
+    """
+    Query MusicBrainz: pakai tag ID3 jika ada, jika tidak tebak dari nama file
+    """
+    if title:
+        title = title.replace('"', " ").strip()
+        query = f'recording:"{title}"'
+        if artist:
+            artist = artist.replace('"', " ").strip()
+            query += f' AND artist:"{artist}"'
+        return query
+
+    return clean_title(filename)
+
+
+def lookup_musicbrainz_cover(filename: str, title: str = None,
+                             artist: str = None) -> str | None:
     """
     Cari cover dari MusicBrainz + Cover Art Archive
-    Return: image_url atau None
+    Return: image_url, atau None jika memang tidak ketemu
+    Raise : CoverLookupError jika request gagal (boleh dicoba lagi)
     """
-    title = clean_title(filename)
-    if not title:
+    query = build_query(filename, title, artist)
+    if not query:
         return None
 
     try:
         r = requests.get(
-            "https://musicbrainz.org/ws/2/recording/",
+            f"{MUSICBRAINZ_URL}/recording/",
             params={
-                "query": title,
+                "query": query,
                 "fmt": "json",
                 "limit": 1
             },
             headers=HEADERS,
             timeout=6
         )
+        r.raise_for_status()
         data = r.json()
-    except Exception:
-        return None
+    except Exception as e:
+        raise CoverLookupError(str(e))
 
     recordings = data.get("recordings")
     if not recordings:
@@ -65,7 +97,18 @@ def search_musicbrainz_cover(filename: str) -> str | None:
         return None
 
     # Cover Art Archive (front cover)
-    return f"https://coverartarchive.org/release/{release_id}/front-500"
+    return f"{COVERART_URL}/release/{release_id}/front-500"
+
+
+def search_musicbrainz_cover(filename: str) -> str | None:
+    """
+    Versi aman lookup_musicbrainz_cover (tidak pernah raise)
+    Return: image_url atau None
+    """
+    try:
+        return lookup_musicbrainz_cover(filename)
+    except CoverLookupError:
+        return None
 
 
 # ============================================================
@@ -76,10 +119,12 @@ def download_image(url: str, dest: str) -> bool:
     Download image ke file lokal
     """
     try:
-        r = requests.get(url, timeout=8)
+        r = requests.get(url, headers=HEADERS, timeout=8)
         if r.status_code == 200 and r.headers.get("Content-Type", "").startswith("image"):
-            with open(dest, "wb") as f:
+            tmp = dest + ".tmp"
+            with open(tmp, "wb") as f:
                 f.write(r.content)
+            os.replace(tmp, dest)
             return True
     except Exception:
         pass
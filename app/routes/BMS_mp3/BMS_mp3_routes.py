@@ -2,9 +2,11 @@
 #   BMS MP3 MODULE — MAIN ROUTES (FINAL CLEAN)
 #   Mengatur:
 #       ✔ Folder List
-#       ✔ Track List (filepath DIKIRIM)
-#       ✔ Favorite ❤️
+#       ✔ Track List (filepath DIKIRIM, keyset ?after=&limit=&sort=)
+#       ✔ Favorite ❤️ & play_count per user (mp3_library)
 #       ✔ Streaming MP3 (Range Support)
+#       ✔ Transcode opus / mp3 / aac → BMS_mp3_transcode (/mp3/stream)
+#       ✔ Unduh folder / playlist sebagai ZIP / TAR streaming (/mp3/archive)
 #       ✔ Player Page
 #
 #   NOTE:
@@ -14,11 +16,28 @@
 # ============================================================================
 
 import os
-from flask import Blueprint, jsonify, request, send_file, Response, render_template
-from .BMS_mp3_db import get_db, current_user_identifier
+from flask import Blueprint, jsonify, request, render_template
+from app.routes.BMS_stream import send_media
+from app.routes.BMS_playback.playback_buffer import record_play
+from app.routes.BMS_library.library_pagination import (
+    make_sorts, parse_page_args, keyset_sql, build_page
+)
+from app.routes.BMS_library.library_archive import (
+    collect as collect_archive, library_items, archive_response,
+    parse_archive_args
+)
+from .BMS_mp3_db import get_db, current_user_identifier, audio_mimetype
 
 media_mp3 = Blueprint("media_mp3", __name__, url_prefix="/mp3")
 
+# Sort yang didukung list track (?sort=)
+TRACK_SORTS = make_sorts("t")
+TRACK_SORTS["play_count"] = ("l.play_count", int, "desc")
+TRACK_SORTS["title"] = ("COALESCE(t.title, t.filename)", str, "asc")
+TRACK_SORTS["artist"] = ("COALESCE(t.artist, '')", str, "asc")
+TRACK_SORTS["album"] = ("COALESCE(t.album, '')", str, "asc")
+TRACK_SORTS["duration"] = ("COALESCE(t.duration, 0)", float, "desc")
+
 
 # ============================================================================
 #   LIST FOLDERS
@@ -28,15 +47,14 @@ def list_folders():
     owner = current_user_identifier()
     conn = get_db()
 
+    # Counter per folder (dijaga trigger), hanya folder yang berisi MP3
     rows = conn.execute("""
-        SELECT f.id, f.folder_name,
-               (SELECT COUNT(*) FROM mp3_tracks t
-                WHERE t.folder_id = f.id AND t.user_id = ?) AS total_mp3
-        FROM mp3_folders f
-        WHERE (SELECT COUNT(*) FROM mp3_tracks t
-               WHERE t.folder_id = f.id AND t.user_id = ?) > 0
+        SELECT f.id, f.folder_name, s.total AS total_mp3
+        FROM mp3_folder_stats s
+        JOIN mp3_folders f ON f.id = s.folder_id
+        WHERE s.user_id = ? AND s.total > 0
         ORDER BY f.folder_name ASC
-    """, (owner, owner)).fetchall()
+    """, (owner,)).fetchall()
 
     conn.close()
     return jsonify([dict(r) for r in rows])
@@ -48,17 +66,27 @@ def list_folders():
 @media_mp3.route("/folder/<int:folder_id>/tracks")
 def folder_tracks(folder_id):
     owner = current_user_identifier()
+
+    try:
+        page = parse_page_args(request.args, TRACK_SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    where_sql, params, order_sql, limit_sql = keyset_sql(page, "t.id")
     conn = get_db()
 
-    rows = conn.execute("""
-        SELECT id, filename, filepath, size, is_favorite, play_count
-        FROM mp3_tracks
-        WHERE folder_id=? AND user_id=?
-        ORDER BY filename ASC
-    """, (folder_id, owner)).fetchall()
+    rows = conn.execute(f"""
+        SELECT t.id, t.filename, t.filepath, t.size, l.is_favorite, l.play_count,
+               t.title, t.artist, t.album, t.duration, t.track_no,
+               {page["expr"]} AS sort_value
+        FROM mp3_library l
+        JOIN mp3_tracks t ON t.id = l.track_id
+        WHERE t.folder_id=? AND l.user_id=?{where_sql}
+        {order_sql}{limit_sql}
+    """, [folder_id, owner] + params).fetchall()
 
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    return jsonify(build_page(rows, page))
 
 # list beberapa folder
 @media_mp3.route("/tracks/by-folders")
@@ -70,18 +98,27 @@ def tracks_by_folders():
     if not folder_ids:
         return jsonify([])
 
+    try:
+        page = parse_page_args(request.args, TRACK_SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    where_sql, params, order_sql, limit_sql = keyset_sql(page, "t.id")
     q = ",".join("?" * len(folder_ids))
     conn = get_db()
 
     rows = conn.execute(f"""
-        SELECT id, filename, filepath, folder_id
-        FROM mp3_tracks
-        WHERE user_id=? AND folder_id IN ({q})
-        ORDER BY filename ASC
-    """, [owner] + folder_ids).fetchall()
+        SELECT t.id, t.filename, t.filepath, t.folder_id,
+               t.title, t.artist, t.album, t.duration,
+               {page["expr"]} AS sort_value
+        FROM mp3_library l
+        JOIN mp3_tracks t ON t.id = l.track_id
+        WHERE l.user_id=? AND t.folder_id IN ({q}){where_sql}
+        {order_sql}{limit_sql}
+    """, [owner] + folder_ids + params).fetchall()
 
     conn.close()
-    return jsonify([dict(r) for r in rows])
+    return jsonify(build_page(rows, page))
 
 
 # ============================================================================
@@ -94,8 +131,8 @@ def toggle_favorite(track_id):
     cur = conn.cursor()
 
     row = cur.execute("""
-        SELECT is_favorite FROM mp3_tracks
-        WHERE id=? AND user_id=?
+        SELECT is_favorite FROM mp3_library
+        WHERE track_id=? AND user_id=?
     """, (track_id, owner)).fetchone()
 
     if not row:
@@ -105,8 +142,8 @@ def toggle_favorite(track_id):
     new_state = 0 if row["is_favorite"] else 1
 
     cur.execute("""
-        UPDATE mp3_tracks SET is_favorite=?
-        WHERE id=? AND user_id=?
+        UPDATE mp3_library SET is_favorite=?
+        WHERE track_id=? AND user_id=?
     """, (new_state, track_id, owner))
 
     conn.commit()
@@ -118,32 +155,16 @@ def toggle_favorite(track_id):
 # ============================================================================
 #   STREAM MP3 (RANGE SUPPORT)
 # ============================================================================
-def parse_range_header(path):
-    header = request.headers.get("Range")
-    if not header:
-        return None
-
-    try:
-        unit, rng = header.split("=")
-        start_s, end_s = rng.split("-")
-
-        size = os.path.getsize(path)
-        start = int(start_s) if start_s else 0
-        end = int(end_s) if end_s else size - 1
-
-        return start, end, size
-    except Exception:
-        return None
-
-
 @media_mp3.route("/play/<int:track_id>")
 def play(track_id):
     owner = current_user_identifier()
     conn = get_db()
 
     row = conn.execute("""
-        SELECT filepath FROM mp3_tracks
-        WHERE id=? AND user_id=?
+        SELECT t.filepath
+        FROM mp3_library l
+        JOIN mp3_tracks t ON t.id = l.track_id
+        WHERE l.track_id=? AND l.user_id=?
     """, (track_id, owner)).fetchone()
 
     conn.close()
@@ -153,35 +174,63 @@ def play(track_id):
 
     fp = row["filepath"]
 
-    # update play count (silent)
+    if not os.path.exists(fp):
+        return jsonify({"error": "File fisik hilang"}), 404
+
+    # 1 play per sesi (Range lanjutan tidak dihitung), ditulis batch
+    record_play(owner, "track", track_id)
+
+    return send_media(fp, audio_mimetype(fp))
+
+
+# ============================================================================
+#   UNDUH ARSIP  (?tracks=3,1,2 playlist | ?folders=1,2 folder)
+# ============================================================================
+@media_mp3.route("/archive", methods=["GET", "POST"])
+def archive():
+    owner = current_user_identifier()
+    track_ids = [int(i) for i in request.values.get("tracks", "").split(",") if i.isdigit()]
+    folder_ids = [int(i) for i in request.values.get("folders", "").split(",") if i.isdigit()]
+
+    if not track_ids and not folder_ids:
+        return jsonify({"error": "tracks / folders wajib diisi"}), 400
+
     try:
-        conn = get_db()
-        conn.execute("""
-            UPDATE mp3_tracks
-            SET play_count = play_count + 1
-            WHERE id=? AND user_id=?
-        """, (track_id, owner))
-        conn.commit()
-        conn.close()
-    except Exception:
-        pass
+        fmt, compress = parse_archive_args(request.values)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db()
+    rows = []
+
+    # Batch 500 → aman dari batas variabel SQLite
+    for key, ids in (("t.id", track_ids), ("t.folder_id", folder_ids)):
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            rows += conn.execute(f"""
+                SELECT t.id, t.filename, t.filepath, t.folder_id, f.folder_name
+                FROM mp3_library l
+                JOIN mp3_tracks t ON t.id = l.track_id
+                LEFT JOIN mp3_folders f ON f.id = t.folder_id
+                WHERE l.user_id=? AND {key} IN ({",".join("?" * len(batch))})
+                ORDER BY f.folder_name, t.filename
+            """, [owner] + batch).fetchall()
 
-    r = parse_range_header(fp)
-    if r:
-        start, end, size = r
-        length = end - start + 1
+    conn.close()
+
+    try:
+        entries = collect_archive(library_items(rows, track_ids))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-        with open(fp, "rb") as f:
-            f.seek(start)
-            data = f.read(length)
+    if not entries:
+        return jsonify({"error": "Track tidak ditemukan"}), 404
 
-        resp = Response(data, 206, mimetype="audio/mpeg")
-        resp.headers.add("Content-Range", f"bytes {start}-{end}/{size}")
-        resp.headers.add("Accept-Ranges", "bytes")
-        resp.headers.add("Content-Length", str(length))
-        return resp
+    name = "playlist"
+    if not track_ids and len(folder_ids) == 1 and rows[0]["folder_name"]:
+        name = rows[0]["folder_name"]
 
-    return send_file(fp, mimetype="audio/mpeg")
+    return archive_response(entries, request.values.get("name") or name, fmt, compress)
 
 
 # ============================================================================
@@ -1,19 +1,32 @@
 # ============================================================================
 #   BMS MP3 MODULE — SCAN STORAGE (PATH-BASED THUMBNAIL)
-#   ✔ Scan storage (Android / Termux)
-#   ✔ Import folder & track MP3
-#   ✔ Thumbnail GLOBAL berbasis PATH (ID3 cover)
+#   ✔ Scan storage incremental (Android / Termux)
+#   ✔ Import folder & track MP3 (batch executemany) ke katalog bersama,
+#     lalu seluruh katalog dimasukkan ke pustaka user yang scan
+#   ✔ Track yang hilang dari disk otomatis dihapus
+#   ✔ Scan & ekstrak cover berjalan sebagai job background (BMS_jobs)
+#   ✔ Stage metadata: tag ID3, durasi, bitrate + cover dalam 1x buka file
+#   ✔ Artist / album / genre diperbarui incremental (BMS_mp3_browse)
+#   ✔ Thumbnail GLOBAL berbasis PATH (ID3 cover + varian 64/256/512)
 # ============================================================================
 
 import os
 import hashlib
 from datetime import datetime
-from flask import Blueprint, jsonify, session
-
-from app.routes.BMS_mp3.BMS_mp3_cover import extract_cover
+from flask import Blueprint, jsonify, request, session
+
+from app.routes.BMS_mp3.BMS_mp3_metadata import read_metadata, META_COLUMNS
+from app.routes.BMS_mp3.BMS_mp3_dominant_color import save_palettes
+from app.routes.BMS_image import safe_build_variants, remove_variants
+from app.routes.BMS_library.library_scanner import (
+    scan_incremental, scan_paths, media_roots
+)
+from app.routes.BMS_library.library_acl import grant_all, grant_paths
+from app.routes.BMS_jobs.jobs_queue import register_handler, submit
 from app.routes.BMS_logger import BMS_write_log
 from app.BMS_config import PICTURES_FOLDER
 from .BMS_mp3_db import get_db, current_user_identifier, is_mp3
+from .BMS_mp3_browse import link_tracks, collect_entities, recompute_entities
 
 mp3_scan = Blueprint("mp3_scan", __name__, url_prefix="/mp3")
 
@@ -23,6 +36,12 @@ mp3_scan = Blueprint("mp3_scan", __name__, url_prefix="/mp3")
 THUMBNAIL_MP3_FOLDER = os.path.join(PICTURES_FOLDER, "thumbnail_mp3")
 os.makedirs(THUMBNAIL_MP3_FOLDER, exist_ok=True)
 
+# Batas jumlah nama file yang disimpan di result job
+MAX_NAMES = 200
+
+# Jumlah baris metadata per commit
+META_BATCH = 200
+
 
 # ============================================================================
 #   HELPER: thumbnail name berbasis PATH (GLOBAL)
@@ -33,126 +52,313 @@ def get_mp3_thumbnail_name(mp3_path):
 
 
 # ============================================================================
-#   SCAN STORAGE
+#   SCAN + IMPORT (INCREMENTAL) — dijalankan sebagai job background
 # ============================================================================
-def scan_storage_for_mp3():
-    ROOT = "/storage/emulated/0"
-    if not os.path.exists(ROOT):
-        ROOT = os.path.expanduser("~")
+def run_mp3_scan(owner, full=False, ctx=None, paths=None):
+    """
+    Scan storage & sinkronkan katalog mp3_folders / mp3_tracks (1 baris per file),
+    lalu beri owner akses ke seluruh katalog (mp3_library).
+    paths → hanya path itu yang diperiksa (watcher).
+    owner None → track baru masuk pustaka semua anggota (grant_paths).
+    Return ringkasan hasil (JSON-able).
+    """
+    conn = get_db()
+    cur = conn.cursor()
+
+    folders_added = []
+    tracks_added = []
+
+    try:
+        if ctx:
+            ctx.update(progress=5, message="Membaca storage...")
+
+        # 1 scope untuk semua user: file yang sama tidak di-scan ulang per user
+        if paths is not None:
+            result = scan_paths(conn, "mp3", is_mp3, paths)
+        else:
+            result = scan_incremental(
+                conn, "mp3", is_mp3, roots=media_roots(), full=full
+            )
+
+        if ctx:
+            ctx.check_cancel()
+            ctx.update(progress=60, message="Menyimpan ke database...")
+
+        # ================================
+        # CACHE FOLDER & TRACK KATALOG (1 query)
+        # ================================
+        folder_ids = {
+            r["folder_path"]: r["id"]
+            for r in cur.execute("SELECT id, folder_path FROM mp3_folders")
+        }
+        existing = {
+            r["filepath"]
+            for r in cur.execute("SELECT filepath FROM mp3_tracks")
+        }
+
+        # ================================
+        # FILE MP3 BARU
+        # ================================
+        added_at = datetime.utcnow().isoformat()
+        new_rows = []
+
+        for fp, size in result["new"]:
+            if fp in existing:
+                continue
+
+            folder_path = os.path.dirname(fp)
+            folder_id = folder_ids.get(folder_path)
+
+            if folder_id is None:
+                folder_name = os.path.basename(folder_path) or folder_path
+                # OR IGNORE: watcher & scan manual bisa berjalan bersamaan
+                cur.execute(
+                    "INSERT OR IGNORE INTO mp3_folders (folder_name, folder_path) VALUES (?,?)",
+                    (folder_name, folder_path)
+                )
+                if cur.rowcount:
+                    folder_id = cur.lastrowid
+                    folders_added.append(folder_name)
+                else:
+                    folder_id = cur.execute(
+                        "SELECT id FROM mp3_folders WHERE folder_path=?",
+                        (folder_path,)
+                    ).fetchone()["id"]
+                folder_ids[folder_path] = folder_id
+
+            fn = os.path.basename(fp)
+            new_rows.append((folder_id, fn, fp, size, added_at))
+            tracks_added.append(fn)
+
+        cur.executemany("""
+            INSERT OR IGNORE INTO mp3_tracks
+            (folder_id, filename, filepath, size, added_at)
+            VALUES (?,?,?,?,?)
+        """, new_rows)
+
+        # ================================
+        # FILE BERUBAH / HILANG
+        # ================================
+        cur.executemany(
+            "UPDATE mp3_tracks SET size=? WHERE filepath=?",
+            [(size, fp) for fp, size in result["changed"]]
+        )
+        removed_ids = []
+        for i in range(0, len(result["removed"]), 500):
+            batch = result["removed"][i:i + 500]
+            removed_ids += [
+                r["id"] for r in cur.execute(f"""
+                    SELECT id FROM mp3_tracks
+                    WHERE filepath IN ({",".join("?" * len(batch))})
+                """, batch)
+            ]
+
+        affected = collect_entities(cur, removed_ids)
+        cur.executemany(
+            "DELETE FROM mp3_tracks WHERE id=?",
+            [(i,) for i in removed_ids]
+        )
+
+        # Artist / album / genre yang kehilangan track
+        recompute_entities(cur, affected)
+
+        # ================================
+        # AKSES OWNER → seluruh katalog
+        # ================================
+        if owner is None:
+            granted = grant_paths(cur, "track", [r[2] for r in new_rows], added_at)
+        else:
+            granted = grant_all(cur, "track", owner, added_at)
 
-    MAX_FOLDERS = 200
-    MAX_FILES = 300
+        conn.commit()
 
-    folders = []
-    used = 0
+    except Exception:
+        conn.rollback()
+        raise
 
-    for root, dirs, files in os.walk(ROOT):
-        if used >= MAX_FOLDERS:
-            break
+    finally:
+        conn.close()
 
-        mp3s = [f for f in files if is_mp3(f)]
-        if not mp3s:
+    # ================================
+    # METADATA + COVER (ID3) → job terpisah
+    # File baru, berubah, belum pernah diproses, atau belum
+    # terhubung ke artist/album/genre (sisa lama: hanya scan manual,
+    # watcher cukup file yang tersentuh)
+    # ================================
+    meta_paths = [r[2] for r in new_rows] + [fp for fp, _ in result["changed"]]
+    if owner is not None:
+        meta_paths += [
+            r["filepath"]
+            for r in get_db().execute("""
+                SELECT filepath FROM mp3_tracks
+                WHERE meta_mtime_ns IS NULL
+                   OR (artist IS NOT NULL AND artist_id IS NULL)
+                   OR (album IS NOT NULL AND album_id IS NULL)
+                   OR (genre IS NOT NULL AND genre_id IS NULL)
+            """)
+        ]
+    meta_paths = list(dict.fromkeys(meta_paths))
+
+    metadata_job = None
+    if meta_paths:
+        metadata_job = submit(
+            "mp3.metadata",
+            {"paths": meta_paths},
+            owner=owner
+        )
+
+    return {
+        "folders_added": folders_added[:MAX_NAMES],
+        "tracks_added": tracks_added[:MAX_NAMES],
+        "total_folders_added": len(folders_added),
+        "total_tracks_added": len(tracks_added),
+        "tracks_updated": len(result["changed"]),
+        "tracks_removed": len(result["removed"]),
+        "tracks_granted": granted,
+        "dirs_scanned": result["dirs_scanned"],
+        "dirs_skipped": result["dirs_skipped"],
+        "metadata_job": metadata_job,
+        "message": f"{len(folders_added)} folder dan {len(tracks_added)} MP3 baru."
+    }
+
+
+def _known_mtimes(conn, paths):
+    known = {}
+    for i in range(0, len(paths), 500):
+        batch = paths[i:i + 500]
+        q = ",".join("?" * len(batch))
+        for r in conn.execute(
+            f"SELECT filepath, meta_mtime_ns FROM mp3_tracks WHERE filepath IN ({q})",
+            batch
+        ):
+            known[r["filepath"]] = r["meta_mtime_ns"]
+    return known
+
+
+def extract_metadata(paths, ctx=None):
+    """
+    Stage metadata: baca tag + info audio + cover (1x buka per file),
+    simpan ke mp3_tracks, lalu hitung palette cover baru (batch).
+    File yang mtime-nya sama dengan meta_mtime_ns dilewati.
+    """
+    conn = get_db()
+    known = _known_mtimes(conn, paths)
+    total = len(paths) or 1
+
+    cols = list(META_COLUMNS)
+    update_sql = (
+        f"UPDATE mp3_tracks SET {', '.join(c + '=?' for c in cols)} "
+        "WHERE filepath=?"
+    )
+
+    rows = []
+    new_thumbs = []
+    parsed = skipped = failed = 0
+
+    def flush():
+        if rows:
+            conn.executemany(update_sql, rows)
+            conn.commit()
+            rows.clear()
+
+    for i, fp in enumerate(paths):
+        if ctx:
+            ctx.check_cancel()
+            ctx.update(progress=i * 90 / total, message=f"Metadata {i}/{total}")
+
+        try:
+            mtime = os.stat(fp).st_mtime_ns
+        except OSError:
+            failed += 1
             continue
 
-        folders.append({
-            "folder_path": root,
-            "folder_name": os.path.basename(root) or root,
-            "files": mp3s[:MAX_FILES]
-        })
+        old_mtime = known.get(fp)
+        thumb_abs = os.path.join(THUMBNAIL_MP3_FOLDER, get_mp3_thumbnail_name(fp))
 
-        used += 1
+        if old_mtime == mtime:
+            skipped += 1
+            continue
 
-    return folders
+        # File berubah → cover lama mungkin sudah tidak sesuai
+        if old_mtime is not None and os.path.exists(thumb_abs):
+            os.remove(thumb_abs)
+            remove_variants(thumb_abs)
 
+        try:
+            meta, cover_saved = read_metadata(fp, thumb_abs)
+        except Exception:
+            failed += 1
+            continue
 
-# ============================================================================
-#   ROUTE: SCAN + IMPORT
-# ============================================================================
-@mp3_scan.route("/scan-db", methods=["POST"])
-def scan_db():
-    username = session.get("username", "UNKNOWN")
-    owner = current_user_identifier()
+        parsed += 1
+        rows.append([meta[c] for c in cols] + [fp])
 
-    BMS_write_log("SCAN MP3", username)
+        if cover_saved:
+            safe_build_variants(thumb_abs)
+            new_thumbs.append(thumb_abs)
 
-    folders = scan_storage_for_mp3()
-    conn = get_db()
-    cur = conn.cursor()
+        if len(rows) >= META_BATCH:
+            flush()
 
-    folders_added = []
-    tracks_added = []
+    flush()
 
-    try:
-        for f in folders:
-            folder_path = f["folder_path"]
-            folder_name = f["folder_name"]
-
-            row = cur.execute(
-                "SELECT id FROM mp3_folders WHERE folder_path=?",
-                (folder_path,)
-            ).fetchone()
-
-            if row:
-                folder_id = row["id"]
-            else:
-                cur.execute(
-                    "INSERT INTO mp3_folders (folder_name, folder_path) VALUES (?,?)",
-                    (folder_name, folder_path)
-                )
-                folder_id = cur.lastrowid
-                folders_added.append(folder_name)
-
-            # ================================
-            # PROSES FILE MP3
-            # ================================
-            for fn in f["files"]:
-                fp = os.path.join(folder_path, fn)
-                if not os.path.exists(fp):
-                    continue
-
-                exists = cur.execute("""
-                    SELECT id FROM mp3_tracks
-                    WHERE filepath=? AND user_id=?
-                """, (fp, owner)).fetchone()
+    # ================================
+    # ARTIST / ALBUM / GENRE (incremental)
+    # ================================
+    if ctx:
+        ctx.check_cancel()
+        ctx.update(progress=85, message="Memperbarui artist / album / genre...")
 
-                if exists:
-                    continue
+    linked = link_tracks(conn.cursor(), paths)
+    conn.commit()
 
-                size = os.path.getsize(fp)
-                added_at = datetime.utcnow().isoformat()
+    # ================================
+    # PALETTE (batch, 1 transaksi)
+    # ================================
+    if ctx:
+        ctx.check_cancel()
+        ctx.update(progress=90, message="Menghitung palette warna...")
 
-                cur.execute("""
-                    INSERT INTO mp3_tracks
-                    (folder_id, filename, filepath, size, added_at, user_id)
-                    VALUES (?,?,?,?,?,?)
-                """, (folder_id, fn, fp, size, added_at, owner))
+    palettes = save_palettes(new_thumbs)
 
-                tracks_added.append(fn)
+    return {
+        "parsed": parsed,
+        "skipped": skipped,
+        "failed": failed,
+        "linked": linked,
+        "covers_extracted": len(new_thumbs),
+        "palettes": palettes
+    }
 
-                # ================================
-                # AUTO MP3 THUMBNAIL (ID3)
-                # ================================
-                thumb_name = get_mp3_thumbnail_name(fp)
-                thumb_abs = os.path.join(THUMBNAIL_MP3_FOLDER, thumb_name)
 
-                if not os.path.exists(thumb_abs):
-                    try:
-                        extract_cover(fp, thumb_abs)
-                    except Exception:
-                        pass  # silent & aman
+# ============================================================================
+#   JOB HANDLER
+# ============================================================================
+@register_handler("mp3.scan")
+def job_mp3_scan(ctx, payload):
+    return run_mp3_scan(payload["owner"], payload.get("full", False), ctx=ctx)
 
-        conn.commit()
 
-    except Exception as e:
-        conn.rollback()
-        return jsonify({"error": str(e)}), 500
+@register_handler("mp3.metadata")
+def job_mp3_metadata(ctx, payload):
+    return extract_metadata(payload.get("paths", []), ctx=ctx)
 
-    finally:
-        conn.close()
+
+# ============================================================================
+#   ROUTE: SCAN + IMPORT → return job_id langsung
+# ============================================================================
+@mp3_scan.route("/scan-db", methods=["POST"])
+def scan_db():
+    username = session.get("username", "UNKNOWN")
+    owner = current_user_identifier()
+    full = request.args.get("full") == "1"
+
+    BMS_write_log("SCAN MP3", username)
+
+    job_id = submit("mp3.scan", {"owner": owner, "full": full}, owner=owner)
 
     return jsonify({
-        "status": "ok",
-        "folders_added": folders_added,
-        "tracks_added": tracks_added,
-        "message": f"{len(folders_added)} folder dan {len(tracks_added)} MP3 baru."
-    })
\ No newline at end of file
+        "status": "queued",
+        "job_id": job_id,
+        "message": "🔍 Scan MP3 berjalan di background..."
+    }), 202
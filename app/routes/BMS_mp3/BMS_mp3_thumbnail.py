@@ -2,23 +2,26 @@
 #   BMS MP3 MODULE — THUMBNAIL + COLOR ROUTE (FINAL COMPLETE)
 #   ✔ Cache lokal
 #   ✔ Extract ID3
-#   ✔ Fetch MusicBrainz (1x)
-#   ✔ Extract & cache dominant color
+#   ✔ Fetch MusicBrainz di background (cover_lookup, hit & miss + TTL)
+#   ✔ Miss yang masih berlaku → default langsung (tanpa mutagen / tulis DB)
+#   ✔ Palette warna (dominant/vibrant/muted) dari tabel mp3_palette
 #   ✔ SELALU return image
+#   ✔ Varian 64/256/512 (?w=) + ETag + Cache-Control
 # ============================================================================
 
 import os
 import hashlib
 from urllib.parse import unquote
-from flask import Blueprint, send_file, jsonify
+from flask import Blueprint, send_file, jsonify, request
 
 from app.BMS_config import PICTURES_FOLDER
 from app.routes.BMS_mp3.BMS_mp3_cover import extract_cover
-from app.routes.BMS_mp3.BMS_mp3_online_cover import (
-    search_musicbrainz_cover,
-    download_image
+from app.routes.BMS_mp3.BMS_mp3_cover_resolver import request_cover, cover_negative
+from app.routes.BMS_mp3.BMS_mp3_dominant_color import (
+    save_dominant_color,
+    get_palette
 )
-from app.routes.BMS_mp3.BMS_mp3_dominant_color import extract_dominant_color
+from app.routes.BMS_image import send_image_variant, safe_build_variants
 
 mp3_thumb = Blueprint("mp3_thumb", __name__, url_prefix="/mp3")
 
@@ -40,20 +43,6 @@ def get_thumb_name(mp3_path: str) -> str:
     return hashlib.md5(key.encode()).hexdigest() + ".jpg"
 
 
-def save_dominant_color(thumb_path: str):
-    """
-    Extract & simpan warna dominan (1x)
-    """
-    try:
-        color = extract_dominant_color(thumb_path)
-        if not color:
-            return
-        with open(thumb_path + ".color", "w") as f:
-            f.write(color)
-    except Exception:
-        pass
-
-
 def normalize_mp3_path(mp3_path: str) -> str:
     mp3_path = unquote(mp3_path)
     if not mp3_path.startswith("/"):
@@ -75,31 +64,36 @@ def serve_mp3_thumbnail(mp3_path):
     thumb_name = get_thumb_name(mp3_path)
     thumb_path = os.path.join(THUMBNAIL_MP3_FOLDER, thumb_name)
 
+    width = request.args.get("w")
+
     # 1️⃣ CACHE LOKAL
     if os.path.exists(thumb_path):
-        return send_file(thumb_path, mimetype="image/jpeg")
+        return send_image_variant(thumb_path, width)
+
+    # 2️⃣ SUDAH DIKETAHUI TANPA COVER (ID3 kosong, lookup antri / miss)
+    try:
+        if cover_negative(mp3_path):
+            return send_file(DEFAULT_COVER, mimetype="image/jpeg")
+    except Exception:
+        pass
 
-    # 2️⃣ EXTRACT ID3
+    # 3️⃣ EXTRACT ID3
     try:
         ok = extract_cover(mp3_path, thumb_path)
         if ok and os.path.exists(thumb_path):
             save_dominant_color(thumb_path)
-            return send_file(thumb_path, mimetype="image/jpeg")
+            safe_build_variants(thumb_path)
+            return send_image_variant(thumb_path, width)
     except Exception:
         pass
 
-    # 3️⃣ MUSICBRAINZ (ONLINE, 1x)
+    # 4️⃣ MUSICBRAINZ → antrikan (background), request tidak menunggu
     try:
-        cover_url = search_musicbrainz_cover(os.path.basename(mp3_path))
-        if cover_url:
-            ok = download_image(cover_url, thumb_path)
-            if ok and os.path.exists(thumb_path):
-                save_dominant_color(thumb_path)
-                return send_file(thumb_path, mimetype="image/jpeg")
+        request_cover(mp3_path, thumb_path)
     except Exception:
         pass
 
-    # 4️⃣ DEFAULT
+    # 5️⃣ DEFAULT
     return send_file(DEFAULT_COVER, mimetype="image/jpeg")
 
 
@@ -109,21 +103,19 @@ def serve_mp3_thumbnail(mp3_path):
 @mp3_thumb.route("/color/<path:mp3_path>")
 def serve_mp3_color(mp3_path):
     mp3_path = normalize_mp3_path(mp3_path)
+    thumb_name = get_thumb_name(mp3_path)
 
-    if not os.path.exists(mp3_path):
+    # 1 lookup indeks (PRIMARY KEY)
+    palette = get_palette(thumb_name)
+
+    # Belum ada (cover lama sebelum palette) → hitung sekali
+    if palette is None:
+        thumb_path = os.path.join(THUMBNAIL_MP3_FOLDER, thumb_name)
+        if os.path.exists(thumb_path):
+            save_dominant_color(thumb_path)
+            palette = get_palette(thumb_name)
+
+    if palette is None:
         return jsonify({"color": DEFAULT_COLOR})
 
-    thumb_name = get_thumb_name(mp3_path)
-    color_file = os.path.join(
-        THUMBNAIL_MP3_FOLDER,
-        thumb_name + ".color"
-    )
-
-    if os.path.exists(color_file):
-        try:
-            with open(color_file) as f:
-                return jsonify({"color": f.read().strip()})
-        except Exception:
-            pass
-
-    return jsonify({"color": DEFAULT_COLOR})
\ No newline at end of file
+    return jsonify({"color": palette["dominant"], "palette": palette})
@@ -0,0 +1,271 @@
+# ============================================================================
+#   BMS MP3 — TRANSCODE ON-THE-FLY (/mp3/stream/<id>)
+#   ✔ ?bitrate=96|128|192 & ?format=opus|mp3|aac
+#   ✔ Output ffmpeg langsung di-stream ke client selagi diproduksi
+#   ✔ Hasil lengkap disimpan ke cache disk (LRU, dibatasi ukuran total)
+#   ✔ Cache hit dilayani send_media (Range / ETag / 304)
+#   ✔ Jumlah ffmpeg bersamaan dibatasi → penuh = 503 + Retry-After
+#   ✔ FLAC / WAV / OGG ikut bisa diputar di browser
+# ============================================================================
+
+import os
+import uuid
+import hashlib
+import threading
+import subprocess
+
+from flask import Blueprint, Response, jsonify, request
+
+from app.BMS_config import CACHE_FOLDER
+from app.routes.BMS_stream import send_media
+from app.routes.BMS_disk_cache import touch, evict_lru
+from app.routes.BMS_playback.playback_buffer import record_play
+from .BMS_mp3_db import get_db, current_user_identifier, audio_mimetype
+
+mp3_transcode = Blueprint("mp3_transcode", __name__, url_prefix="/mp3")
+
+# Tangga bitrate yang diizinkan (kbps)
+BITRATES = (96, 128, 192)
+DEFAULT_BITRATE = 128
+
+# format → (codec ffmpeg, muxer ffmpeg, ekstensi cache, mimetype)
+FORMATS = {
+    "opus": ("libopus", "ogg", ".ogg", "audio/ogg"),
+    "mp3": ("libmp3lame", "mp3", ".mp3", "audio/mpeg"),
+    "aac": ("aac", "adts", ".aac", "audio/aac"),
+}
+DEFAULT_FORMAT = "mp3"
+
+TRANSCODE_FOLDER = os.path.join(CACHE_FOLDER, "transcode")
+
+# Batas total ukuran cache transcode (MB)
+CACHE_MAX_BYTES = int(os.environ.get("BMS_TRANSCODE_CACHE_MB", "1024")) * 1024 * 1024
+
+# Jumlah ffmpeg transcode bersamaan (default = setengah jumlah core)
+MAX_TRANSCODES = max(1, int(os.environ.get(
+    "BMS_TRANSCODE_WORKERS", max(1, (os.cpu_count() or 2) // 2)
+)))
+
+# Lama menunggu slot kosong sebelum menyerah (detik)
+SLOT_WAIT = 2.0
+
+# Ukuran potongan baca stdout ffmpeg (bytes)
+CHUNK_SIZE = 64 * 1024
+
+_slots = threading.BoundedSemaphore(MAX_TRANSCODES)
+
+os.makedirs(TRANSCODE_FOLDER, exist_ok=True)
+
+
+# ============================================================================
+#   CACHE
+# ============================================================================
+def cache_path(src, st, bitrate, fmt):
+    """
+    Nama cache berubah otomatis jika file sumber diganti (size / mtime).
+    """
+    raw = f"{os.path.abspath(src)}|{st.st_size}|{st.st_mtime_ns}"
+    name = hashlib.md5(raw.encode()).hexdigest()
+    return os.path.join(TRANSCODE_FOLDER, f"{name}_{bitrate}{FORMATS[fmt][2]}")
+
+
+def enforce_cache_limit(max_bytes=CACHE_MAX_BYTES, keep=None):
+    """
+    Buang transcode yang paling lama tidak diputar. Return jumlah dihapus.
+    """
+    removed, _ = evict_lru(TRANSCODE_FOLDER, max_bytes, keep=keep)
+    return removed
+
+
+# ============================================================================
+#   FFMPEG
+# ============================================================================
+def _ffmpeg_cmd(src, bitrate, fmt):
+    codec, muxer, _, _ = FORMATS[fmt]
+    return [
+        "ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error",
+        "-threads", "1",
+        "-i", src,
+        "-map", "0:a:0", "-vn",
+        "-map_metadata", "-1",
+        "-c:a", codec,
+        "-b:a", f"{bitrate}k",
+        "-f", muxer,
+        "pipe:1"
+    ]
+
+
+class _Transcode:
+    """
+    1 proses ffmpeg + 1 slot semaphore.
+    close() aman dipanggil berkali-kali (generator & call_on_close),
+    sehingga slot tetap kembali walau generator tidak pernah dimulai.
+    """
+
+    def __init__(self, proc):
+        self.proc = proc
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        if self.proc.poll() is None:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc.stdout.close()
+        _slots.release()
+
+
+def _stream_transcode(job, target):
+    """
+    Generator: teruskan stdout ffmpeg ke client sambil ditulis ke .tmp.
+    Selesai normal (exit 0) → .tmp jadi file cache.
+    Client putus / error → ffmpeg dihentikan & .tmp dibuang.
+    """
+    tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+    done = False
+
+    try:
+        with open(tmp, "wb") as out:
+            while True:
+                chunk = job.proc.stdout.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                yield chunk
+
+        done = job.proc.wait() == 0 and os.path.getsize(tmp) > 0
+
+        if done:
+            os.replace(tmp, target)
+
+    finally:
+        job.close()
+
+        if not done and os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    if done:
+        enforce_cache_limit(keep=target)
+
+
+# ============================================================================
+#   HELPER
+# ============================================================================
+def _parse_args(args):
+    """
+    Return (bitrate, fmt). ValueError jika tidak valid.
+    """
+    fmt = (args.get("format") or DEFAULT_FORMAT).lower()
+    if fmt not in FORMATS:
+        raise ValueError("format harus salah satu: " + ", ".join(FORMATS))
+
+    try:
+        bitrate = int(args.get("bitrate") or DEFAULT_BITRATE)
+    except ValueError:
+        bitrate = None
+    if bitrate not in BITRATES:
+        raise ValueError("bitrate harus salah satu: " + ", ".join(map(str, BITRATES)))
+
+    return bitrate, fmt
+
+
+# ============================================================================
+#   ROUTE: STREAM TRANSCODE
+# ============================================================================
+@mp3_transcode.route("/stream/<int:track_id>")
+def stream(track_id):
+    try:
+        bitrate, fmt = _parse_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    owner = current_user_identifier()
+    conn = get_db()
+
+    row = conn.execute("""
+        SELECT t.filepath, t.bitrate
+        FROM mp3_library l
+        JOIN mp3_tracks t ON t.id = l.track_id
+        WHERE l.track_id=? AND l.user_id=?
+    """, (track_id, owner)).fetchone()
+
+    conn.close()
+
+    if not row:
+        return jsonify({"error": "Track tidak ditemukan"}), 404
+
+    src = row["filepath"]
+
+    try:
+        st = os.stat(src)
+    except OSError:
+        return jsonify({"error": "File fisik hilang"}), 404
+
+    mimetype = FORMATS[fmt][3]
+
+    # MP3 asli sudah <= bitrate diminta → tidak perlu transcode
+    if (
+        fmt == "mp3"
+        and audio_mimetype(src) == mimetype
+        and row["bitrate"]
+        and row["bitrate"] <= bitrate * 1000
+    ):
+        record_play(owner, "track", track_id)
+        return send_media(src, mimetype)
+
+    target = cache_path(src, st, bitrate, fmt)
+
+    # ================================
+    # CACHE HIT
+    # ================================
+    if os.path.exists(target):
+        touch(target)
+        record_play(owner, "track", track_id)
+        resp = send_media(target, mimetype)
+        resp.headers["X-Transcode"] = "hit"
+        return resp
+
+    # ================================
+    # CACHE MISS → ffmpeg (dibatasi)
+    # ================================
+    if not _slots.acquire(timeout=SLOT_WAIT):
+        resp = jsonify({"error": "Transcode sedang penuh, coba lagi"})
+        resp.headers["Retry-After"] = "5"
+        return resp, 503
+
+    try:
+        proc = subprocess.Popen(
+            _ffmpeg_cmd(src, bitrate, fmt),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+    except FileNotFoundError:
+        _slots.release()
+        return jsonify({"error": "ffmpeg tidak ditemukan"}), 503
+    except Exception as e:
+        _slots.release()
+        return jsonify({"error": str(e)}), 500
+
+    job = _Transcode(proc)
+    record_play(owner, "track", track_id)
+
+    resp = Response(
+        _stream_transcode(job, target),
+        mimetype=mimetype,
+        direct_passthrough=True
+    )
+    resp.call_on_close(job.close)
+    # Panjang belum diketahui → seek baru bisa setelah cache jadi
+    resp.headers["Accept-Ranges"] = "none"
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Transcode"] = "miss"
+    return resp
@@ -3,15 +3,21 @@
 #   Menggabungkan:
 #       ✔ scan blueprint
 #       ✔ main mp3 routes
+#       ✔ browse artist / album / genre
+#       ✔ stream transcode (opus / mp3 / aac)
 # ============================================================================
 
 from .BMS_mp3_routes import media_mp3
 from .BMS_mp3_scan import mp3_scan
 from .BMS_mp3_thumbnail import mp3_thumb
+from .BMS_mp3_browse import mp3_browse
+from .BMS_mp3_transcode import mp3_transcode
 
 # daftar blueprint untuk di-import oleh register_blueprints()
 blueprints = [
     media_mp3,
     mp3_scan,
-    mp3_thumb
+    mp3_thumb,
+    mp3_browse,
+    mp3_transcode
 ]
\ No newline at end of file
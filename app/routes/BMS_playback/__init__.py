@@ -0,0 +1 @@
+from .playback_routes import playback
@@ -0,0 +1,252 @@
+# ============================================================================
+#   BMS PLAYBACK — WRITE-BEHIND BUFFER
+#   ✔ Progress & play dicatat di memori (tanpa commit per request)
+#   ✔ Flush batch: 1 transaksi tiap FLUSH_INTERVAL / saat buffer penuh
+#   ✔ 1 play dihitung per SESI (request Range / segmen tidak dihitung)
+#     Sesi baru ditentukan dari last_played di DB saat flush (BEGIN IMMEDIATE)
+#     → benar untuk banyak worker gunicorn & setelah restart
+#   ✔ play_count pustaka user (mp3_library / video_library) ikut diperbarui
+#     di batch yang sama
+#   ✔ Flush terakhir saat proses berhenti (atexit)
+# ============================================================================
+
+import os
+import time
+import atexit
+import threading
+
+from app.routes.BMS_logger import BMS_write_error
+from app.routes.BMS_library.library_acl import LIBRARIES
+from .playback_db import get_db
+
+# Interval flush ke DB (detik)
+FLUSH_INTERVAL = float(os.environ.get("BMS_PLAYBACK_FLUSH", "5"))
+
+# Jumlah item pending yang memicu flush lebih awal
+MAX_PENDING = 500
+
+# Tanpa aktivitas selama ini → putar berikutnya dihitung sesi baru (detik)
+SESSION_IDLE = 30 * 60
+
+# Posisi >= bagian ini dari durasi → dianggap selesai
+COMPLETE_RATIO = 0.95
+
+# (user, kind, item_id) → perubahan yang belum ditulis
+_pending = {}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_started_pid = None
+
+
+def _entry(key):
+    e = _pending.get(key)
+    if e is None:
+        e = _pending[key] = {
+            "position": None, "duration": None, "completed": None,
+            "plays": 0, "first": None, "last_played": None
+        }
+    return e
+
+
+def _touch(e, now):
+    """
+    Catat aktivitas di entry pending.
+    first : aktivitas pertama di buffer → sesi baru atau tidak diputuskan
+            saat flush (dibandingkan last_played di DB)
+    plays : sesi baru SETELAH aktivitas pertama (jeda > SESSION_IDLE)
+    """
+    if e["first"] is None:
+        e["first"] = now
+    elif now - e["last_played"] > SESSION_IDLE:
+        e["plays"] += 1
+    e["last_played"] = now
+
+
+def session_plays(e, last_played):
+    """
+    Jumlah play entry pending terhadap last_played yang tersimpan di DB.
+    """
+    if e["first"] is None:
+        return e["plays"]
+    new = last_played is None or e["first"] - last_played > SESSION_IDLE
+    return e["plays"] + (1 if new else 0)
+
+
+# ============================================================================
+#   API PENCATAT (dipanggil dari route, tanpa I/O DB)
+# ============================================================================
+def record_play(user_id, kind, item_id):
+    """
+    Dipanggil di setiap request stream (play / Range / HLS).
+    Hanya request pertama dalam 1 sesi yang menambah play_count
+    (diputuskan saat flush).
+    """
+    key = (user_id, kind, int(item_id))
+    now = time.time()
+
+    with _lock:
+        _touch(_entry(key), now)
+        full = len(_pending) >= MAX_PENDING
+
+    _ensure_flusher()
+    if full:
+        _wakeup.set()
+
+
+def record_progress(user_id, kind, item_id, position, duration=None, ended=False):
+    """
+    Laporan posisi dari player. Return state yang akan disimpan.
+    """
+    key = (user_id, kind, int(item_id))
+    now = time.time()
+    position = max(0.0, float(position))
+
+    completed = bool(ended) or bool(
+        duration and position >= float(duration) * COMPLETE_RATIO
+    )
+
+    with _lock:
+        e = _entry(key)
+        _touch(e, now)
+        # Selesai → resume berikutnya dari awal
+        e["position"] = 0.0 if completed else position
+        e["duration"] = float(duration) if duration else e["duration"]
+        e["completed"] = 1 if completed else 0
+        full = len(_pending) >= MAX_PENDING
+        state = dict(e)
+
+    _ensure_flusher()
+    if full:
+        _wakeup.set()
+    return state
+
+
+def pending_state(user_id, kind, item_id):
+    """
+    Perubahan yang belum di-flush (untuk dibaca bersama isi DB,
+    jumlah play: session_plays(entry, last_played DB)).
+    """
+    with _lock:
+        e = _pending.get((user_id, kind, int(item_id)))
+        return dict(e) if e else None
+
+
+# ============================================================================
+#   FLUSH
+# ============================================================================
+def flush():
+    """
+    Tulis semua perubahan pending dalam 1 transaksi. Return jumlah item.
+    """
+    with _flush_lock:
+        with _lock:
+            if not _pending:
+                return 0
+            batch = _pending.copy()
+            _pending.clear()
+
+        conn = get_db()
+        try:
+            # Kunci tulis sebelum membaca last_played: worker lain yang flush
+            # bersamaan menunggu → sesi yang sama tidak dihitung 2x
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+
+            rows = []
+            plays = {kind: [] for kind in LIBRARIES}
+            for (user_id, kind, item_id), e in batch.items():
+                row = conn.execute("""
+                    SELECT last_played FROM playback_state
+                    WHERE user_id=? AND kind=? AND item_id=?
+                """, (user_id, kind, item_id)).fetchone()
+                n = session_plays(e, row["last_played"] if row else None)
+
+                rows.append((
+                    user_id, kind, item_id,
+                    e["position"], e["duration"], e["completed"],
+                    n, e["last_played"]
+                ))
+                if n:
+                    plays[kind].append((n, item_id, user_id))
+
+            conn.executemany("""
+                INSERT INTO playback_state
+                    (user_id, kind, item_id, position, duration,
+                     completed, play_count, last_played)
+                VALUES (?,?,?,COALESCE(?, 0),?,COALESCE(?, 0),?,?)
+                ON CONFLICT(user_id, kind, item_id) DO UPDATE SET
+                    position = CASE WHEN ?4 IS NULL THEN position ELSE excluded.position END,
+                    duration = COALESCE(excluded.duration, duration),
+                    completed = CASE WHEN ?6 IS NULL THEN completed ELSE excluded.completed END,
+                    play_count = play_count + excluded.play_count,
+                    last_played = MAX(COALESCE(last_played, 0), excluded.last_played)
+            """, rows)
+
+            # play_count pustaka dipakai sort ?sort=play_count
+            for kind, args in plays.items():
+                if not args:
+                    continue
+                table, col, _ = LIBRARIES[kind]
+                conn.executemany(f"""
+                    UPDATE {table}
+                    SET play_count = play_count + ?
+                    WHERE {col}=? AND user_id=?
+                """, args)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            # Kembalikan ke buffer agar tidak hilang (digabung dengan yang baru)
+            with _lock:
+                for key, e in batch.items():
+                    cur = _pending.get(key)
+                    if cur is None:
+                        _pending[key] = e
+                        continue
+                    # Jeda antara batch lama & aktivitas baru → sesi baru?
+                    cur["plays"] += e["plays"] + (
+                        1 if cur["first"] - e["last_played"] > SESSION_IDLE else 0
+                    )
+                    cur["first"] = e["first"]
+                    for f in ("position", "duration", "completed", "last_played"):
+                        if cur[f] is None:
+                            cur[f] = e[f]
+            raise
+
+        return len(rows)
+
+
+def _flush_loop():
+    while True:
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception as e:
+            BMS_write_error(f"[PLAYBACK] Flush gagal: {e}")
+
+
+def _ensure_flusher():
+    """Thread flush 1x per proses (aman setelah fork)."""
+    global _started_pid
+    pid = os.getpid()
+    if _started_pid == pid:
+        return
+
+    with _flush_lock:
+        if _started_pid == pid:
+            return
+        threading.Thread(
+            target=_flush_loop, name="bms-playback-flush", daemon=True
+        ).start()
+        _started_pid = pid
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        flush()
+    except Exception:
+        pass
@@ -0,0 +1,46 @@
+# ============================================================================
+#   BMS PLAYBACK — DATABASE
+#   Tabel playback_state: 1 baris per (user, jenis, item)
+#     kind        : 'track' (mp3_tracks.id) | 'video' (videos.id)
+#     position    : posisi resume (detik)
+#     duration    : durasi terakhir yang dilaporkan player (detik)
+#     completed   : 1 jika diputar sampai selesai
+#     play_count  : jumlah sesi putar (bukan jumlah request Range)
+#     last_played : epoch terakhir diputar
+# ============================================================================
+
+from app.database.BMS_db_pool import get_connection
+
+KINDS = ("track", "video")
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+
+def get_db():
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS playback_state (
+                user_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                item_id INTEGER NOT NULL,
+                position REAL NOT NULL DEFAULT 0,
+                duration REAL,
+                completed INTEGER NOT NULL DEFAULT 0,
+                play_count INTEGER NOT NULL DEFAULT 0,
+                last_played REAL,
+                PRIMARY KEY (user_id, kind, item_id)
+            ) WITHOUT ROWID
+        """)
+        # "Lanjutkan menonton / mendengar" → urut last_played per user & jenis
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_playback_recent
+            ON playback_state(user_id, kind, last_played DESC)
+        """)
+        conn.commit()
+        _table_ready = True
+
+    return conn
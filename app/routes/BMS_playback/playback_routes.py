@@ -0,0 +1,190 @@
+# ============================================================================
+#   BMS PLAYBACK — API
+#   POST /playback/progress            → lapor posisi (buffer, tanpa commit)
+#   GET  /playback/<kind>/<id>         → posisi resume 1 item
+#   GET  /playback/continue?kind=      → lanjutkan menonton / mendengar
+#   GET  /playback/recent?kind=        → terakhir diputar (termasuk selesai)
+#   kind = track | video
+# ============================================================================
+
+from flask import Blueprint, jsonify, request
+
+from app.routes.BMS_mp3.BMS_mp3_db import (
+    get_db as get_mp3_db,
+    current_user_identifier as mp3_owner
+)
+from app.routes.BMS_video.BMS_video_db import (
+    get_db as get_video_db,
+    current_user_identifier as video_owner
+)
+from app.routes.BMS_video.BMS_video_scan import get_thumbnail_name
+from app.routes.BMS_library.library_acl import in_library
+from .playback_db import get_db, KINDS
+from .playback_buffer import record_progress, pending_state, session_plays, flush
+
+playback = Blueprint("playback", __name__, url_prefix="/playback")
+
+# Posisi di bawah ini tidak masuk "lanjutkan" (baru dicoba sebentar)
+MIN_RESUME = 10.0
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def _owner(kind):
+    return mp3_owner() if kind == "track" else video_owner()
+
+
+def _item_exists(kind, item_id, owner):
+    conn = get_mp3_db() if kind == "track" else get_video_db()
+    found = in_library(conn, kind, owner, item_id)
+    conn.close()
+    return found
+
+
+def _limit():
+    return max(1, min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT))
+
+
+# ============================================================================
+#   LAPOR PROGRESS (dipanggil player tiap beberapa detik / pause / selesai)
+# ============================================================================
+@playback.route("/progress", methods=["POST"])
+def report_progress():
+    # sendBeacon mengirim JSON sebagai text/plain → force
+    data = request.get_json(force=True, silent=True) or {}
+
+    kind = data.get("kind")
+    if kind not in KINDS:
+        return jsonify({"error": "kind harus track atau video"}), 400
+
+    try:
+        item_id = int(data.get("id"))
+        position = float(data.get("position", 0))
+        duration = float(data["duration"]) if data.get("duration") else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "id / position / duration tidak valid"}), 400
+
+    if position < 0 or position != position:
+        return jsonify({"error": "position tidak valid"}), 400
+
+    owner = _owner(kind)
+    if not _item_exists(kind, item_id, owner):
+        return jsonify({"error": "Item tidak ditemukan"}), 404
+
+    state = record_progress(
+        owner, kind, item_id, position, duration, bool(data.get("ended"))
+    )
+    return jsonify({
+        "status": "ok",
+        "position": state["position"],
+        "completed": bool(state["completed"])
+    })
+
+
+# ============================================================================
+#   POSISI RESUME 1 ITEM
+# ============================================================================
+@playback.route("/<kind>/<int:item_id>")
+def get_state(kind, item_id):
+    if kind not in KINDS:
+        return jsonify({"error": "kind harus track atau video"}), 400
+
+    owner = _owner(kind)
+    conn = get_db()
+    row = conn.execute("""
+        SELECT position, duration, completed, play_count, last_played
+        FROM playback_state
+        WHERE user_id=? AND kind=? AND item_id=?
+    """, (owner, kind, item_id)).fetchone()
+    conn.close()
+
+    state = dict(row) if row else {
+        "position": 0.0, "duration": None, "completed": 0,
+        "play_count": 0, "last_played": None
+    }
+
+    # Gabung dengan perubahan yang belum di-flush
+    pending = pending_state(owner, kind, item_id)
+    if pending:
+        for f in ("position", "duration", "completed", "last_played"):
+            if pending[f] is not None:
+                state[f] = pending[f]
+        state["play_count"] += session_plays(pending, row["last_played"] if row else None)
+
+    state["completed"] = bool(state["completed"])
+    return jsonify(state)
+
+
+# ============================================================================
+#   LANJUTKAN / TERAKHIR DIPUTAR
+# ============================================================================
+def _list_items(kind, in_progress):
+    flush()  # buffer → DB agar daftar up to date
+
+    owner = _owner(kind)
+    filter_sql = (
+        " AND p.completed=0 AND p.position>=?" if in_progress else ""
+    )
+    params = [owner, kind] + ([MIN_RESUME] if in_progress else []) + [_limit()]
+
+    if kind == "track":
+        get_mp3_db()
+        conn = get_db()
+        rows = conn.execute(f"""
+            SELECT p.item_id AS id, p.position, p.duration, p.completed,
+                   p.play_count, p.last_played,
+                   t.filename, t.filepath, t.folder_id, t.title, t.artist, t.album
+            FROM playback_state p
+            JOIN mp3_library l ON l.track_id = p.item_id AND l.user_id = p.user_id
+            JOIN mp3_tracks t ON t.id = l.track_id
+            WHERE p.user_id=? AND p.kind=?{filter_sql}
+            ORDER BY p.last_played DESC
+            LIMIT ?
+        """, params).fetchall()
+    else:
+        get_video_db()
+        conn = get_db()
+        rows = conn.execute(f"""
+            SELECT p.item_id AS id, p.position, p.duration, p.completed,
+                   p.play_count, p.last_played,
+                   v.filename, v.filepath, v.folder_id
+            FROM playback_state p
+            JOIN video_library l ON l.video_id = p.item_id AND l.user_id = p.user_id
+            JOIN videos v ON v.id = l.video_id
+            WHERE p.user_id=? AND p.kind=?{filter_sql}
+            ORDER BY p.last_played DESC
+            LIMIT ?
+        """, params).fetchall()
+
+    conn.close()
+
+    items = []
+    for r in rows:
+        item = dict(r)
+        item["completed"] = bool(item["completed"])
+        if kind == "video":
+            item["thumbnail"] = get_thumbnail_name(item["filepath"])
+        items.append(item)
+    return items
+
+
+def _kind_arg():
+    kind = request.args.get("kind", "video")
+    return kind if kind in KINDS else None
+
+
+@playback.route("/continue")
+def continue_list():
+    kind = _kind_arg()
+    if not kind:
+        return jsonify({"error": "kind harus track atau video"}), 400
+    return jsonify(_list_items(kind, in_progress=True))
+
+
+@playback.route("/recent")
+def recent_list():
+    kind = _kind_arg()
+    if not kind:
+        return jsonify({"error": "kind harus track atau video"}), 400
+    return jsonify(_list_items(kind, in_progress=False))
@@ -1,9 +1,9 @@
 import os
-import sqlite3
 from flask import Blueprint, render_template, request, redirect, session, send_from_directory, abort
 from werkzeug.utils import secure_filename
 
 from app.BMS_config import PICTURES_FOLDER,DB_PATH
+from app.database.BMS_db_pool import get_connection
 from app.routes.BMS_auth.session_helpers import BMS_auth_is_login
 
 profile = Blueprint("profile", __name__, url_prefix="/profile")
@@ -20,9 +20,7 @@ os.makedirs(PROFILE_BACKGROUND_FOLDER, exist_ok=True)
 #  DB Helper
 # ======================================================
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(DB_PATH)
 
 
 # ======================================================
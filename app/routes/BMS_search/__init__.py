@@ -0,0 +1 @@
+from .search_routes import search
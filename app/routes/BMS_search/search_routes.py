@@ -0,0 +1,98 @@
+# ============================================================================
+#   BMS SEARCH — API
+#   GET  /search?q=&type=track,video,file&limit=&offset=
+#        → hasil ter-ranking dari index FTS5 (tanpa os.walk)
+#   POST /search/reindex   → jadwalkan index ulang file (admin/root)
+# ============================================================================
+
+from flask import Blueprint, jsonify, request
+
+from app.routes.BMS_auth.session_helpers import (
+    BMS_auth_is_login,
+    BMS_auth_is_admin,
+    BMS_auth_is_root
+)
+from app.routes.BMS_mp3.BMS_mp3_db import (
+    get_db as get_mp3_db,
+    current_user_identifier as mp3_owner
+)
+from app.routes.BMS_video.BMS_video_db import (
+    get_db as get_video_db,
+    current_user_identifier as video_owner
+)
+from app.routes.BMS_library.library_search import (
+    search as search_index,
+    schedule_files_index
+)
+
+search = Blueprint("search", __name__, url_prefix="/search")
+
+ALL_TYPES = ("track", "video", "file")
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def _can_search_files():
+    return BMS_auth_is_login() and (BMS_auth_is_admin() or BMS_auth_is_root())
+
+
+# ============================================================================
+#   SEARCH
+# ============================================================================
+@search.route("")
+def search_all():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "Parameter q wajib diisi"}), 400
+
+    types = [
+        t for t in request.args.get("type", ",".join(ALL_TYPES)).split(",")
+        if t in ALL_TYPES
+    ]
+
+    limit = max(1, min(request.args.get("limit", DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    offset = max(0, request.args.get("offset", 0, type=int))
+
+    track = video = None
+    if "track" in types:
+        get_mp3_db()        # pastikan tabel & trigger index MP3 siap
+        track = mp3_owner()
+    if "video" in types:
+        get_video_db()      # pastikan tabel & trigger index video siap
+        video = video_owner()
+
+    files = "file" in types and _can_search_files()
+    if files:
+        schedule_files_index()
+
+    # +1 untuk tahu apakah masih ada halaman berikutnya
+    items = search_index(
+        q,
+        track_owner=track,
+        video_owner=video,
+        files=files,
+        limit=limit + 1,
+        offset=offset
+    )
+
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    return jsonify({
+        "query": q,
+        "items": items,
+        "next_offset": offset + limit if has_more else None
+    })
+
+
+# ============================================================================
+#   REINDEX FILE
+# ============================================================================
+@search.route("/reindex", methods=["POST"])
+def search_reindex():
+    if not _can_search_files():
+        return jsonify({"error": "Akses ditolak"}), 403
+
+    job_id = schedule_files_index(force=True)
+    return jsonify({"status": "queued", "job_id": job_id}), 202
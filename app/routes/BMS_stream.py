@@ -0,0 +1,267 @@
+# ============================================================
+#   BMS – STREAM ENGINE (Range / If-Range / ETag)
+#   Dipakai bersama oleh modul MP3 & Video
+#
+#   ✔ Tanpa Range  → wsgi.file_wrapper (sendfile di gunicorn/waitress)
+#   ✔ Single Range → potongan kecil (memori konstan)
+#   ✔ Suffix Range (bytes=-500) & open-ended (bytes=100-)
+#   ✔ Multi Range  → multipart/byteranges
+#   ✔ ETag, If-None-Match, If-Range, 416
+#   ✔ Cache-Control opsional (gambar / cover)
+# ============================================================
+
+import os
+import uuid
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+# Ukuran potongan baca untuk response Range (bytes)
+CHUNK_SIZE = 256 * 1024
+
+# Batas jumlah range dalam satu request (anti penyalahgunaan)
+MAX_RANGES = 16
+
+
+# ============================================================
+#  HELPER: ETag & Last-Modified dari stat file
+# ============================================================
+def make_etag(st):
+    """
+    ETag kuat berbasis (inode, size, mtime).
+    Berubah otomatis jika file diganti / dimodifikasi.
+    """
+    raw = f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+    return '"' + hashlib.md5(raw.encode()).hexdigest() + '"'
+
+
+def http_date(ts):
+    return formatdate(ts, usegmt=True)
+
+
+# ============================================================
+#  PARSE RANGE HEADER
+# ============================================================
+def parse_range(header, size):
+    """
+    Parse header Range menjadi list (start, end) inklusif.
+
+    Return:
+        None  → header tidak ada / bukan 'bytes' (kirim full file)
+        []    → range tidak bisa dipenuhi (416)
+        list  → daftar range valid, terurut & digabung
+    """
+    if not header:
+        return None
+
+    try:
+        unit, spec = header.split("=", 1)
+    except ValueError:
+        return None
+
+    if unit.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part or "-" not in part:
+            return None
+
+        start_s, end_s = part.split("-", 1)
+        start_s, end_s = start_s.strip(), end_s.strip()
+
+        try:
+            if not start_s:
+                # Suffix range: N byte terakhir
+                suffix = int(end_s)
+                if suffix <= 0:
+                    continue
+                start = max(size - suffix, 0)
+                end = size - 1
+            else:
+                start = int(start_s)
+                end = int(end_s) if end_s else size - 1
+        except ValueError:
+            return None
+
+        # Range di luar ukuran file → lewati
+        if start >= size:
+            continue
+
+        if end < start:
+            return None
+
+        ranges.append((start, min(end, size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+
+    # Gabungkan range yang tumpang tindih / bersebelahan
+    ranges.sort()
+    merged = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+# ============================================================
+#  CONDITIONAL HELPERS
+# ============================================================
+def _etag_match(header, etag):
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [t.strip() for t in header.split(",")]
+    return etag in tags or ("W/" + etag) in tags
+
+
+def _if_range_ok(header, etag, mtime):
+    """
+    If-Range: range hanya dipakai jika validator masih cocok.
+    Jika tidak cocok → kirim file penuh (200).
+    """
+    if not header:
+        return True
+
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        # Weak ETag tidak boleh dipakai untuk If-Range
+        return header == etag
+
+    try:
+        return int(parsedate_to_datetime(header).timestamp()) == int(mtime)
+    except Exception:
+        return False
+
+
+# ============================================================
+#  GENERATOR: baca range dengan potongan kecil
+# ============================================================
+def _iter_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _iter_multipart(path, parts, boundary_end):
+    for header_bytes, start, length in parts:
+        yield header_bytes
+        yield from _iter_range(path, start, length)
+    yield boundary_end
+
+
+# ============================================================
+#  MAIN: kirim file media dengan dukungan Range
+# ============================================================
+def send_media(path, mimetype, max_age=None):
+    """
+    Kirim file media dengan memori konstan berapapun ukurannya.
+    Harus dipanggil di dalam request context Flask.
+
+    max_age: jika diisi → Cache-Control public (detik)
+    """
+    st = os.stat(path)
+    size = st.st_size
+    etag = make_etag(st)
+
+    base_headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": http_date(st.st_mtime),
+    }
+
+    if max_age is not None:
+        base_headers["Cache-Control"] = f"public, max-age={int(max_age)}"
+
+    # 304 jika klien sudah punya versi yang sama
+    if _etag_match(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=base_headers)
+
+    ranges = None
+    if _if_range_ok(request.headers.get("If-Range"), etag, st.st_mtime):
+        ranges = parse_range(request.headers.get("Range"), size)
+
+    # ---------------------------------------------
+    # 416 — range tidak bisa dipenuhi
+    # ---------------------------------------------
+    if ranges == []:
+        resp = Response(status=416, headers=base_headers)
+        resp.headers["Content-Range"] = f"bytes */{size}"
+        return resp
+
+    # ---------------------------------------------
+    # 200 — full file via file_wrapper (zero-copy)
+    # ---------------------------------------------
+    if ranges is None:
+        f = open(path, "rb")
+        resp = Response(
+            wrap_file(request.environ, f, CHUNK_SIZE),
+            200,
+            mimetype=mimetype,
+            headers=base_headers,
+            direct_passthrough=True
+        )
+        resp.headers["Content-Length"] = str(size)
+        return resp
+
+    # ---------------------------------------------
+    # 206 — single range
+    # ---------------------------------------------
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        length = end - start + 1
+
+        resp = Response(
+            _iter_range(path, start, length),
+            206,
+            mimetype=mimetype,
+            headers=base_headers,
+            direct_passthrough=True
+        )
+        resp.headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        resp.headers["Content-Length"] = str(length)
+        return resp
+
+    # ---------------------------------------------
+    # 206 — multi range (multipart/byteranges)
+    # ---------------------------------------------
+    boundary = uuid.uuid4().hex
+    parts = []
+    total = 0
+
+    for start, end in ranges:
+        header_bytes = (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+        ).encode()
+        length = end - start + 1
+        parts.append((header_bytes, start, length))
+        total += len(header_bytes) + length
+
+    boundary_end = f"\r\n--{boundary}--\r\n".encode()
+    total += len(boundary_end)
+
+    resp = Response(
+        _iter_multipart(path, parts, boundary_end),
+        206,
+        content_type=f"multipart/byteranges; boundary={boundary}",
+        headers=base_headers,
+        direct_passthrough=True
+    )
+    resp.headers["Content-Length"] = str(total)
+    return resp
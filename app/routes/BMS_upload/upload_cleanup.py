@@ -1,18 +1,103 @@
+# =====================================================
+# SWEEPER SESSION UPLOAD
+#   ✔ Jalan berkala di thread latar (1x per proses, aman setelah fork)
+#   ✔ Hapus session kedaluwarsa + file sementaranya
+#   ✔ Hapus file .upload yatim (tanpa session, mis. sisa crash)
+#   ✔ Aman dijalankan bersamaan di beberapa worker
+# =====================================================
+
+import os
 import time
-import shutil
-from .upload_sessions import upload_sessions, upload_lock
+import threading
+
+from app.routes.BMS_logger import BMS_write_error
+from .upload_paths import UPLOAD_INTERNAL
+from .upload_sessions import get_db, SESSION_TIMEOUT
+
+# Interval sweeper (detik)
+SWEEP_INTERVAL = int(os.environ.get("BMS_UPLOAD_SWEEP", "600"))
+
+_start_lock = threading.Lock()
+_started_pid = None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
-SESSION_TIMEOUT = 3600  # 1 jam
 
 def cleanup_sessions():
+    """
+    Return jumlah session + file yatim yang dihapus.
+    """
     now = time.time()
+    conn = get_db()
+    removed = 0
+
+    dead = conn.execute(
+        "SELECT session_id, tmp_path FROM upload_sessions WHERE expires_at<=?",
+        (now,)
+    ).fetchall()
+
+    for row in dead:
+        # Cek ulang expires_at: chunk bisa saja masuk sesudah SELECT
+        cur = conn.execute(
+            "DELETE FROM upload_sessions WHERE session_id=? AND expires_at<=?",
+            (row["session_id"], now)
+        )
+        if cur.rowcount:
+            conn.execute(
+                "DELETE FROM upload_chunks WHERE session_id=?", (row["session_id"],)
+            )
+        conn.commit()
+        if cur.rowcount:
+            _remove(row["tmp_path"])
+            removed += 1
+
+    # File .upload tanpa session yang sudah lama tidak disentuh
+    live = {
+        r["tmp_path"]
+        for r in conn.execute("SELECT tmp_path FROM upload_sessions")
+    }
+    try:
+        entries = list(os.scandir(UPLOAD_INTERNAL))
+    except OSError:
+        entries = []
+
+    for entry in entries:
+        if not entry.name.endswith(".upload") or entry.path in live:
+            continue
+        try:
+            if now - entry.stat().st_mtime < SESSION_TIMEOUT:
+                continue
+        except OSError:
+            continue
+        _remove(entry.path)
+        removed += 1
+
+    return removed
+
+
+def _sweep_loop():
+    while True:
+        try:
+            cleanup_sessions()
+        except Exception as e:
+            BMS_write_error(f"[UPLOAD] Sweeper gagal: {e}")
+        time.sleep(SWEEP_INTERVAL)
+
 
-    with upload_lock:
-        dead = [
-            sid for sid, info in upload_sessions.items()
-            if now - info["created"] > SESSION_TIMEOUT
-        ]
+def start_sweeper():
+    """Thread sweeper 1x per proses (dipanggil dari create_app)."""
+    global _started_pid
+    pid = os.getpid()
 
-        for sid in dead:
-            shutil.rmtree(upload_sessions[sid]["tmp_dir"], ignore_errors=True)
-            del upload_sessions[sid]
\ No newline at end of file
+    with _start_lock:
+        if _started_pid == pid:
+            return
+        threading.Thread(
+            target=_sweep_loop, name="bms-upload-sweep", daemon=True
+        ).start()
+        _started_pid = pid
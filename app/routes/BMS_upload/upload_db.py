@@ -1,8 +1,8 @@
-import sqlite3
 from app.BMS_config import DB_PATH
+from app.database.BMS_db_pool import get_connection
 
 def log_upload(filename, size, user):
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     c = conn.cursor()
 
     c.execute("""
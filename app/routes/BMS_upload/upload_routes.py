@@ -1,19 +1,35 @@
 import os
+import zlib
+import errno
 import uuid
-import time
 import shutil
+import hashlib
 
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, session
 from werkzeug.utils import secure_filename
 
 from .upload_auth import fm_auth
 from .upload_paths import UPLOAD_INTERNAL, internal_path
-from .upload_sessions import upload_lock, upload_sessions
+from .upload_sessions import (
+    create_session, get_session, claim_session, chunk_length,
+    has_chunk, mark_chunk, reset_chunks, chunk_crcs, missing_chunks,
+    UPLOAD_PARALLEL,
+    DEFAULT_CHUNK_SIZE, MIN_CHUNK_SIZE, MAX_CHUNK_SIZE
+)
+from .upload_config import MAX_UPLOAD_SIZE
 from .upload_utils import check_disk_space
+from .upload_cleanup import start_sweeper
+from app.routes.BMS_library.library_search import index_file
+from app.routes.BMS_library.library_hash import (
+    find_duplicate, file_hash, forget as forget_hash, MIN_DUP_SIZE
+)
 
 upload = Blueprint("upload", __name__, url_prefix="/upload")
 
 
+def _owner():
+    return session.get("username")
+
 
 # =================================================
 # UI UPLOAD PAGE
@@ -26,95 +42,257 @@ def upload_ui():
 
 # =================================================
 # START SESSION
+# Chunk ditulis langsung (pwrite) ke 1 file sementara
+# yang dipesan di awal (fallocate) → finish cukup rename
 # =================================================
 @upload.route("/upload_chunk/start", methods=["POST"])
 @fm_auth
 def upload_start():
     filename = secure_filename(request.form.get("name", ""))
-    total_size = int(request.form.get("total_size", 0))
+    total_size = request.form.get("total_size", 0, type=int)
+    chunk_size = request.form.get("chunk_size", DEFAULT_CHUNK_SIZE, type=int)
 
     if not filename or total_size <= 0:
         return jsonify({"error": "Data tidak valid"}), 400
 
-    if not check_disk_space(total_size):
+    if total_size > MAX_UPLOAD_SIZE:
+        return jsonify({"error": "File terlalu besar"}), 413
+
+    if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+        return jsonify({"error": "chunk_size tidak valid"}), 400
+
+    if not check_disk_space(total_size, UPLOAD_INTERNAL):
         return jsonify({"error": "Disk penuh"}), 507
 
+    # Worker hasil fork belum punya thread sweeper
+    start_sweeper()
+
     session_id = uuid.uuid4().hex
-    tmp_dir = os.path.join(UPLOAD_INTERNAL, session_id)
-    os.makedirs(tmp_dir, exist_ok=True)
 
-    with upload_lock:
-        upload_sessions[session_id] = {
-            "filename": filename,
-            "total": total_size,
-            "received": 0,
-            "tmp_dir": tmp_dir,
-            "created": time.time()
-        }
+    try:
+        info = create_session(session_id, _owner(), filename, total_size, chunk_size)
+    except OSError as e:
+        if e.errno == errno.ENOSPC:
+            return jsonify({"error": "Disk penuh"}), 507
+        raise
 
-    return jsonify({"session_id": session_id})
+    return jsonify({
+        "session_id": session_id,
+        "chunk_size": chunk_size,
+        "total_chunks": info["total_chunks"],
+        "parallel": UPLOAD_PARALLEL
+    })
 
 
 # =================================================
-# APPEND CHUNK
+# APPEND CHUNK (boleh acak / paralel / diulang)
+#   crc32  : hex 8 digit (opsional, dianjurkan)
+#   sha256 : hex 64 digit (opsional)
+# Chunk yang sudah diterima tidak ditulis ulang (idempoten)
 # =================================================
+# Potongan baca dari request saat pwrite (memori konstan)
+WRITE_BLOCK = 256 * 1024
+
+
+def _write_chunk(path, offset, stream, length, sha=None):
+    """
+    Tulis tepat `length` byte dari stream ke file di offset (pwrite).
+    Return (jumlah byte diterima, crc32). Jumlah byte bisa kurang / lebih
+    dari length. sha (hashlib) ikut di-update jika diberikan.
+    """
+    written = 0
+    crc = 0
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        while True:
+            block = stream.read(WRITE_BLOCK)
+            if not block:
+                break
+            if written + len(block) > length:
+                # Lebih panjang dari seharusnya → tolak, jangan timpa chunk lain
+                return written + len(block), crc
+            os.pwrite(fd, block, offset + written)
+            crc = zlib.crc32(block, crc)
+            if sha is not None:
+                sha.update(block)
+            written += len(block)
+    finally:
+        os.close(fd)
+    return written, crc
+
+
+def _parse_crc(value):
+    try:
+        return int(value, 16) & 0xFFFFFFFF
+    except (TypeError, ValueError):
+        return None
+
+
+def _progress(info):
+    return min(int((info["received"] / info["total"]) * 100), 100)
+
+
 @upload.route("/upload_chunk/append", methods=["POST"])
 @fm_auth
 def upload_append():
     session_id = request.form.get("session_id")
-    chunk_index = request.form.get("chunk_index")
+    chunk_index = request.form.get("chunk_index", type=int)
     chunk = request.files.get("chunk")
+    crc_hex = request.form.get("crc32")
+    sha_hex = (request.form.get("sha256") or "").lower()
 
-    if not session_id or chunk is None:
+    if not session_id or chunk is None or chunk_index is None:
         return jsonify({"error": "Chunk tidak valid"}), 400
 
-    with upload_lock:
-        info = upload_sessions.get(session_id)
+    expected_crc = _parse_crc(crc_hex) if crc_hex else None
+    if crc_hex and expected_crc is None:
+        return jsonify({"error": "crc32 tidak valid"}), 400
 
+    info = get_session(session_id, _owner())
     if not info:
         return jsonify({"error": "Session tidak ditemukan"}), 404
 
-    part_name = f"{int(chunk_index):06d}.part"
-    part_path = os.path.join(info["tmp_dir"], part_name)
-    chunk.save(part_path)
+    if not 0 <= chunk_index < info["total_chunks"]:
+        return jsonify({"error": "chunk_index di luar jangkauan"}), 400
+
+    # Retry chunk yang sudah masuk → tidak ditulis ulang
+    if has_chunk(info, chunk_index):
+        return jsonify({"progress": _progress(info), "duplicate": True})
+
+    expected = chunk_length(info, chunk_index)
+    sha = hashlib.sha256() if sha_hex else None
+    size, crc = _write_chunk(
+        info["tmp_path"],
+        chunk_index * info["chunk_size"],
+        chunk.stream,
+        expected,
+        sha
+    )
 
-    size = os.path.getsize(part_path)
+    if size != expected:
+        return jsonify({
+            "error": f"Ukuran chunk {chunk_index} salah ({size} != {expected})"
+        }), 400
 
-    with upload_lock:
-        info["received"] += size
-        progress = int((info["received"] / info["total"]) * 100)
+    # Checksum salah → chunk tidak ditandai, client cukup kirim ulang
+    if expected_crc is not None and crc != expected_crc:
+        return jsonify({"error": f"Checksum chunk {chunk_index} salah (crc32)"}), 400
 
-    return jsonify({"progress": min(progress, 100)})
+    if sha is not None and sha.hexdigest() != sha_hex:
+        return jsonify({"error": f"Checksum chunk {chunk_index} salah (sha256)"}), 400
+
+    new = mark_chunk(info, chunk_index, crc)
+
+    return jsonify({"progress": _progress(info), "duplicate": not new})
 
 
 # =================================================
-# FINISH UPLOAD
+# FINISH UPLOAD (verifikasi + rename atomik, tanpa salin ulang)
+#   1x baca berurutan: SHA-256 & BLAKE2b (index dedup) seluruh file
+#   dihitung sambil mencocokkan CRC32 tiap chunk yang tersimpan
+#   Isi identik sudah tersimpan di BMS → salinan baru dibuang
 # =================================================
+def _verify_file(info):
+    """
+    Return (sha256 hex, blake2b hex, daftar chunk yang CRC-nya tidak cocok).
+    """
+    crcs = chunk_crcs(info["session_id"])
+    sha = hashlib.sha256()
+    blake = hashlib.blake2b()
+    bad = []
+
+    with open(info["tmp_path"], "rb") as f:
+        for index in range(info["total_chunks"]):
+            remaining = chunk_length(info, index)
+            crc = 0
+            while remaining > 0:
+                block = f.read(min(WRITE_BLOCK, remaining))
+                if not block:
+                    break
+                sha.update(block)
+                blake.update(block)
+                crc = zlib.crc32(block, crc)
+                remaining -= len(block)
+
+            if remaining > 0 or crcs.get(index) != crc:
+                bad.append(index)
+
+    return sha.hexdigest(), blake.hexdigest(), bad
+
+
+def _move_into_place(src, dst):
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        # Folder tujuan beda filesystem → terpaksa salin
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+
 @upload.route("/upload_chunk/finish", methods=["POST"])
 @fm_auth
 def upload_finish():
     session_id = request.form.get("session_id")
     final_filename = secure_filename(request.form.get("final_filename", ""))
+    expected_sha = (request.form.get("sha256") or "").lower()
+    dedupe = request.form.get("dedupe", "1") != "0"
 
     if not session_id or not final_filename:
         return jsonify({"error": "Finish tidak valid"}), 400
 
-    with upload_lock:
-        info = upload_sessions.pop(session_id, None)
-
+    info = get_session(session_id, _owner())
     if not info:
         return jsonify({"error": "Session tidak ditemukan"}), 404
 
+    missing = missing_chunks(info)
+    if missing:
+        return jsonify({
+            "error": "Chunk belum lengkap",
+            "missing": missing
+        }), 409
+
+    digest, blake, bad = _verify_file(info)
+    if bad:
+        # Isi file tidak sama dengan saat chunk diterima → minta kirim ulang
+        reset_chunks(info, bad)
+        return jsonify({
+            "error": "Verifikasi chunk gagal",
+            "missing": bad
+        }), 409
+
+    if expected_sha and digest != expected_sha:
+        return jsonify({
+            "error": "Checksum file tidak cocok",
+            "sha256": digest
+        }), 409
+
+    # Finish ganda (mis. worker lain) → hanya 1 yang memindahkan file
+    if not claim_session(session_id):
+        return jsonify({"error": "Session tidak ditemukan"}), 404
+
+    # Cek sebelum rename → file lama bernama sama tidak ikut tertimpa
+    existing = find_duplicate(info["tmp_path"], known_full=blake) if dedupe else None
+    forget_hash(info["tmp_path"])
+    if existing:
+        os.remove(info["tmp_path"])
+        return jsonify({
+            "status": "ok",
+            "file": final_filename,
+            "sha256": digest,
+            "duplicate_of": existing
+        })
+
     final_path = internal_path(final_filename)
+    _move_into_place(info["tmp_path"], final_path)
 
-    with open(final_path, "wb") as out:
-        for part in sorted(os.listdir(info["tmp_dir"])):
-            with open(os.path.join(info["tmp_dir"], part), "rb") as pf:
-                shutil.copyfileobj(pf, out)
+    # Daftarkan ke index hash → upload / unduhan berikutnya bisa dicek
+    if info["total"] >= MIN_DUP_SIZE:
+        file_hash(final_path, known_full=blake)
 
-    shutil.rmtree(info["tmp_dir"], ignore_errors=True)
+    index_file(final_path)
 
-    return jsonify({"status": "ok", "file": final_filename})
+    return jsonify({"status": "ok", "file": final_filename, "sha256": digest})
 
 # =================================================
 # CEK STATUS UPLOAD (RESUME)
@@ -124,14 +302,16 @@ def upload_finish():
 def upload_status():
     session_id = request.args.get("session_id")
 
-    with upload_lock:
-        info = upload_sessions.get(session_id)
-
+    info = get_session(session_id, _owner())
     if not info:
         return jsonify({"exists": False})
 
     return jsonify({
         "exists": True,
         "received": info["received"],
-        "total": info["total"]
-    })
\ No newline at end of file
+        "total": info["total"],
+        "chunk_size": info["chunk_size"],
+        "total_chunks": info["total_chunks"],
+        "missing": missing_chunks(info),
+        "expires_at": info["expires_at"]
+    })
@@ -1,4 +1,257 @@
-from threading import Lock
+import os
+import time
+import errno
 
-upload_lock = Lock()
-upload_sessions = {}   # { session_id : {...} }
\ No newline at end of file
+from app.database.BMS_db_pool import get_connection
+from .upload_paths import UPLOAD_INTERNAL
+
+# =====================================================
+# SESSION UPLOAD (SQLite, dibagi semua worker gunicorn)
+#   ✔ Chunk boleh mendarat di worker mana pun
+#   ✔ Upload tetap bisa dilanjutkan setelah restart
+#   ✔ bitmap: 1 karakter per chunk ('0' belum, '1' diterima)
+#   ✔ expires_at diperpanjang setiap ada chunk masuk
+#   ✔ CRC32 tiap chunk disimpan (upload_chunks) → diverifikasi saat finish
+# =====================================================
+
+# Ukuran chunk default & batas yang diterima dari client (bytes)
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Jumlah chunk yang disarankan dikirim bersamaan oleh client
+UPLOAD_PARALLEL = int(os.environ.get("BMS_UPLOAD_PARALLEL", "4"))
+
+# Session tanpa aktivitas selama ini dihapus sweeper (detik)
+SESSION_TIMEOUT = int(os.environ.get("BMS_UPLOAD_TTL", str(24 * 3600)))
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+
+def get_db():
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS upload_sessions (
+                session_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                filename TEXT NOT NULL,
+                total INTEGER NOT NULL,
+                chunk_size INTEGER NOT NULL,
+                total_chunks INTEGER NOT NULL,
+                received INTEGER NOT NULL DEFAULT 0,
+                bitmap TEXT NOT NULL,
+                tmp_path TEXT NOT NULL,
+                created REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        # Sweeper → cari session kedaluwarsa
+        conn.execute("""
+            CREATE INDEX IF NOT EXISTS idx_upload_sessions_expires
+            ON upload_sessions(expires_at)
+        """)
+        # CRC32 chunk yang sudah diterima (dihitung server saat ditulis)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS upload_chunks (
+                session_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                crc32 INTEGER NOT NULL,
+                PRIMARY KEY (session_id, chunk_index)
+            ) WITHOUT ROWID
+        """)
+        conn.commit()
+        _table_ready = True
+
+    return conn
+
+
+def temp_path(session_id):
+    """
+    1 file sementara per session (bukan folder berisi .part).
+    """
+    return os.path.join(UPLOAD_INTERNAL, session_id + ".upload")
+
+
+def preallocate(path, size):
+    """
+    Buat file sementara seukuran total upload.
+    fallocate → blok disk dipesan di awal (gagal cepat jika disk penuh).
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    os.remove(path)
+                    raise
+        # FS tanpa dukungan fallocate (mis. FAT / sdcard) → sparse file
+        os.ftruncate(fd, size)
+    finally:
+        os.close(fd)
+
+
+def create_session(session_id, owner, filename, total, chunk_size):
+    total_chunks = (total + chunk_size - 1) // chunk_size
+    path = temp_path(session_id)
+    preallocate(path, total)
+
+    now = time.time()
+    info = {
+        "session_id": session_id,
+        "owner": owner,
+        "filename": filename,
+        "total": total,
+        "chunk_size": chunk_size,
+        "total_chunks": total_chunks,
+        "received": 0,
+        "bitmap": "0" * total_chunks,
+        "tmp_path": path,
+        "created": now,
+        "expires_at": now + SESSION_TIMEOUT
+    }
+
+    conn = get_db()
+    try:
+        conn.execute("""
+            INSERT INTO upload_sessions
+                (session_id, owner, filename, total, chunk_size, total_chunks,
+                 received, bitmap, tmp_path, created, expires_at)
+            VALUES (:session_id, :owner, :filename, :total, :chunk_size,
+                    :total_chunks, :received, :bitmap, :tmp_path,
+                    :created, :expires_at)
+        """, info)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        os.remove(path)
+        raise
+
+    return info
+
+
+def get_session(session_id, owner):
+    """
+    Session milik owner yang belum kedaluwarsa, atau None.
+    Selalu dibaca ulang dari DB (worker lain bisa saja menambah chunk).
+    """
+    if not session_id:
+        return None
+
+    row = get_db().execute(
+        "SELECT * FROM upload_sessions WHERE session_id=? AND owner=? AND expires_at>?",
+        (session_id, owner, time.time())
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def chunk_length(info, index):
+    """
+    Panjang chunk ke-index (chunk terakhir boleh lebih pendek).
+    """
+    start = index * info["chunk_size"]
+    return min(info["chunk_size"], info["total"] - start)
+
+
+def has_chunk(info, index):
+    return info["bitmap"][index] == "1"
+
+
+def mark_chunk(info, index, crc):
+    """
+    Tandai chunk diterima + simpan CRC32-nya + perpanjang masa berlaku.
+    1 UPDATE atomik → aman walau chunk yang sama masuk ke 2 worker;
+    chunk ulang (retry) tidak dihitung 2x.
+    Return True jika chunk baru. info["received"] ikut diperbarui.
+    """
+    conn = get_db()
+    cur = conn.execute("""
+        UPDATE upload_sessions
+        SET bitmap = substr(bitmap, 1, :i) || '1' || substr(bitmap, :i + 2),
+            received = received + :length,
+            expires_at = :expires
+        WHERE session_id = :sid AND substr(bitmap, :i + 1, 1) = '0'
+    """, {
+        "i": index,
+        "length": chunk_length(info, index),
+        "expires": time.time() + SESSION_TIMEOUT,
+        "sid": info["session_id"]
+    })
+    new = cur.rowcount == 1
+    if new:
+        conn.execute(
+            "INSERT OR REPLACE INTO upload_chunks (session_id, chunk_index, crc32) VALUES (?,?,?)",
+            (info["session_id"], index, crc)
+        )
+    conn.commit()
+
+    row = conn.execute(
+        "SELECT received, bitmap FROM upload_sessions WHERE session_id=?",
+        (info["session_id"],)
+    ).fetchone()
+    if row:
+        info["received"] = row["received"]
+        info["bitmap"] = row["bitmap"]
+
+    return new
+
+
+def reset_chunks(info, indexes):
+    """
+    Tandai ulang chunk sebagai belum diterima (gagal verifikasi saat finish).
+    """
+    conn = get_db()
+    for index in indexes:
+        cur = conn.execute("""
+            UPDATE upload_sessions
+            SET bitmap = substr(bitmap, 1, :i) || '0' || substr(bitmap, :i + 2),
+                received = received - :length
+            WHERE session_id = :sid AND substr(bitmap, :i + 1, 1) = '1'
+        """, {
+            "i": index,
+            "length": chunk_length(info, index),
+            "sid": info["session_id"]
+        })
+        if cur.rowcount:
+            conn.execute(
+                "DELETE FROM upload_chunks WHERE session_id=? AND chunk_index=?",
+                (info["session_id"], index)
+            )
+    conn.commit()
+
+
+def chunk_crcs(session_id):
+    """
+    { chunk_index : crc32 } untuk chunk yang sudah diterima.
+    """
+    return {
+        r["chunk_index"]: r["crc32"]
+        for r in get_db().execute(
+            "SELECT chunk_index, crc32 FROM upload_chunks WHERE session_id=?",
+            (session_id,)
+        )
+    }
+
+
+def missing_chunks(info):
+    return [i for i, got in enumerate(info["bitmap"]) if got != "1"]
+
+
+def claim_session(session_id):
+    """
+    Hapus session dari DB saat finish.
+    Return True hanya untuk 1 pemanggil (finish ganda → False).
+    """
+    conn = get_db()
+    cur = conn.execute(
+        "DELETE FROM upload_sessions WHERE session_id=?", (session_id,)
+    )
+    conn.execute("DELETE FROM upload_chunks WHERE session_id=?", (session_id,))
+    conn.commit()
+    return cur.rowcount == 1
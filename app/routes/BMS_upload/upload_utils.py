@@ -11,6 +11,6 @@ def detect_category(filename: str) -> str:
 
     return "media/other"
 
-def check_disk_space(required_size: int) -> bool:
-    total, used, free = shutil.disk_usage("/")
+def check_disk_space(required_size: int, path: str = "/") -> bool:
+    total, used, free = shutil.disk_usage(path)
     return free > required_size
\ No newline at end of file
@@ -1,6 +1,6 @@
-import sqlite3
 from flask import Blueprint, render_template, session, redirect
 from app.BMS_config import DB_PATH
+from app.database.BMS_db_pool import get_connection
 from .BMS_utils import require_login
 
 
@@ -11,9 +11,7 @@ user = Blueprint("user", __name__, url_prefix="/user")
 # DB Helper (simple)
 # ======================================================
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_connection(DB_PATH)
 
 
 # ======================================================
@@ -2,14 +2,19 @@
 # BMS_VIDEO_DB.PY — Database helper untuk Video (FINAL)
 # - Koneksi DB
 # - Migrasi kolom user_id otomatis
+# - Katalog bersama: 1 baris videos / folders per path, akses per user
+#   lewat video_library (BMS_library/library_acl)
 # - Identifier user (support guest fallback)
 # - Validasi file & path safety
 # ============================================================================
 
 import os
-import sqlite3
 from flask import session
-from app.BMS_config import DB_PATH, VIDEO_FOLDER
+from app.BMS_config import VIDEO_FOLDER
+from app.database.BMS_db_pool import get_connection
+from app.routes.BMS_library.library_search import ensure_video_index
+from app.routes.BMS_library.library_acl import ensure_library
+from .BMS_video_probe import ensure_video_meta
 
 # Pastikan folder video ada
 os.makedirs(VIDEO_FOLDER, exist_ok=True)
@@ -19,7 +24,7 @@ _db_initialized = False
 
 def get_db():
     """
-    Membuka koneksi ke database SQLite dan memastikan struktur tabel sudah sesuai.
+    Mengambil koneksi pool SQLite dan memastikan struktur tabel sudah sesuai.
     
     Fungsi ini menjalankan inisialisasi tabel dan migrasi kolom jika diperlukan,
     termasuk menambahkan kolom user_id dan indeks untuk performa query.
@@ -28,8 +33,7 @@ def get_db():
         sqlite3.Connection: Objek koneksi database yang sudah dikonfigurasi
     """
     global _db_initialized
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
+    conn = get_connection()
 
     if not _db_initialized:
         cur = conn.cursor()
@@ -78,24 +82,46 @@ def get_db():
             pass  # Kolom mungkin sudah ada
 
         # ============ INDEKS UNTUK OPTIMASI QUERY ============
-        # Buat indeks unik gabungan (folder_path + user_id) untuk memastikan
-        # folder_path dapat sama untuk user berbeda, tetapi unik per user
+        # Katalog bersama: user_id di folders / videos tidak dipakai lagi
+        # (akses lewat video_library) → indeks lama hanya memperlambat tulis
+        for idx in (
+            "idx_folders_path_user",
+            "idx_videos_folder_user",
+            "idx_videos_user_folder",
+            "idx_folders_user_name",
+        ):
+            cur.execute(f"DROP INDEX IF EXISTS {idx}")
+
+        # List video per folder (WHERE v.folder_id=?)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_videos_folder
+            ON videos(folder_id)
+        """)
+
+        # ============ PUSTAKA PER USER (KATALOG BERSAMA) ============
+        # Tabel baru → gabungkan baris lama per user jadi 1 baris per path
+        if ensure_library(cur, "video"):
+            _migrate_shared_catalog(cur)
+
+        # 1 baris per path (videos) & per folder (folders)
         try:
             cur.execute("""
-                CREATE UNIQUE INDEX IF NOT EXISTS idx_folders_path_user
-                ON folders(folder_path, user_id)
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_videos_filepath
+                ON videos(filepath)
             """)
-        except Exception:
-            pass  # Indeks mungkin sudah ada
-
-        # Buat indeks untuk mempercepat query video berdasarkan folder_id dan user_id
-        try:
             cur.execute("""
-                CREATE INDEX IF NOT EXISTS idx_videos_folder_user
-                ON videos(folder_id, user_id)
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_folders_path
+                ON folders(folder_path)
             """)
         except Exception:
-            pass  # Indeks mungkin sudah ada
+            pass  # Data lama belum bersih → scan berikutnya tetap jalan
+
+        # ============ INDEX PENCARIAN (FTS5) ============
+        # Trigger sinkron videos → search_docs (lihat BMS_library/library_search)
+        ensure_video_index(cur)
+
+        # ============ KATALOG PROBE (durasi / codec / resolusi) ============
+        ensure_video_meta(cur)
 
         conn.commit()
         _db_initialized = True  # Tandai bahwa inisialisasi sudah dilakukan
@@ -103,6 +129,71 @@ def get_db():
     return conn
 
 
+# -------------------------
+# Migrasi ke katalog bersama
+# -------------------------
+def _table_exists(cur, name):
+    return cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def _migrate_shared_catalog(cur):
+    """
+    Dulu: 1 baris videos / folders per user, path duplikat diberi akhiran
+    '::<owner>' (folder) atau '::user::' (video). Sekarang: baris dengan
+    id terkecil dipertahankan, akses user lama dipindah ke video_library.
+    """
+    # ---------- FOLDERS ----------
+    keep_folder = {}
+    folder_map = {}
+    for r in cur.execute("SELECT id, folder_path FROM folders ORDER BY id").fetchall():
+        path = (r["folder_path"] or "").split("::")[0]
+        keep = keep_folder.setdefault(path, r["id"])
+        folder_map[r["id"]] = keep
+
+    for old, keep in folder_map.items():
+        if old != keep:
+            cur.execute("UPDATE videos SET folder_id=? WHERE folder_id=?", (keep, old))
+            cur.execute("DELETE FROM folders WHERE id=?", (old,))
+    for path, keep in keep_folder.items():
+        cur.execute("UPDATE folders SET folder_path=? WHERE id=?", (path, keep))
+
+    # ---------- VIDEOS ----------
+    rows = cur.execute(
+        "SELECT id, filepath, user_id, added_at FROM videos ORDER BY id"
+    ).fetchall()
+    keep_video = {}
+    for r in rows:
+        path = (r["filepath"] or "").split("::user::")[0]
+        keep = keep_video.setdefault(path, r["id"])
+
+        if r["user_id"] is not None:
+            cur.execute("""
+                INSERT OR IGNORE INTO video_library (user_id, video_id, added_at)
+                VALUES (?,?,?)
+            """, (r["user_id"], keep, r["added_at"]))
+
+        if keep != r["id"]:
+            if _table_exists(cur, "playback_state"):
+                cur.execute("""
+                    UPDATE OR IGNORE playback_state SET item_id=?
+                    WHERE kind='video' AND item_id=?
+                """, (keep, r["id"]))
+                cur.execute(
+                    "DELETE FROM playback_state WHERE kind='video' AND item_id=?",
+                    (r["id"],)
+                )
+            cur.execute("DELETE FROM videos WHERE id=?", (r["id"],))
+
+    for path, keep in keep_video.items():
+        cur.execute("UPDATE videos SET filepath=? WHERE id=?", (path, keep))
+
+    # Scan berikutnya memakai 1 scope bersama
+    if _table_exists(cur, "scan_state"):
+        cur.execute("DELETE FROM scan_state WHERE scope LIKE 'video:%'")
+
+
 # -------------------------
 # Current user identifier
 # -------------------------
@@ -137,6 +228,16 @@ def current_user_identifier():
 # Daftar ekstensi video yang dianggap valid
 VALID_VIDEO_EXT = (".mp4", ".mkv", ".webm", ".avi", ".mov")
 
+# Mimetype file asli untuk /video/play (mkv / avi → lebih aman lewat HLS)
+VIDEO_MIMETYPES = {
+    ".mp4": "video/mp4",
+    ".m4v": "video/mp4",
+    ".mkv": "video/x-matroska",
+    ".webm": "video/webm",
+    ".avi": "video/x-msvideo",
+    ".mov": "video/quicktime",
+}
+
 def is_video_file(name):
     """
     Memeriksa apakah sebuah file adalah file video berdasarkan ekstensinya.
@@ -150,6 +251,14 @@ def is_video_file(name):
     return isinstance(name, str) and name.lower().endswith(VALID_VIDEO_EXT)
 
 
+def video_mimetype(path):
+    """
+    Mimetype berdasarkan ekstensi file video.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    return VIDEO_MIMETYPES.get(ext, "application/octet-stream")
+
+
 def is_inside_video_folder(path):
     """
     Memeriksa apakah path file berada di dalam folder video yang ditentukan (VIDEO_FOLDER).
@@ -0,0 +1,500 @@
+# ============================================================================
+# BMS_video_hls.py — HLS adaptive bitrate (/video/hls/<id>/master.m3u8)
+# - Info codec dari katalog video_meta (tanpa probe ulang)
+# - Codec kompatibel (H.264 + AAC/MP3) → varian "src" remux tanpa encode
+# - Varian lebih kecil (360p / 720p / 1080p) di-transcode libx264 + AAC
+# - Segmen dibuat LAZY saat pertama diminta (seek tidak menunggu 1 file)
+# - Batas potong segmen dihitung sekali (keyframe / interval tetap)
+#   dan dipakai semua varian → segmen antar varian sejajar
+# - Cache segmen di disk, LRU dengan batas ukuran (BMS_disk_cache)
+# - Jumlah ffmpeg bersamaan dibatasi semaphore
+# ============================================================================
+
+import os
+import json
+import math
+import hashlib
+import threading
+import subprocess
+
+from flask import Blueprint, Response, jsonify
+
+from app.BMS_config import CACHE_FOLDER
+from app.routes.BMS_stream import send_media
+from app.routes.BMS_disk_cache import touch, evict_lru, folder_size
+from app.routes.BMS_playback.playback_buffer import record_play
+from .BMS_video_db import get_db, current_user_identifier
+from .BMS_video_probe import cached_probe, keyframe_times, ProbeError
+
+video_hls = Blueprint("video_hls", __name__, url_prefix="/video/hls")
+
+HLS_FOLDER = os.path.join(CACHE_FOLDER, "hls")
+
+# Target panjang segmen (detik)
+SEGMENT_SECONDS = 6.0
+
+# Tangga bitrate: (nama, tinggi px, bitrate video kbps)
+LADDER = (
+    ("360p", 360, 800),
+    ("720p", 720, 2500),
+    ("1080p", 1080, 5000),
+)
+AUDIO_BITRATE = 128
+
+# Codec yang bisa langsung dimasukkan ke MPEG-TS tanpa encode ulang
+COPY_VIDEO_CODECS = ("h264",)
+COPY_AUDIO_CODECS = ("aac", "mp3")
+COPY_PIX_FMTS = ("yuv420p", "yuvj420p")
+
+# Batas total ukuran cache segmen (MB)
+CACHE_MAX_BYTES = int(os.environ.get("BMS_HLS_CACHE_MB", "4096")) * 1024 * 1024
+
+# Jumlah ffmpeg segmen bersamaan
+MAX_JOBS = max(1, int(os.environ.get(
+    "BMS_HLS_WORKERS", max(1, (os.cpu_count() or 2) // 2)
+)))
+
+# Batas waktu ffmpeg per segmen (detik)
+SEGMENT_TIMEOUT = int(os.environ.get("BMS_HLS_TIMEOUT", "120"))
+
+# Lama menunggu slot ffmpeg kosong sebelum 503 (detik)
+SLOT_WAIT = 30.0
+
+PLAYLIST_MIME = "application/vnd.apple.mpegurl"
+SEGMENT_MIME = "video/mp2t"
+
+_slots = threading.BoundedSemaphore(MAX_JOBS)
+
+# Lock per plan / segmen → 1 file tidak dibuat 2x bersamaan
+# key → [lock, jumlah pemakai]; dibuang saat pemakai terakhir selesai
+_locks = {}
+_locks_guard = threading.Lock()
+
+# Perkiraan ukuran cache (None = belum dihitung)
+_cache_bytes = None
+_cache_guard = threading.Lock()
+
+os.makedirs(HLS_FOLDER, exist_ok=True)
+
+
+class HlsBusy(Exception):
+    """Semua slot ffmpeg terpakai."""
+
+
+class HlsError(Exception):
+    """ffmpeg / ffprobe gagal."""
+
+
+# ============================================================================
+# Lock per key
+# ============================================================================
+def _lock_for(key):
+    """
+    Lock untuk key (+1 pemakai). Setiap panggilan WAJIB dipasangkan
+    dengan _drop_lock(key), termasuk yang hanya menunggu.
+    """
+    with _locks_guard:
+        entry = _locks.get(key)
+        if entry is None:
+            entry = _locks[key] = [threading.Lock(), 0]
+        entry[1] += 1
+        return entry[0]
+
+
+def _drop_lock(key):
+    with _locks_guard:
+        entry = _locks.get(key)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del _locks[key]
+
+
+def _tmp_name(path):
+    """File sementara unik per proses & thread (worker gunicorn lain aman)."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _acquire_slot():
+    if not _slots.acquire(timeout=SLOT_WAIT):
+        raise HlsBusy()
+
+
+# ============================================================================
+# PLAN: probe + batas segmen + daftar varian (disimpan plan.json)
+# ============================================================================
+def cache_dir(src, st):
+    """
+    Folder cache per versi file (berubah otomatis jika file diganti).
+    """
+    raw = f"{os.path.abspath(src)}|{st.st_size}|{st.st_mtime_ns}"
+    return os.path.join(HLS_FOLDER, hashlib.md5(raw.encode()).hexdigest())
+
+
+def is_copy_compatible(info):
+    return (
+        info.get("video_codec") in COPY_VIDEO_CODECS
+        and info.get("pix_fmt") in COPY_PIX_FMTS
+        and info.get("audio_codec") in COPY_AUDIO_CODECS + (None,)
+    )
+
+
+def _segment_cuts(duration, keyframes=None):
+    """
+    Titik potong [0, t1, t2, ..., duration].
+    Dengan keyframes: potong hanya di keyframe, minimal SEGMENT_SECONDS.
+    """
+    cuts = [0.0]
+    points = keyframes if keyframes else (
+        i * SEGMENT_SECONDS for i in range(1, math.ceil(duration / SEGMENT_SECONDS))
+    )
+    for t in points:
+        if t - cuts[-1] >= SEGMENT_SECONDS and duration - t > 0.5:
+            cuts.append(t)
+    cuts.append(duration)
+    return cuts
+
+
+def _variants(info, copy):
+    height = info.get("height") or 0
+    variants = []
+
+    if copy:
+        variants.append({
+            "name": "src",
+            "copy": True,
+            "height": info.get("height"),
+            "width": info.get("width"),
+            "bandwidth": info.get("bitrate") or 0,
+        })
+
+    for name, h, vbr in LADDER:
+        # Jangan upscale; varian copy sudah mewakili resolusi asli
+        if height and (h > height or (copy and h >= height)):
+            continue
+        width = round(info["width"] * h / height / 2) * 2 if height and info.get("width") else None
+        variants.append({
+            "name": name,
+            "copy": False,
+            "height": h,
+            "width": width,
+            "video_kbps": vbr,
+            "bandwidth": (vbr + AUDIO_BITRATE) * 1000,
+        })
+
+    # Sumber sangat kecil / resolusi tidak diketahui → minimal 1 varian
+    if not variants:
+        name, h, vbr = LADDER[0]
+        variants.append({
+            "name": name, "copy": False, "height": h, "width": None,
+            "video_kbps": vbr, "bandwidth": (vbr + AUDIO_BITRATE) * 1000,
+        })
+
+    return variants
+
+
+def _read_plan(plan_path):
+    try:
+        with open(plan_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_plan(src, st):
+    """
+    Baca / buat plan.json untuk 1 versi file video.
+    Raise HlsBusy / HlsError.
+    """
+    folder = cache_dir(src, st)
+    plan_path = os.path.join(folder, "plan.json")
+
+    plan = _read_plan(plan_path)
+    if plan is not None:
+        return plan
+
+    # Pemakai dilepas juga saat error / return awal (dict _locks tidak bocor)
+    try:
+        with _lock_for(plan_path):
+            plan = _read_plan(plan_path)
+            if plan is not None:
+                return plan
+
+            _acquire_slot()
+            try:
+                # Katalog video_meta (scan) → ffprobe hanya jika belum ada
+                info = cached_probe(src)
+                if not info.get("duration") or not info.get("video_codec"):
+                    raise HlsError("stream video / durasi tidak terbaca")
+
+                copy = is_copy_compatible(info)
+                keyframes = keyframe_times(src) if copy else None
+                if copy and len(keyframes) < 2:
+                    copy, keyframes = False, None
+            except ProbeError as e:
+                raise HlsError(str(e))
+            finally:
+                _slots.release()
+
+            plan = {
+                "info": info,
+                "copy": copy,
+                "cuts": _segment_cuts(info["duration"], keyframes),
+                "variants": _variants(info, copy),
+            }
+
+            os.makedirs(folder, exist_ok=True)
+            tmp = _tmp_name(plan_path)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(plan, f)
+            os.replace(tmp, plan_path)
+    finally:
+        _drop_lock(plan_path)
+    return plan
+
+
+def find_variant(plan, name):
+    return next((v for v in plan["variants"] if v["name"] == name), None)
+
+
+# ============================================================================
+# PLAYLIST
+# ============================================================================
+def master_playlist(plan):
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3"]
+    for v in plan["variants"]:
+        attrs = f"BANDWIDTH={int(v['bandwidth'] or 1)}"
+        if v.get("width") and v.get("height"):
+            attrs += f",RESOLUTION={v['width']}x{v['height']}"
+        lines.append(f"#EXT-X-STREAM-INF:{attrs}")
+        lines.append(f"{v['name']}/index.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+def media_playlist(plan):
+    cuts = plan["cuts"]
+    lengths = [cuts[i + 1] - cuts[i] for i in range(len(cuts) - 1)]
+
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{math.ceil(max(lengths))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for i, length in enumerate(lengths):
+        lines.append(f"#EXTINF:{length:.3f},")
+        lines.append(f"seg_{i}.ts")
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# SEGMEN (lazy)
+# ============================================================================
+def _segment_cmd(src, variant, start, length, out_path):
+    # Copy: -ss mundur ke keyframe <= posisi; +1 ms agar pembulatan
+    # waktu keyframe tidak jatuh ke keyframe sebelumnya
+    seek = start + 0.001 if variant["copy"] and start > 0 else start
+
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostdin", "-loglevel", "error", "-y",
+        "-ss", f"{seek:.3f}",
+        "-i", src,
+        "-t", f"{length:.3f}",
+        "-map", "0:v:0", "-map", "0:a:0?",
+    ]
+
+    if variant["copy"]:
+        cmd += ["-c", "copy"]
+    else:
+        kbps = variant["video_kbps"]
+        cmd += [
+            "-vf", f"scale=-2:{variant['height']}",
+            "-c:v", "libx264", "-preset", "veryfast",
+            "-profile:v", "main", "-pix_fmt", "yuv420p",
+            "-b:v", f"{kbps}k",
+            "-maxrate", f"{int(kbps * 1.1)}k",
+            "-bufsize", f"{kbps * 2}k",
+            # Setiap segmen harus mulai dari keyframe
+            "-force_key_frames", "0",
+            "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE}k", "-ac", "2",
+        ]
+
+    cmd += [
+        # Timestamp lanjut dari posisi asli → segmen tersambung mulus
+        "-output_ts_offset", f"{start:.3f}",
+        "-muxdelay", "0",
+        "-f", "mpegts",
+        out_path
+    ]
+    return cmd
+
+
+def _account(new_path):
+    """
+    Tambah perkiraan ukuran cache; lewat batas → evict LRU
+    (segmen yang baru dibuat tidak ikut dihapus).
+    """
+    global _cache_bytes
+    with _cache_guard:
+        if _cache_bytes is None:
+            _cache_bytes = folder_size(HLS_FOLDER, (".ts",))
+        else:
+            _cache_bytes += os.path.getsize(new_path)
+
+        if _cache_bytes > CACHE_MAX_BYTES:
+            # Sisakan ruang 10% agar tidak evict di setiap segmen
+            _, _cache_bytes = evict_lru(
+                HLS_FOLDER, int(CACHE_MAX_BYTES * 0.9), (".ts",), keep=new_path
+            )
+
+
+def ensure_segment(src, st, plan, variant, index):
+    """
+    Pastikan segmen ada di cache. Return path file .ts.
+    Raise HlsBusy / HlsError.
+    """
+    seg_dir = os.path.join(cache_dir(src, st), variant["name"])
+    seg_path = os.path.join(seg_dir, f"seg_{index}.ts")
+
+    if os.path.exists(seg_path):
+        return seg_path
+
+    try:
+        with _lock_for(seg_path):
+            if os.path.exists(seg_path):
+                return seg_path
+
+            os.makedirs(seg_dir, exist_ok=True)
+            start = plan["cuts"][index]
+            length = plan["cuts"][index + 1] - start
+            tmp = _tmp_name(seg_path)
+
+            _acquire_slot()
+            try:
+                p = subprocess.run(
+                    _segment_cmd(src, variant, start, length, tmp),
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.PIPE,
+                    timeout=SEGMENT_TIMEOUT
+                )
+                if p.returncode != 0 or not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
+                    err = p.stderr.decode(errors="ignore").strip()
+                    raise HlsError(err.splitlines()[-1] if err else f"exit {p.returncode}")
+
+                os.replace(tmp, seg_path)
+
+            except FileNotFoundError:
+                raise HlsError("ffmpeg tidak ditemukan")
+            except subprocess.TimeoutExpired:
+                raise HlsError("timeout")
+            finally:
+                _slots.release()
+                if os.path.exists(tmp):
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
+    finally:
+        _drop_lock(seg_path)
+    _account(seg_path)
+    return seg_path
+
+
+# ============================================================================
+# HELPER ROUTE
+# ============================================================================
+def _source(video_id):
+    """
+    Return (src, stat) milik user aktif, atau (None, response error).
+    """
+    owner = current_user_identifier()
+    conn = get_db()
+
+    row = conn.execute("""
+        SELECT v.filepath
+        FROM video_library l
+        JOIN videos v ON v.id = l.video_id
+        WHERE l.video_id=? AND l.user_id=?
+    """, (video_id, owner)).fetchone()
+
+    conn.close()
+
+    if not row:
+        return None, (jsonify({"error": "Video tidak ditemukan"}), 404)
+
+    src = row["filepath"]
+    try:
+        return src, os.stat(src)
+    except OSError:
+        return None, (jsonify({"error": "File fisik hilang"}), 404)
+
+
+def _plan_or_error(video_id):
+    src, st = _source(video_id)
+    if src is None:
+        return None, None, None, st
+
+    try:
+        return src, st, load_plan(src, st), None
+    except HlsBusy:
+        return None, None, None, _busy()
+    except HlsError as e:
+        return None, None, None, (jsonify({"error": str(e)}), 500)
+
+
+def _busy():
+    resp = jsonify({"error": "Server sedang sibuk, coba lagi"})
+    resp.headers["Retry-After"] = "3"
+    return resp, 503
+
+
+def _playlist_response(text):
+    resp = Response(text, mimetype=PLAYLIST_MIME)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+# ============================================================================
+# ROUTES
+# ============================================================================
+@video_hls.route("/<int:video_id>/master.m3u8")
+def hls_master(video_id):
+    _, _, plan, err = _plan_or_error(video_id)
+    if err:
+        return err
+    record_play(current_user_identifier(), "video", video_id)
+    return _playlist_response(master_playlist(plan))
+
+
+@video_hls.route("/<int:video_id>/<variant>/index.m3u8")
+def hls_variant(video_id, variant):
+    _, _, plan, err = _plan_or_error(video_id)
+    if err:
+        return err
+    if not find_variant(plan, variant):
+        return jsonify({"error": "Varian tidak ditemukan"}), 404
+    return _playlist_response(media_playlist(plan))
+
+
+@video_hls.route("/<int:video_id>/<variant>/seg_<int:index>.ts")
+def hls_segment(video_id, variant, index):
+    src, st, plan, err = _plan_or_error(video_id)
+    if err:
+        return err
+
+    v = find_variant(plan, variant)
+    if not v or index >= len(plan["cuts"]) - 1:
+        return jsonify({"error": "Segmen tidak ditemukan"}), 404
+
+    try:
+        seg_path = ensure_segment(src, st, plan, v, index)
+    except HlsBusy:
+        return _busy()
+    except HlsError as e:
+        return jsonify({"error": str(e)}), 500
+
+    touch(seg_path)
+    return send_media(seg_path, SEGMENT_MIME)
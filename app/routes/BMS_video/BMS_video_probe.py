@@ -0,0 +1,280 @@
+# ============================================================================
+# BMS_video_probe.py — Info stream video via ffprobe
+# - Codec video / audio, resolusi, durasi, bitrate (1x ffprobe, JSON)
+# - Daftar waktu keyframe (dari paket, tanpa decode) untuk potong segmen HLS
+# - Katalog video_meta: hasil probe disimpan per path + (size, mtime)
+#   → list / player / HLS tidak perlu probe ulang selama file tidak berubah
+# ============================================================================
+
+import os
+import json
+import time
+import subprocess
+
+from app.database.BMS_db_pool import get_connection
+
+# Batas waktu ffprobe info (detik)
+PROBE_TIMEOUT = int(os.environ.get("BMS_PROBE_TIMEOUT", "30"))
+
+# Batas waktu baca keyframe (seluruh file dibaca, tanpa decode)
+KEYFRAME_TIMEOUT = int(os.environ.get("BMS_KEYFRAME_TIMEOUT", "120"))
+
+
+# Kolom hasil probe di video_meta (urutan = urutan INSERT)
+META_FIELDS = (
+    "duration", "bitrate", "container",
+    "video_codec", "pix_fmt", "width", "height", "fps", "rotation",
+    "audio_codec", "audio_channels",
+)
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+
+class ProbeError(Exception):
+    """ffprobe gagal membaca file."""
+
+
+class ProbeUnavailable(ProbeError):
+    """ffprobe tidak terpasang (bukan sifat file → tidak dicache)."""
+
+
+def _run(cmd, timeout):
+    try:
+        p = subprocess.run(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=timeout
+        )
+    except FileNotFoundError:
+        raise ProbeUnavailable("ffprobe tidak ditemukan")
+    except subprocess.TimeoutExpired:
+        raise ProbeError("timeout")
+
+    if p.returncode != 0:
+        err = p.stderr.decode(errors="ignore").strip()
+        raise ProbeError(err.splitlines()[-1] if err else f"exit {p.returncode}")
+
+    return p.stdout.decode(errors="ignore")
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_video(path):
+    """
+    Return dict:
+        duration, bitrate, container,
+        video_codec, pix_fmt, width, height, fps, rotation,
+        audio_codec, audio_channels
+    Raise ProbeError.
+    """
+    out = _run([
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        path
+    ], PROBE_TIMEOUT)
+
+    try:
+        data = json.loads(out)
+    except ValueError:
+        raise ProbeError("output ffprobe tidak valid")
+
+    fmt = data.get("format") or {}
+    streams = data.get("streams") or []
+
+    video = next((s for s in streams if s.get("codec_type") == "video"
+                  and not (s.get("disposition") or {}).get("attached_pic")), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), {})
+
+    rotation = _int((video.get("tags") or {}).get("rotate"))
+    for side in video.get("side_data_list") or []:
+        if side.get("rotation") is not None:
+            rotation = _int(side.get("rotation"))
+
+    fps = None
+    rate = video.get("avg_frame_rate") or video.get("r_frame_rate")
+    if rate and "/" in rate:
+        num, den = rate.split("/", 1)
+        if _float(den):
+            fps = round(_float(num) / _float(den), 3)
+
+    return {
+        "duration": _float(fmt.get("duration")) or _float(video.get("duration")),
+        "bitrate": _int(fmt.get("bit_rate")),
+        "container": fmt.get("format_name"),
+        "video_codec": video.get("codec_name"),
+        "pix_fmt": video.get("pix_fmt"),
+        "width": _int(video.get("width")),
+        "height": _int(video.get("height")),
+        "fps": fps,
+        "rotation": (rotation or 0) % 360,
+        "audio_codec": audio.get("codec_name"),
+        "audio_channels": _int(audio.get("channels")),
+    }
+
+
+def keyframe_times(path):
+    """
+    Waktu (detik) setiap keyframe stream video pertama, terurut.
+    Hanya membaca paket (flag K), tidak men-decode frame.
+    """
+    out = _run([
+        "ffprobe", "-v", "error",
+        "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0",
+        path
+    ], KEYFRAME_TIMEOUT)
+
+    times = set()
+    for line in out.splitlines():
+        parts = line.split(",")
+        if len(parts) < 2 or "K" not in parts[1]:
+            continue
+        t = _float(parts[0])
+        if t is not None:
+            times.add(round(t, 3))
+
+    return sorted(times)
+
+
+# ============================================================================
+# KATALOG video_meta
+# ============================================================================
+def ensure_video_meta(cur):
+    """
+    Tabel video_meta (dipanggil juga dari BMS_video_db.get_db()).
+    error terisi → probe gagal untuk versi file ini (tidak dicoba ulang
+    sampai size / mtime berubah).
+    """
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS video_meta (
+            path TEXT PRIMARY KEY,
+            file_size INTEGER,
+            file_mtime_ns INTEGER,
+            duration REAL,
+            bitrate INTEGER,
+            container TEXT,
+            video_codec TEXT,
+            pix_fmt TEXT,
+            width INTEGER,
+            height INTEGER,
+            fps REAL,
+            rotation INTEGER,
+            audio_codec TEXT,
+            audio_channels INTEGER,
+            error TEXT,
+            probed_at REAL
+        )
+    """)
+
+
+def get_db():
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        ensure_video_meta(conn.cursor())
+        conn.commit()
+        _table_ready = True
+
+    return conn
+
+
+def signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+def meta_row(path, sig, info=None, error=None):
+    """
+    Tuple siap INSERT untuk save_meta().
+    """
+    info = info or {}
+    return (
+        (path, sig[0], sig[1])
+        + tuple(info.get(f) for f in META_FIELDS)
+        + (error, time.time())
+    )
+
+
+def save_meta(conn, rows):
+    """
+    rows: list hasil meta_row(). Commit oleh pemanggil.
+    """
+    cols = ("path", "file_size", "file_mtime_ns") + META_FIELDS + ("error", "probed_at")
+    updates = ", ".join(f"{c}=excluded.{c}" for c in cols[1:])
+    conn.executemany(f"""
+        INSERT INTO video_meta ({", ".join(cols)})
+        VALUES ({", ".join("?" * len(cols))})
+        ON CONFLICT(path) DO UPDATE SET {updates}
+    """, rows)
+
+
+def stale_paths(paths):
+    """
+    Path yang belum punya video_meta untuk versi file saat ini.
+    """
+    conn = get_db()
+    known = {}
+    for i in range(0, len(paths), 500):
+        batch = paths[i:i + 500]
+        q = ",".join("?" * len(batch))
+        for r in conn.execute(
+            f"SELECT path, file_size, file_mtime_ns FROM video_meta WHERE path IN ({q})",
+            batch
+        ):
+            known[r["path"]] = (r["file_size"], r["file_mtime_ns"])
+
+    return [p for p in paths if known.get(p) is None or known[p] != signature(p)]
+
+
+def cached_probe(path):
+    """
+    Info video dari katalog; probe + simpan jika belum ada / file berubah.
+    Raise ProbeError (juga untuk kegagalan yang tersimpan).
+    """
+    sig = signature(path)
+    if sig is None:
+        raise ProbeError("file tidak ditemukan")
+
+    conn = get_db()
+    row = conn.execute(
+        "SELECT * FROM video_meta WHERE path=? AND file_size=? AND file_mtime_ns=?",
+        (path, sig[0], sig[1])
+    ).fetchone()
+
+    if row is not None:
+        if row["error"]:
+            raise ProbeError(row["error"])
+        return {f: row[f] for f in META_FIELDS}
+
+    try:
+        info = probe_video(path)
+    except ProbeUnavailable:
+        raise
+    except ProbeError as e:
+        save_meta(conn, [meta_row(path, sig, error=str(e))])
+        conn.commit()
+        raise
+
+    save_meta(conn, [meta_row(path, sig, info)])
+    conn.commit()
+    return info
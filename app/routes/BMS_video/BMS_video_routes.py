@@ -1,20 +1,32 @@
 # ============================================================================
 # BMS_video_routes.py — Routes untuk UI & API list/play/delete (owner-scoped)
 # - No forced login on page view (page accessible)
-# - List endpoints filtered by owner
-# - Thumbnail support (PATH-based, shared)
+# - List endpoints filtered by owner (video_library)
+# - Thumbnail support (PATH-based, shared, varian 64/256/512)
+# - HLS adaptive (/video/hls/<id>/master.m3u8) → BMS_video_hls
+# - Unduh folder / pilihan video sebagai ZIP / TAR streaming (/video/archive)
 # ============================================================================
 
 import os
 import hashlib
 from flask import (
-    Blueprint, jsonify, render_template,
-    request, Response, send_from_directory
+    Blueprint, jsonify, render_template, request, abort
 )
+from werkzeug.utils import safe_join
 
 from app.BMS_config import PICTURES_FOLDER
+from app.routes.BMS_stream import send_media
+from app.routes.BMS_image import send_image_variant
+from app.routes.BMS_playback.playback_buffer import record_play
+from app.routes.BMS_library.library_pagination import (
+    make_sorts, parse_page_args, keyset_sql, build_page
+)
+from app.routes.BMS_library.library_archive import (
+    collect as collect_archive, library_items, archive_response,
+    parse_archive_args
+)
 from .BMS_video_db import (
-    get_db, current_user_identifier, is_inside_video_folder
+    get_db, current_user_identifier, is_inside_video_folder, video_mimetype
 )
 
 # Membuat Blueprint untuk rute video dengan prefix '/video'
@@ -25,6 +37,30 @@ video_routes = Blueprint("video_routes", __name__, url_prefix="/video")
 # ============================================================================
 THUMBNAIL_FOLDER = os.path.join(PICTURES_FOLDER, "thumbnail")
 
+# Sort yang didukung list video (?sort=)
+VIDEO_SORTS = make_sorts("v")
+VIDEO_SORTS["play_count"] = ("l.play_count", int, "desc")
+VIDEO_SORTS["duration"] = ("COALESCE(m.duration, 0)", float, "desc")
+
+# Kombinasi yang umumnya bisa diputar langsung oleh browser
+DIRECT_CONTAINERS = ("mp4", "webm")
+DIRECT_VIDEO_CODECS = ("h264", "vp8", "vp9", "av1")
+DIRECT_AUDIO_CODECS = ("aac", "mp3", "opus", "vorbis")
+
+
+def can_direct_play(filepath, r):
+    """
+    True / False dari video_meta; None jika belum di-probe.
+    """
+    if not r["video_codec"]:
+        return None
+    ext = os.path.splitext(filepath)[1].lower().lstrip(".")
+    return (
+        ext in DIRECT_CONTAINERS + ("m4v",)
+        and r["video_codec"] in DIRECT_VIDEO_CODECS
+        and (r["audio_codec"] is None or r["audio_codec"] in DIRECT_AUDIO_CODECS)
+    )
+
 
 # ============================================================================
 # Helper: hitung nama thumbnail berbasis PATH video
@@ -44,15 +80,15 @@ def page_video():
 
 
 # ============================================================================
-# Serve thumbnail
+# Serve thumbnail (?w=64|256|512 → varian, ETag + cache)
 # ============================================================================
 @video_routes.route("/thumbnail/<name>")
 def serve_thumbnail(name):
-    return send_from_directory(
-        THUMBNAIL_FOLDER,
-        name,
-        as_attachment=False
-    )
+    thumb_path = safe_join(THUMBNAIL_FOLDER, name)
+    if not thumb_path or not os.path.isfile(thumb_path):
+        abort(404)
+
+    return send_image_variant(thumb_path, request.args.get("w"))
 
 
 # ============================================================================
@@ -63,15 +99,19 @@ def list_folders():
     owner = current_user_identifier()
     conn = get_db()
 
+    # 1x agregasi pustaka user (GROUP BY) lalu join ke folder
     rows = conn.execute("""
-        SELECT id, folder_name, folder_path,
-               (SELECT COUNT(*) FROM videos v
-                WHERE v.folder_id = folders.id AND v.user_id=?)
-               AS total_video
-        FROM folders
-        WHERE user_id=?
-        ORDER BY folder_name ASC
-    """, (owner, owner)).fetchall()
+        SELECT f.id, f.folder_name, f.folder_path, c.total_video
+        FROM (
+            SELECT v.folder_id, COUNT(*) AS total_video
+            FROM video_library l
+            JOIN videos v ON v.id = l.video_id
+            WHERE l.user_id=?
+            GROUP BY v.folder_id
+        ) c
+        JOIN folders f ON f.id = c.folder_id
+        ORDER BY f.folder_name ASC
+    """, (owner,)).fetchall()
 
     conn.close()
     return jsonify([dict(r) for r in rows])
@@ -83,30 +123,47 @@ def list_folders():
 @video_routes.route("/folder/<int:folder_id>/videos")
 def list_videos(folder_id):
     owner = current_user_identifier()
+
+    try:
+        page = parse_page_args(request.args, VIDEO_SORTS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    where_sql, params, order_sql, limit_sql = keyset_sql(page, "v.id")
     conn = get_db()
 
-    rows = conn.execute("""
-        SELECT id, filename, filepath, size, added_at
-        FROM videos
-        WHERE folder_id=? AND user_id=?
-        ORDER BY filename ASC
-    """, (folder_id, owner)).fetchall()
+    rows = conn.execute(f"""
+        SELECT v.id, v.filename, v.filepath, v.size, v.added_at,
+               m.duration, m.width, m.height, m.rotation,
+               m.video_codec, m.audio_codec,
+               {page["expr"]} AS sort_value
+        FROM video_library l
+        JOIN videos v ON v.id = l.video_id
+        LEFT JOIN video_meta m ON m.path = v.filepath
+        WHERE v.folder_id=? AND l.user_id=?{where_sql}
+        {order_sql}{limit_sql}
+    """, [folder_id, owner] + params).fetchall()
 
     conn.close()
 
-    videos = []
-    for r in rows:
-        thumb = get_thumbnail_name(r["filepath"])
-        videos.append({
+    def serialize(r):
+        return {
             "id": r["id"],
             "filename": r["filename"],
             "filepath": r["filepath"],
             "size": r["size"],
             "added_at": r["added_at"],
-            "thumbnail": thumb
-        })
+            "duration": r["duration"],
+            "width": r["width"],
+            "height": r["height"],
+            "rotation": r["rotation"],
+            "video_codec": r["video_codec"],
+            "audio_codec": r["audio_codec"],
+            "direct_play": can_direct_play(r["filepath"], r),
+            "thumbnail": get_thumbnail_name(r["filepath"])
+        }
 
-    return jsonify(videos)
+    return jsonify(build_page(rows, page, serialize))
 
 
 # ============================================================================
@@ -118,9 +175,10 @@ def play_video(video_id):
     conn = get_db()
 
     row = conn.execute("""
-        SELECT filepath, user_id
-        FROM videos
-        WHERE id=? AND user_id=?
+        SELECT v.filepath
+        FROM video_library l
+        JOIN videos v ON v.id = l.video_id
+        WHERE l.video_id=? AND l.user_id=?
     """, (video_id, owner)).fetchone()
 
     conn.close()
@@ -128,31 +186,65 @@ def play_video(video_id):
     if not row:
         return "Video tidak ditemukan", 404
 
-    fp = row["filepath"].split("::user::")[0]
+    fp = row["filepath"]
 
     if not os.path.exists(fp):
         return "File fisik hilang", 404
 
-    size = os.path.getsize(fp)
-    range_header = request.headers.get("Range")
+    # 1 play per sesi (seek / Range lanjutan tidak dihitung)
+    record_play(owner, "video", video_id)
+
+    return send_media(fp, video_mimetype(fp))
+
+
+# ============================================================================
+# Unduh arsip  (?videos=3,1,2 pilihan | ?folders=1,2 folder)
+# ============================================================================
+@video_routes.route("/archive", methods=["GET", "POST"])
+def video_archive():
+    owner = current_user_identifier()
+    video_ids = [int(i) for i in request.values.get("videos", "").split(",") if i.isdigit()]
+    folder_ids = [int(i) for i in request.values.get("folders", "").split(",") if i.isdigit()]
+
+    if not video_ids and not folder_ids:
+        return jsonify({"error": "videos / folders wajib diisi"}), 400
+
+    try:
+        fmt, compress = parse_archive_args(request.values)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    conn = get_db()
+    rows = []
+
+    # Batch 500 → aman dari batas variabel SQLite
+    for key, ids in (("v.id", video_ids), ("v.folder_id", folder_ids)):
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            rows += conn.execute(f"""
+                SELECT v.id, v.filename, v.filepath, v.folder_id, f.folder_name
+                FROM video_library l
+                JOIN videos v ON v.id = l.video_id
+                LEFT JOIN folders f ON f.id = v.folder_id
+                WHERE l.user_id=? AND {key} IN ({",".join("?" * len(batch))})
+                ORDER BY f.folder_name, v.filename
+            """, [owner] + batch).fetchall()
+
+    conn.close()
 
-    if not range_header:
-        return Response(open(fp, "rb").read(), mimetype="video/mp4")
+    try:
+        entries = collect_archive(library_items(rows, video_ids))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    parts = range_header.replace("bytes=", "").split("-")
-    start = int(parts[0]) if parts[0] else 0
-    end = int(parts[1]) if len(parts) > 1 and parts[1] else size - 1
-    length = end - start + 1
+    if not entries:
+        return jsonify({"error": "Video tidak ditemukan"}), 404
 
-    with open(fp, "rb") as f:
-        f.seek(start)
-        data = f.read(length)
+    name = "video"
+    if not video_ids and len(folder_ids) == 1 and rows[0]["folder_name"]:
+        name = rows[0]["folder_name"]
 
-    resp = Response(data, 206, mimetype="video/mp4")
-    resp.headers.add("Content-Range", f"bytes {start}-{end}/{size}")
-    resp.headers.add("Accept-Ranges", "bytes")
-    resp.headers.add("Content-Length", str(length))
-    return resp
+    return archive_response(entries, request.values.get("name") or name, fmt, compress)
 
 
 # ============================================================================
@@ -164,9 +256,10 @@ def video_watch(video_id):
     conn = get_db()
 
     row = conn.execute("""
-        SELECT id, filename, folder_id, filepath, user_id
-        FROM videos
-        WHERE id=? AND user_id=?
+        SELECT v.id, v.filename, v.folder_id, v.filepath
+        FROM video_library l
+        JOIN videos v ON v.id = l.video_id
+        WHERE l.video_id=? AND l.user_id=?
     """, (video_id, owner)).fetchone()
 
     conn.close()
@@ -1,19 +1,29 @@
 # ============================================================================
 # BMS_video_scan.py — Scan storage & import + AUTO THUMBNAIL
-# - Multi-user safe
+# - Scan incremental (hanya folder yang berubah)
+# - Katalog bersama (1 baris per file), akses per user lewat video_library
 # - Thumbnail berbasis PATH video (global, shared)
-# - Thumbnail dibuat saat scan (1x saja)
+# - Thumbnail dibuat saat scan (1x saja, paralel — BMS_video_thumbnail)
+# - Probe durasi / codec / resolusi (video_meta) di pass yang sama
+# - Scan & thumbnail berjalan sebagai job background (BMS_jobs)
 # ============================================================================
 
 import os
-import subprocess
 import hashlib
 from datetime import datetime
-from flask import Blueprint, jsonify, session
+from flask import Blueprint, jsonify, request, session
 
 from app.routes.BMS_logger import BMS_write_log
+from app.routes.BMS_library.library_scanner import (
+    scan_incremental, scan_paths, media_roots
+)
+from app.routes.BMS_library.library_acl import grant_all, grant_paths
+from app.routes.BMS_jobs.jobs_queue import register_handler, submit
 from app.BMS_config import PICTURES_FOLDER
 from .BMS_video_db import get_db, is_video_file, current_user_identifier
+from .BMS_video_thumbnail import (
+    make_thumbnail, generate_thumbnails_parallel, ThumbUnavailable
+)
 
 # Blueprint
 video_scan = Blueprint("video_scan", __name__, url_prefix="/video")
@@ -24,6 +34,9 @@ video_scan = Blueprint("video_scan", __name__, url_prefix="/video")
 THUMBNAIL_FOLDER = os.path.join(PICTURES_FOLDER, "thumbnail")
 os.makedirs(THUMBNAIL_FOLDER, exist_ok=True)
 
+# Batas jumlah nama file yang disimpan di result job
+MAX_NAMES = 200
+
 
 # ============================================================================
 # Helper: nama thumbnail berbasis PATH video (GLOBAL)
@@ -38,172 +51,239 @@ def get_thumbnail_name(video_path):
 
 
 # ============================================================================
-# Helper: generate thumbnail dengan ffmpeg
+# Helper: generate thumbnail (1 file) — dipertahankan untuk kompatibilitas
 # ============================================================================
 def generate_thumbnail(video_path, thumbnail_path):
     """
-    Ambil frame tengah video menggunakan ffmpeg
+    Thumbnail satu video (1x ffmpeg, lihat BMS_video_thumbnail)
     Aman: tidak mengganggu scan jika gagal
     """
     try:
-        # Ambil durasi video
-        cmd_duration = [
-            "ffprobe", "-v", "error",
-            "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1",
-            video_path
-        ]
-        duration = float(
-            subprocess.check_output(cmd_duration).decode().strip()
-        )
-        middle = duration / 2
-
-        # Generate thumbnail
-        cmd_thumb = [
-            "ffmpeg",
-            "-ss", str(middle),
-            "-i", video_path,
-            "-frames:v", "1",
-            "-q:v", "2",
-            thumbnail_path
-        ]
-
-        subprocess.run(
-            cmd_thumb,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        return True
-
-    except Exception:
+        ok, _, _ = make_thumbnail(video_path, thumbnail_path)
+    except ThumbUnavailable:
         return False
+    return ok
 
 
 # ============================================================================
-# Scan storage (Android / Termux friendly)
+# Helper: pastikan folder ada di tabel folders (katalog bersama)
 # ============================================================================
-def scan_storage_for_video():
-    ROOT = "/storage/emulated/0"
-    if not os.path.exists(ROOT):
-        ROOT = os.path.expanduser("~")
-
-    MAX_FOLDERS = 200
-    MAX_FILES = 300
-    found = []
-
-    for root, dirs, files in os.walk(ROOT):
-        if len(found) >= MAX_FOLDERS:
-            break
-
-        vids = [f for f in files if is_video_file(f)]
-        if not vids:
-            continue
-
-        found.append({
-            "folder_path": root,
-            "folder_name": os.path.basename(root) or root,
-            "files": vids[:MAX_FILES]
-        })
-
-    return found
+def _ensure_folder(cur, folder_ids, folder_path, folders_new):
+    folder_id = folder_ids.get(folder_path)
+    if folder_id is not None:
+        return folder_id
+
+    fn = os.path.basename(folder_path) or folder_path
+
+    # OR IGNORE: watcher & scan manual bisa berjalan bersamaan
+    cur.execute("""
+        INSERT OR IGNORE INTO folders (folder_name, folder_path)
+        VALUES (?,?)
+    """, (fn, folder_path))
+    if cur.rowcount:
+        folder_id = cur.lastrowid
+        folders_new.append(fn)
+    else:
+        folder_id = cur.execute(
+            "SELECT id FROM folders WHERE folder_path=?", (folder_path,)
+        ).fetchone()["id"]
+
+    folder_ids[folder_path] = folder_id
+    return folder_id
 
 
 # ============================================================================
-# Route: scan & import DB + thumbnail
+# Scan & import DB (INCREMENTAL) — dijalankan sebagai job background
 # ============================================================================
-@video_scan.route("/scan-db", methods=["POST"])
-def scan_db():
-    owner = current_user_identifier()
-    username = session.get("username", owner)
-
-    BMS_write_log(f"SCAN VIDEO oleh: {owner}", username)
-
-    folders = scan_storage_for_video()
+def run_video_scan(owner, full=False, ctx=None, paths=None, retry_failed=False):
+    """
+    Scan storage & sinkronkan katalog folders / videos (1 baris per file),
+    lalu beri owner akses ke seluruh katalog (video_library).
+    paths → hanya path itu yang diperiksa (watcher).
+    retry_failed → thumbnail yang pernah gagal (cache) dicoba lagi.
+    owner None → video baru masuk pustaka semua anggota (grant_paths).
+    Return ringkasan hasil (JSON-able).
+    """
     conn = get_db()
     cur = conn.cursor()
 
     folders_new = []
     videos_new = []
 
-    for f in folders:
-        folder_path = f["folder_path"]
-        fn = f["folder_name"]
-
-        row = cur.execute("""
-            SELECT id FROM folders
-            WHERE folder_path=? AND user_id=?
-        """, (folder_path, owner)).fetchone()
+    try:
+        if ctx:
+            ctx.update(progress=5, message="Membaca storage...")
 
-        if row:
-            folder_id = row["id"]
+        # 1 scope untuk semua user: file yang sama tidak di-scan ulang per user
+        if paths is not None:
+            result = scan_paths(conn, "video", is_video_file, paths)
         else:
-            try:
-                cur.execute("""
-                    INSERT INTO folders (folder_name, folder_path, user_id)
-                    VALUES (?,?,?)
-                """, (fn, folder_path, owner))
-                folder_id = cur.lastrowid
-                folders_new.append(fn)
-
-            except Exception:
-                row2 = cur.execute("""
-                    SELECT id FROM folders
-                    WHERE folder_path=? AND user_id=?
-                """, (folder_path, owner)).fetchone()
-                if row2:
-                    folder_id = row2["id"]
-                else:
-                    alt_path = folder_path + "::" + owner
-                    cur.execute("""
-                        INSERT INTO folders (folder_name, folder_path, user_id)
-                        VALUES (?,?,?)
-                    """, (fn, alt_path, owner))
-                    folder_id = cur.lastrowid
-                    folders_new.append(fn)
+            result = scan_incremental(
+                conn, "video", is_video_file, roots=media_roots(), full=full
+            )
+
+        if ctx:
+            ctx.check_cancel()
+            ctx.update(progress=60, message="Menyimpan ke database...")
 
         # ================================
-        # Proses file video
+        # CACHE FOLDER & VIDEO KATALOG (1 query)
         # ================================
-        for vid in f["files"]:
-            fp = os.path.join(folder_path, vid)
+        folder_ids = {
+            r["folder_path"]: r["id"]
+            for r in cur.execute("SELECT id, folder_path FROM folders")
+        }
+        existing = {
+            r["filepath"]
+            for r in cur.execute("SELECT filepath FROM videos")
+        }
 
-            exists = cur.execute("""
-                SELECT id FROM videos
-                WHERE filepath=? AND user_id=?
-            """, (fp, owner)).fetchone()
+        # ================================
+        # VIDEO BARU
+        # ================================
+        added = datetime.utcnow().isoformat()
+        new_rows = []
 
-            if exists:
+        for fp, size in result["new"]:
+            if fp in existing:
                 continue
 
-            try:
-                size = os.path.getsize(fp)
-            except:
-                size = 0
+            folder_id = _ensure_folder(
+                cur, folder_ids, os.path.dirname(fp), folders_new
+            )
+
+            vid = os.path.basename(fp)
+            new_rows.append((vid, fp, folder_id, size, added))
+            videos_new.append(vid)
 
-            added = datetime.utcnow().isoformat()
+        cur.executemany("""
+            INSERT OR IGNORE INTO videos (filename, filepath, folder_id, size, added_at)
+            VALUES (?,?,?,?,?)
+        """, new_rows)
+
+        # ================================
+        # VIDEO BERUBAH / HILANG
+        # ================================
+        cur.executemany(
+            "UPDATE videos SET size=? WHERE filepath=?",
+            [(size, fp) for fp, size in result["changed"]]
+        )
+        cur.executemany(
+            "DELETE FROM videos WHERE filepath=?",
+            [(fp,) for fp in result["removed"]]
+        )
 
+        # Folder kosong ikut dibersihkan
+        if result["removed"]:
             cur.execute("""
-                INSERT INTO videos (filename, filepath, folder_id, size, added_at, user_id)
-                VALUES (?,?,?,?,?,?)
-            """, (vid, fp, folder_id, size, added, owner))
+                DELETE FROM folders
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM videos v WHERE v.folder_id = folders.id
+                )
+            """)
 
-            videos_new.append(vid)
+        # ================================
+        # AKSES OWNER → seluruh katalog
+        # ================================
+        if owner is None:
+            granted = grant_paths(cur, "video", [r[1] for r in new_rows], added)
+        else:
+            granted = grant_all(cur, "video", owner, added)
 
-            # ================================
-            # AUTO GENERATE THUMBNAIL
-            # ================================
-            thumb_name = get_thumbnail_name(fp)
-            thumb_path = os.path.join(THUMBNAIL_FOLDER, thumb_name)
+        conn.commit()
 
-            if not os.path.exists(thumb_path):
-                generate_thumbnail(fp, thumb_path)
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+
+    # ================================
+    # AUTO THUMBNAIL + PROBE → job terpisah
+    # Video berubah ikut di-probe ulang; scan full / retry_failed =
+    # lengkapi katalog lama
+    # ================================
+    paths = [r[1] for r in new_rows] + [fp for fp, _ in result["changed"]]
+    if full or retry_failed:
+        removed = set(result["removed"])
+        paths += list(existing - removed)
+
+    thumbs_job = None
+    if paths:
+        thumbs_job = submit(
+            "video.thumbnails",
+            {"paths": list(dict.fromkeys(paths)), "retry_failed": retry_failed},
+            owner=owner
+        )
 
-    conn.commit()
-    conn.close()
+    return {
+        "folders_added": folders_new[:MAX_NAMES],
+        "videos_added": videos_new[:MAX_NAMES],
+        "total_folders_added": len(folders_new),
+        "total_videos_added": len(videos_new),
+        "videos_updated": len(result["changed"]),
+        "videos_removed": len(result["removed"]),
+        "videos_granted": granted,
+        "dirs_scanned": result["dirs_scanned"],
+        "dirs_skipped": result["dirs_skipped"],
+        "thumbnails_job": thumbs_job,
+        "message": f"{len(folders_new)} folder dan {len(videos_new)} video baru."
+    }
+
+
+def generate_thumbnails(paths, ctx=None, retry_failed=False):
+    """Thumbnail + probe video_meta secara paralel (skip yang sudah ada / up to date)."""
+    jobs = [
+        (fp, os.path.join(THUMBNAIL_FOLDER, get_thumbnail_name(fp)))
+        for fp in paths
+    ]
+    summary = generate_thumbnails_parallel(jobs, ctx=ctx, retry_failed=retry_failed)
+    summary.pop("durations", None)
+    return summary
+
+
+# ============================================================================
+# Job handler
+# ============================================================================
+@register_handler("video.scan")
+def job_video_scan(ctx, payload):
+    return run_video_scan(
+        payload["owner"], payload.get("full", False), ctx=ctx,
+        retry_failed=payload.get("retry_failed", False)
+    )
+
+
+@register_handler("video.thumbnails")
+def job_video_thumbnails(ctx, payload):
+    return generate_thumbnails(
+        payload.get("paths", []), ctx=ctx,
+        retry_failed=payload.get("retry_failed", False)
+    )
+
+
+# ============================================================================
+# Route: scan → return job_id langsung
+# ============================================================================
+@video_scan.route("/scan-db", methods=["POST"])
+def scan_db():
+    owner = current_user_identifier()
+    username = session.get("username", owner)
+    full = request.args.get("full") == "1"
+    # ?retry_failed=1 → thumbnail yang pernah gagal dibuat ulang
+    # (mis. setelah ffmpeg dipasang / diperbarui)
+    retry_failed = request.args.get("retry_failed") == "1"
+
+    BMS_write_log(f"SCAN VIDEO oleh: {owner}", username)
+
+    job_id = submit(
+        "video.scan",
+        {"owner": owner, "full": full, "retry_failed": retry_failed},
+        owner=owner
+    )
 
     return jsonify({
-        "status": "ok",
-        "folders_added": folders_new,
-        "videos_added": videos_new,
-        "message": f"{len(folders_new)} folder dan {len(videos_new)} video baru."
-    })
\ No newline at end of file
+        "status": "queued",
+        "job_id": job_id,
+        "message": "🔍 Scan video berjalan di background..."
+    }), 202
@@ -0,0 +1,334 @@
+# ============================================================================
+# BMS_video_thumbnail.py — Pipeline thumbnail video (PARALEL)
+# - 1 proses ffmpeg per video + 1 ffprobe (katalog video_meta) di pass yang sama
+# - Durasi dari probe, metadata container (MP4/MOV) atau output ffmpeg
+# - Output JPEG master 512px + varian 64/256/512 (BMS_image)
+# - Pool paralel sesuai jumlah core + timeout per file
+# - Cache kegagalan: file rusak tidak dicoba ulang selama file tidak berubah
+#   (ffmpeg tidak terpasang bukan kegagalan file → tidak dicache;
+#   retry_failed=True → cache diabaikan & dibersihkan jika berhasil)
+# ============================================================================
+
+import os
+import re
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.database.BMS_db_pool import get_connection
+from app.routes.BMS_image import safe_build_variants
+from .BMS_video_probe import (
+    probe_video, stale_paths, save_meta, meta_row, ProbeError, ProbeUnavailable
+)
+
+# Lebar thumbnail master (tinggi mengikuti rasio)
+# Varian 64/256/512 diturunkan dari sini (BMS_image)
+THUMB_WIDTH = 512
+
+# Kualitas JPEG ffmpeg (2 = terbaik, 31 = terburuk)
+THUMB_QUALITY = 5
+
+# Batas waktu ffmpeg per file (detik)
+THUMB_TIMEOUT = int(os.environ.get("BMS_THUMB_TIMEOUT", "30"))
+
+# Jumlah ffmpeg paralel (default = jumlah core)
+THUMB_WORKERS = max(1, int(os.environ.get("BMS_THUMB_WORKERS", os.cpu_count() or 2)))
+
+# Posisi frame jika durasi belum diketahui (detik)
+DEFAULT_OFFSET = 5.0
+
+# Ekstensi yang durasinya bisa dibaca dari header container (mutagen)
+MP4_FAMILY = (".mp4", ".m4v", ".mov")
+
+class ThumbUnavailable(Exception):
+    """ffmpeg tidak terpasang (bukan sifat file → tidak dicache)."""
+
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+# Penanda inisialisasi tabel
+_table_ready = False
+
+
+# ============================================================================
+# Cache kegagalan (tabel thumb_failures)
+# ============================================================================
+def _get_db():
+    global _table_ready
+    conn = get_connection()
+
+    if not _table_ready:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS thumb_failures (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                reason TEXT,
+                failed_at INTEGER
+            )
+        """)
+        # Versi lama mencache "ffmpeg tidak ditemukan" per file → buang
+        conn.execute(
+            "DELETE FROM thumb_failures WHERE reason='ffmpeg tidak ditemukan'"
+        )
+        conn.commit()
+        _table_ready = True
+
+    return conn
+
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except OSError:
+        return None
+
+
+def _load_failures(paths):
+    conn = _get_db()
+    failed = {}
+    for i in range(0, len(paths), 500):
+        batch = paths[i:i + 500]
+        q = ",".join("?" * len(batch))
+        for r in conn.execute(
+            f"SELECT path, size, mtime_ns FROM thumb_failures WHERE path IN ({q})",
+            batch
+        ):
+            failed[r["path"]] = (r["size"], r["mtime_ns"])
+    return failed
+
+
+# ============================================================================
+# Durasi dari metadata container (tanpa proses eksternal)
+# ============================================================================
+def container_duration(video_path):
+    if not video_path.lower().endswith(MP4_FAMILY):
+        return None
+    try:
+        from mutagen.mp4 import MP4
+        length = MP4(video_path).info.length
+        return float(length) if length else None
+    except Exception:
+        return None
+
+
+def _parse_duration(stderr_text):
+    m = _DURATION_RE.search(stderr_text or "")
+    if not m:
+        return None
+    h, mnt, s = m.groups()
+    return int(h) * 3600 + int(mnt) * 60 + float(s)
+
+
+# ============================================================================
+# 1 video → 1 ffmpeg
+# ============================================================================
+def _run_ffmpeg(video_path, out_path, offset):
+    cmd = [
+        "ffmpeg", "-hide_banner", "-nostdin", "-y",
+        "-threads", "1",
+        "-ss", f"{offset:.2f}",
+        "-i", video_path,
+        # 'thumbnail' memilih frame paling representatif (hindari frame hitam)
+        "-vf", f"thumbnail=30,scale={THUMB_WIDTH}:-2",
+        "-frames:v", "1",
+        "-q:v", str(THUMB_QUALITY),
+        "-f", "image2",
+        out_path
+    ]
+    p = subprocess.run(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        timeout=THUMB_TIMEOUT
+    )
+    return p.returncode, p.stderr.decode(errors="ignore")
+
+
+def make_thumbnail(video_path, thumbnail_path, duration=None):
+    """
+    Buat thumbnail satu video.
+    duration : durasi dari probe (opsional, hemat baca container)
+    Return: (ok, duration, reason)
+    Raise ThumbUnavailable jika ffmpeg tidak ada.
+    """
+    duration = duration or container_duration(video_path)
+    offset = duration / 2 if duration else DEFAULT_OFFSET
+
+    tmp = thumbnail_path + ".tmp"
+
+    try:
+        rc, err = _run_ffmpeg(video_path, tmp, offset)
+        duration = duration or _parse_duration(err)
+
+        # Video lebih pendek dari offset default → ambil dari awal
+        if not os.path.exists(tmp) and duration and offset > duration / 2:
+            rc, err = _run_ffmpeg(video_path, tmp, min(offset, duration / 2))
+
+        if rc != 0 or not os.path.exists(tmp) or os.path.getsize(tmp) == 0:
+            reason = err.strip().splitlines()[-1] if err.strip() else f"exit {rc}"
+            return False, duration, reason
+
+        os.replace(tmp, thumbnail_path)
+        safe_build_variants(thumbnail_path)
+        return True, duration, None
+
+    except subprocess.TimeoutExpired:
+        return False, duration, "timeout"
+    except FileNotFoundError:
+        raise ThumbUnavailable("ffmpeg tidak ditemukan")
+    except Exception as e:
+        return False, duration, str(e)
+    finally:
+        if os.path.exists(tmp):
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+# ============================================================================
+# 1 video → probe (opsional) + thumbnail (opsional)
+# ============================================================================
+def _process(video_path, thumbnail_path, do_probe):
+    """
+    Return (probe | None, thumb_result | None, unavailable)
+    probe = (signature, info, error); None jika tidak di-probe
+    unavailable = True jika ffmpeg tidak ada (hasil tidak dicache)
+    """
+    probe = None
+    info = None
+
+    if do_probe:
+        sig = _signature(video_path)
+        try:
+            info = probe_video(video_path)
+            probe = (sig, info, None)
+        except ProbeUnavailable:
+            pass
+        except ProbeError as e:
+            probe = (sig, None, str(e))
+
+    thumb = None
+    if thumbnail_path:
+        try:
+            thumb = make_thumbnail(
+                video_path, thumbnail_path,
+                duration=(info or {}).get("duration")
+            )
+        except ThumbUnavailable:
+            return probe, None, True
+
+    return probe, thumb, False
+
+
+# ============================================================================
+# Pool paralel
+# ============================================================================
+def generate_thumbnails_parallel(jobs, ctx=None, retry_failed=False, probe=True):
+    """
+    jobs : list (video_path, thumbnail_path)
+    ctx  : JobContext (opsional) untuk progress & cancel
+    probe: True → isi / perbarui video_meta di pass yang sama
+
+    retry_failed: True → file di cache kegagalan dicoba lagi
+    Return ringkasan: created, skipped, failed, unavailable, probed, probe_failed
+    """
+    summary = {
+        "created": 0, "skipped": 0, "failed": 0, "unavailable": 0,
+        "probed": 0, "probe_failed": 0, "durations": {}
+    }
+
+    # Probe: file baru / berubah, walau thumbnail-nya sudah ada
+    to_probe = set(stale_paths([v for v, _ in jobs])) if probe else set()
+
+    thumbs = [(v, t) for v, t in jobs if not os.path.exists(t)]
+
+    # Lewati file yang sudah pernah gagal & belum berubah
+    if thumbs and not retry_failed:
+        failed = _load_failures([v for v, _ in thumbs])
+        todo = []
+        for v, t in thumbs:
+            if v in failed and failed[v] == _signature(v):
+                summary["skipped"] += 1
+            else:
+                todo.append((v, t))
+        thumbs = todo
+
+    to_thumb = dict(thumbs)
+    work = [(v, t) for v, t in jobs if v in to_thumb or v in to_probe]
+    total = len(work)
+
+    if not work:
+        return summary
+
+    new_failures = []
+    cleared = []
+    metas = []
+    done = 0
+
+    pool = ThreadPoolExecutor(max_workers=THUMB_WORKERS, thread_name_prefix="bms-thumb")
+    try:
+        futures = {
+            pool.submit(_process, v, to_thumb.get(v), v in to_probe): v
+            for v, _ in work
+        }
+
+        for fut in as_completed(futures):
+            video = futures[fut]
+            probe, thumb, unavailable = fut.result()
+            done += 1
+
+            if unavailable:
+                summary["unavailable"] += 1
+
+            if probe is not None and probe[0]:
+                sig, info, err = probe
+                metas.append(meta_row(video, sig, info, err))
+                if err:
+                    summary["probe_failed"] += 1
+                else:
+                    summary["probed"] += 1
+                    if info.get("duration"):
+                        summary["durations"][video] = info["duration"]
+
+            if thumb is not None:
+                ok, duration, reason = thumb
+
+                if duration:
+                    summary["durations"].setdefault(video, duration)
+
+                if ok:
+                    summary["created"] += 1
+                    cleared.append((video,))
+                else:
+                    summary["failed"] += 1
+                    sig = _signature(video) or (0, 0)
+                    new_failures.append((video, sig[0], sig[1], reason, int(time.time())))
+
+            if ctx:
+                ctx.update(
+                    progress=done * 100 / max(total, 1),
+                    message=f"Thumbnail & probe {done}/{total}"
+                )
+                if ctx.is_cancelled():
+                    for f in futures:
+                        f.cancel()
+                    break
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    conn = _get_db()
+    conn.executemany("""
+        INSERT OR REPLACE INTO thumb_failures (path, size, mtime_ns, reason, failed_at)
+        VALUES (?,?,?,?,?)
+    """, new_failures)
+    conn.executemany("DELETE FROM thumb_failures WHERE path=?", cleared)
+    save_meta(conn, metas)
+    conn.commit()
+
+    if ctx:
+        ctx.check_cancel()
+
+    return summary
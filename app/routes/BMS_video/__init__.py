@@ -4,8 +4,10 @@
 
 from .BMS_video_routes import video_routes
 from .BMS_video_scan import video_scan
+from .BMS_video_hls import video_hls
 
 blueprints = [
     video_routes,
-    video_scan
+    video_scan,
+    video_hls
 ]
\ No newline at end of file
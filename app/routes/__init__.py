@@ -30,6 +30,9 @@ from app.routes.BMS_downlod.BMS_downlod_route import BMS_downlod_bp
 from app.routes.BMS_systeminfo import systeminfo
 from .BMS_terminal import terminal
 from .BMS_power import BMS_power
+from app.routes.BMS_jobs import jobs
+from app.routes.BMS_search import search
+from app.routes.BMS_playback import playback
 
 
 # =======================================================
@@ -50,6 +53,9 @@ def register_blueprints(app):
         systeminfo,
         terminal,
         BMS_power,
+        jobs,
+        search,
+        playback,
     ]
 
     # Tambahkan blueprint modular MP3 & Video
@@ -29,7 +29,7 @@ function pollProgress(taskId) {
       .then(res => res.json())
       .then(data => {
         updateProgress(`Status: ${data.status} ${data.progress || ""}`);
-        if (data.status === "finished") {
+        if (["finished", "gagal", "dibatalkan"].includes(data.status)) {
           clearInterval(timer);
         }
       });
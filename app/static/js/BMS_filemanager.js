@@ -110,4 +110,11 @@ function makeFolder() {
 
     fetch("/filemanager/mkdir", { method: "POST", body: form })
         .then(() => refreshList());
-}
\ No newline at end of file
+}
+
+// =============================
+// UNDUH FOLDER (ZIP STREAMING)
+// =============================
+function downloadArchive() {
+    window.location.href = "/filemanager/archive?path=" + encodeURIComponent(currentPath);
+}
@@ -31,6 +31,24 @@ function goHome(){
         .catch(() => location.href = "/user/home");
 }
 
+/* ==========================================================
+   TUNGGU JOB BACKGROUND (/jobs/<id>)
+========================================================== */
+async function waitJob(jobId, statusEl){
+    while (true){
+        const res = await fetch(`/jobs/${jobId}`);
+        const job = await res.json();
+
+        if (["done", "failed", "cancelled"].includes(job.status)){
+            if (job.status !== "done") throw new Error(job.error || job.status);
+            return job;
+        }
+
+        statusEl.innerHTML = `🔍 ${job.message || "Scan MP3 berjalan..."} (${Math.round(job.progress || 0)}%)`;
+        await new Promise(r => setTimeout(r, 1000));
+    }
+}
+
 /* ==========================================================
    SCAN MP3
 ========================================================== */
@@ -40,7 +58,8 @@ async function scanMP3(){
         status.innerHTML = "🔍 Scan MP3 berjalan...";
         const res = await fetch("/mp3/scan-db", { method: "POST" });
         const data = await res.json();
-        status.innerHTML = data.message || "✅ Scan selesai";
+        const job = await waitJob(data.job_id, status);
+        status.innerHTML = (job.result && job.result.message) || "✅ Scan selesai";
         showFolders();
     } catch (e){
         status.innerHTML = "❌ Scan gagal";
@@ -142,6 +161,14 @@ function openMp3Player(mp3Id){
     location.href = `/mp3/watch/${mp3Id}?folder=${currentFolderId}`;
 }
 
+/* ==========================================================
+   UNDUH FOLDER (ZIP STREAMING, MP3 → STORED)
+========================================================== */
+function downloadFolder(){
+    if (!currentFolderId) return;
+    location.href = `/mp3/archive?folders=${currentFolderId}`;
+}
+
 /* ==========================================================
    BACK BUTTON
 ========================================================== */
@@ -10,6 +10,7 @@ const prevBtn = document.getElementById("prevBtn");
 const nextBtn = document.getElementById("nextBtn");
 const shuffleBtn = document.getElementById("shuffleBtn");
 const repeatBtn = document.getElementById("repeatBtn");
+const saveBtn = document.getElementById("saveBtn");
 
 const progressBar = document.getElementById("progressBar");
 const currentTimeEl = document.getElementById("currentTime");
@@ -22,6 +23,9 @@ const coverImg = document.getElementById("coverImg");
 const nextList = document.getElementById("nextList");
 const tabNext = document.getElementById("tabNext");
 
+// Posisi resume hanya untuk audio panjang (podcast / audiobook)
+const playback = BMSPlayback.bind(audio, "track");
+
 /* ================= STATE ================= */
 let playlist = [];
 let currentIndex = 0;
@@ -116,7 +120,7 @@ function loadTrack(index) {
   artistEl.textContent = "BMS";
 
   if (track.filepath) {
-    coverImg.src = "/mp3/thumbnail/" + encodeURIComponent(track.filepath);
+    coverImg.src = "/mp3/thumbnail/" + encodeURIComponent(track.filepath) + "?w=512";
     applyAccentColor(track.filepath);
   } else {
     coverImg.src = "/static/img/default_cover.jpg";
@@ -124,6 +128,7 @@ function loadTrack(index) {
 
   coverImg.onload = updateBackgroundFromCover;
 
+  playback.start(track.id, { minDuration: 600 });
   audio.src = `/mp3/play/${track.id}`;
   audio.play().catch(() => {});
   isPlaying = true;
@@ -161,6 +166,26 @@ repeatBtn.onclick = () => {
   loadPlayerState();
 };
 
+/* ================= UNDUH PLAYLIST (ZIP STREAMING) ================= */
+// POST form → daftar id panjang tidak terpotong batas URL
+saveBtn.onclick = () => {
+  if (!playlist.length) return;
+
+  const form = document.createElement("form");
+  form.method = "POST";
+  form.action = "/mp3/archive";
+
+  const input = document.createElement("input");
+  input.type = "hidden";
+  input.name = "tracks";
+  input.value = playlist.map(t => t.id).join(",");
+  form.appendChild(input);
+
+  document.body.appendChild(form);
+  form.submit();
+  form.remove();
+};
+
 /* ================= PLAY LOGIC ================= */
 function playNext() {
   if (shuffleMode) {
@@ -0,0 +1,78 @@
+/* BMS_playback.js
+   Lapor posisi putar ke /playback/progress (resume & "lanjutkan")
+   - Tiap 15 detik selama main + saat pause / selesai / tab ditutup
+   - start(id) saat ganti item: item lama dilaporkan dulu, lalu resume
+     item baru dari posisi terakhir (jika belum selesai)
+*/
+const BMSPlayback = (() => {
+  const INTERVAL = 15000;   // ms antar laporan selama main
+  const MIN_RESUME = 10;    // detik; di bawah ini tidak di-resume
+
+  function bind(media, kind){
+    let itemId = null;
+    let lastSent = 0;
+
+    function send(ended, beacon){
+      const position = media.currentTime || 0;
+      if (!itemId || (!ended && position < 1)) return;
+
+      const body = JSON.stringify({
+        kind,
+        id: itemId,
+        position,
+        duration: Number.isFinite(media.duration) ? media.duration : null,
+        ended: !!ended
+      });
+      lastSent = Date.now();
+
+      if (beacon && navigator.sendBeacon){
+        navigator.sendBeacon('/playback/progress', body);
+        return;
+      }
+      fetch('/playback/progress', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body,
+        keepalive: true
+      }).catch(() => {});
+    }
+
+    async function resume(id, minDuration){
+      try{
+        const res = await fetch(`/playback/${kind}/${id}`);
+        if (!res.ok) return;
+        const s = await res.json();
+        if (s.completed || !(s.position >= MIN_RESUME) || id !== itemId) return;
+        if (minDuration && !(s.duration >= minDuration)) return;
+
+        const seek = () => {
+          if (id === itemId && (!media.duration || s.position < media.duration - 5)){
+            media.currentTime = s.position;
+          }
+        };
+        if (media.readyState >= 1) seek();
+        else media.addEventListener('loadedmetadata', seek, { once: true });
+      }catch(e){ /* resume opsional */ }
+    }
+
+    media.addEventListener('timeupdate', () => {
+      if (!media.paused && Date.now() - lastSent >= INTERVAL) send(false);
+    });
+    media.addEventListener('pause', () => { if (!media.ended) send(false); });
+    media.addEventListener('ended', () => send(true));
+    window.addEventListener('pagehide', () => send(false, true));
+
+    return {
+      // panggil SEBELUM media.src diganti
+      // opts.minDuration: resume hanya untuk item sepanjang ini (detik)
+      start(id, opts = {}){
+        if (itemId && itemId !== id && !media.ended) send(false);
+        itemId = id;
+        lastSent = Date.now();
+        resume(id, opts.minDuration);
+      }
+    };
+  }
+
+  return { bind };
+})();
@@ -97,52 +97,81 @@ async function uploadFile(task) {
     let retryCount = task.retries || 0;
     
     try {
-        if (!task.session_id) {
-            task.session_id = await startUploadSession(task);
-        }
-
-        const chunkSize = 1024 * 1024; // 1MB
         const file = fileMap.get(task.id);
         
         if (!file) {
             throw new Error("File tidak ditemukan di memory");
         }
 
-        let uploaded = Math.floor(task.progress * file.size / 100);
-        let chunkIndex = Math.floor(uploaded / chunkSize);
+        // Resume: server tahu persis chunk mana yang belum diterima
+        let pending = null;
+        if (task.session_id) {
+            const st = await getUploadStatus(task);
+            if (st.exists) {
+                pending = st.missing;
+            } else {
+                task.session_id = null;
+            }
+        }
 
-        for (let start = uploaded; start < file.size; start += chunkSize) {
-            // Cek pause
-            while (isPaused) {
-                await wait(1000);
-                if (isPaused && task.status !== "paused") {
-                    task.status = "paused";
-                    saveQueue();
-                    renderQueue();
+        if (!task.session_id) {
+            const started = await startUploadSession(task);
+            task.session_id = started.session_id;
+            task.parallel = started.parallel;
+            pending = null;
+        }
+
+        const chunkSize = CHUNK_SIZE;
+        const totalChunks = Math.ceil(file.size / chunkSize);
+        if (pending === null) {
+            pending = Array.from({ length: totalChunks }, (_, i) => i);
+        }
+
+        let done = totalChunks - pending.length;
+        const queue = pending.slice();
+
+        // N pengirim bersamaan, masing-masing ambil chunk berikutnya dari antrian
+        async function sender() {
+            while (queue.length) {
+                // Cek pause
+                while (isPaused) {
+                    await wait(1000);
+                    if (isPaused && task.status !== "paused") {
+                        task.status = "paused";
+                        saveQueue();
+                        renderQueue();
+                    }
                 }
-            }
 
-            const chunk = file.slice(start, Math.min(start + chunkSize, file.size));
-            
-            const success = await sendChunk(task, chunk, chunkIndex);
-            
-            if (!success) {
-                throw new Error(`Gagal mengirim chunk ${chunkIndex}`);
-            }
+                const chunkIndex = queue.shift();
+                if (chunkIndex === undefined) return;
 
-            // Update progress
-            task.progress = Math.floor(((start + chunk.size) / file.size) * 100);
-            saveQueue();
-            
-            // Update UI setiap 2 chunk atau jika progress 100%
-            if (chunkIndex % 2 === 0 || task.progress === 100) {
-                renderQueue();
-                updateMainProgress();
+                const start = chunkIndex * chunkSize;
+                const chunk = file.slice(start, Math.min(start + chunkSize, file.size));
+
+                try {
+                    await sendChunk(task, chunk, chunkIndex);
+                } catch (e) {
+                    queue.length = 0; // hentikan pengirim lain, lalu retry via status
+                    throw e;
+                }
+
+                // Update progress
+                done++;
+                task.progress = Math.floor((done / totalChunks) * 100);
+                saveQueue();
+
+                // Update UI setiap 2 chunk atau jika progress 100%
+                if (done % 2 === 0 || task.progress === 100) {
+                    renderQueue();
+                    updateMainProgress();
+                }
             }
-            
-            chunkIndex++;
         }
 
+        const parallel = Math.max(1, Math.min(task.parallel || PARALLEL_CHUNKS, queue.length));
+        await Promise.all(Array.from({ length: parallel }, sender));
+
         // Finish upload
         await finishUpload(task);
         
@@ -185,10 +214,49 @@ async function uploadFile(task) {
 /* ===============================
    UPLOAD SESSION FUNCTIONS
 ================================ */
+// Ukuran chunk: offset tulis di server = chunk_index * CHUNK_SIZE
+const CHUNK_SIZE = 1024 * 1024; // 1MB
+
+// Jumlah chunk dikirim bersamaan (server bisa menyarankan lewat "parallel")
+const PARALLEL_CHUNKS = 4;
+
+// Percobaan ulang per chunk sebelum seluruh upload di-retry
+const CHUNK_RETRIES = 3;
+
+// Tabel CRC32 (polinomial IEEE, sama dengan zlib.crc32 di server)
+const CRC_TABLE = (() => {
+    const table = new Uint32Array(256);
+    for (let n = 0; n < 256; n++) {
+        let c = n;
+        for (let k = 0; k < 8; k++) {
+            c = c & 1 ? 0xEDB88320 ^ (c >>> 1) : c >>> 1;
+        }
+        table[n] = c >>> 0;
+    }
+    return table;
+})();
+
+function crc32(bytes) {
+    let crc = 0xFFFFFFFF;
+    for (let i = 0; i < bytes.length; i++) {
+        crc = CRC_TABLE[(crc ^ bytes[i]) & 0xFF] ^ (crc >>> 8);
+    }
+    return (crc ^ 0xFFFFFFFF) >>> 0;
+}
+
+async function getUploadStatus(task) {
+    const res = await fetch(
+        `/upload/upload_chunk/status?session_id=${encodeURIComponent(task.session_id)}`
+    );
+    if (!res.ok) return { exists: false };
+    return res.json();
+}
+
 async function startUploadSession(task) {
     const form = new FormData();
     form.append("name", task.name);
     form.append("total_size", task.size);
+    form.append("chunk_size", CHUNK_SIZE);
     form.append("file_type", task.type);
 
     const res = await fetch("/upload/upload_chunk/start", {
@@ -198,28 +266,37 @@ async function startUploadSession(task) {
     
     if (!res.ok) throw new Error("Failed to start upload session");
     
-    const data = await res.json();
-    return data.session_id;
+    return res.json();
 }
 
 async function sendChunk(task, chunk, chunkIndex) {
-    const form = new FormData();
-    form.append("session_id", task.session_id);
-    form.append("chunk_index", chunkIndex);
-    form.append("chunk", chunk);
-    form.append("total_chunks", Math.ceil(task.size / (1024 * 1024)));
-
-    const res = await fetch("/upload/upload_chunk/append", {
-        method: "POST",
-        body: form
-    });
-    
-    if (!res.ok) {
-        const error = await res.text();
-        throw new Error(`Chunk append failed: ${error}`);
+    // CRC32 dihitung di browser, diverifikasi server sebelum chunk ditandai
+    const crc = crc32(new Uint8Array(await chunk.arrayBuffer()));
+
+    for (let attempt = 1; ; attempt++) {
+        const form = new FormData();
+        form.append("session_id", task.session_id);
+        form.append("chunk_index", chunkIndex);
+        form.append("crc32", crc.toString(16).padStart(8, "0"));
+        form.append("chunk", chunk);
+
+        let res = null;
+        try {
+            res = await fetch("/upload/upload_chunk/append", {
+                method: "POST",
+                body: form
+            });
+        } catch (e) { /* jaringan putus → ulangi chunk ini saja */ }
+
+        if (res && res.ok) return true;
+
+        // 404 = session hilang → biarkan uploadFile yang menangani
+        if (attempt >= CHUNK_RETRIES || (res && res.status === 404)) {
+            const error = res ? await res.text() : "network error";
+            throw new Error(`Chunk append failed: ${error}`);
+        }
+        await wait(500 * attempt);
     }
-    
-    return true;
 }
 
 async function finishUpload(task) {
@@ -232,7 +309,16 @@ async function finishUpload(task) {
         body: form
     });
     
-    if (!res.ok) throw new Error("Failed to finish upload");
+    if (!res.ok) {
+        // 409 → ada chunk hilang / gagal verifikasi; retry mengirim ulang via status
+        throw new Error(`Failed to finish upload (${res.status})`);
+    }
+
+    // Isi file sudah ada di server → salinan baru tidak disimpan
+    const data = await res.json();
+    if (data.duplicate_of) {
+        showNotification(`${task.name} sudah tersimpan: ${data.duplicate_of}`);
+    }
     
     return true;
 }
@@ -21,6 +21,24 @@ async function api(path){
 }
 
 
+/* ==========================================================
+   TUNGGU JOB BACKGROUND (/jobs/<id>)
+========================================================== */
+async function waitJob(jobId, statusEl){
+    while (true) {
+        const job = await api(`/jobs/${jobId}`);
+
+        if (["done", "failed", "cancelled"].includes(job.status)) {
+            if (job.status !== "done") throw new Error(job.error || job.status);
+            return job;
+        }
+
+        statusEl.innerHTML = `🔍 ${job.message || "Scan berjalan..."} (${Math.round(job.progress || 0)}%)`;
+        await new Promise(r => setTimeout(r, 1000));
+    }
+}
+
+
 /* ==========================================================
    SCAN DB
 ========================================================== */
@@ -31,7 +49,12 @@ async function scanDB(){
     const res = await fetch("/video/scan-db", { method: "POST" });
     const data = await res.json();
 
-    status.innerHTML = data.message;
+    try {
+        const job = await waitJob(data.job_id, status);
+        status.innerHTML = job.result.message;
+    } catch (e) {
+        status.innerHTML = "❌ Scan gagal";
+    }
     showFolders();
 }
 
@@ -76,6 +99,19 @@ async function showFolders(){
 }
 
 
+/* ==========================================================
+   FORMAT DURASI (detik → m:ss / h:mm:ss)
+========================================================== */
+function formatDuration(sec){
+    if (!sec) return "";
+    sec = Math.round(sec);
+    const h = Math.floor(sec / 3600);
+    const m = Math.floor((sec % 3600) / 60);
+    const s = String(sec % 60).padStart(2, "0");
+    return h ? `${h}:${String(m).padStart(2, "0")}:${s}` : `${m}:${s}`;
+}
+
+
 /* ==========================================================
    TAMPILKAN VIDEO DALAM FOLDER
 ========================================================== */
@@ -105,13 +141,17 @@ async function loadVideos(folder_id, folder_name){
 
         card.innerHTML = `
             <img 
-                src="/video/thumbnail/${v.thumbnail}"
+                src="/video/thumbnail/${v.thumbnail}?w=256"
                 class="thumb-video"
                 alt="thumbnail"
                 onerror="this.src='/static/img/video_default.jpg'"
             >
             <div class="title">${v.filename}</div>
-            <div class="sub">${(v.size / 1024 / 1024).toFixed(1)} MB</div>
+            <div class="sub">${[
+                formatDuration(v.duration),
+                v.height ? `${v.height}p` : "",
+                `${(v.size / 1024 / 1024).toFixed(1)} MB`
+            ].filter(Boolean).join(" · ")}</div>
         `;
 
         lib.appendChild(card);
@@ -129,6 +169,15 @@ function openVideoPlayer(video_id){
 }
 
 
+/* ==========================================================
+   UNDUH FOLDER (ZIP STREAMING, VIDEO → STORED)
+========================================================== */
+function downloadFolder(){
+    if (!currentFolderId) return;
+    window.location.href = `/video/archive?folders=${currentFolderId}`;
+}
+
+
 /* ==========================================================
    TOMBOL KEMBALI
 ========================================================== */
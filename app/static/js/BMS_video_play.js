@@ -12,6 +12,7 @@ let PLAYER = null;
 let CURRENT_VIDEO_ID = null;
 let CURRENT_FOLDER_ID = null;
 let PLAYLIST = []; // array of {id, filename, filepath, size, added_at}
+let PLAYBACK = null; // pelapor posisi resume (BMS_playback.js)
 
 // helper: get numeric id or null
 function toInt(v){ let n = parseInt(v); return Number.isFinite(n) ? n : null; }
@@ -45,11 +46,38 @@ async function resolveFolderIdFromLibrary(videoId){
   }
 }
 
+// HLS native (Safari / iOS / Android) → mkv/avi & bandwidth adaptif
+const HLS_NATIVE = !!document.createElement('video').canPlayType('application/vnd.apple.mpegurl');
+const NEEDS_HLS = /\.(mkv|avi)$/i;
+
+function hlsUrl(videoId){ return `/video/hls/${videoId}/master.m3u8`; }
+
+// direct play gagal (container / codec tidak didukung) → coba HLS sekali
+function onPlayerError(){
+  if (!HLS_NATIVE || !CURRENT_VIDEO_ID) return;
+  const url = hlsUrl(CURRENT_VIDEO_ID);
+  if (PLAYER.src.endsWith(url)) return;
+  PLAYER.src = url;
+  PLAYER.load();
+  PLAYER.play().catch(()=>{});
+}
+
 // utility: set player src and play
 function setPlayerSource(videoId){
   if (!PLAYER) PLAYER = document.getElementById('playerVideo');
+  if (!PLAYER.dataset.hlsFallback){
+    PLAYER.addEventListener('error', onPlayerError);
+    PLAYER.dataset.hlsFallback = '1';
+  }
+  if (!PLAYBACK) PLAYBACK = BMSPlayback.bind(PLAYER, 'video');
+  PLAYBACK.start(toInt(videoId));
   PLAYER.pause();
-  PLAYER.src = `/video/play/${videoId}`;
+  const entry = PLAYLIST.find(v => toInt(v.id) === toInt(videoId));
+  // direct_play dari katalog video_meta; belum di-probe → tebak dari ekstensi
+  const needsHls = entry && (entry.direct_play === false ||
+    (entry.direct_play == null && NEEDS_HLS.test(entry.filename || '')));
+  const useHls = HLS_NATIVE && needsHls;
+  PLAYER.src = useHls ? hlsUrl(videoId) : `/video/play/${videoId}`;
   PLAYER.load();
   // try play (some browsers require user gesture)
   PLAYER.play().catch(()=>{ /* ignore play errors */ });
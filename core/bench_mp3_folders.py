@@ -0,0 +1,164 @@
+# core/bench_mp3_folders.py
+# ============================================================================
+#   BENCHMARK /mp3/folders
+#   ✔ Database sementara (tidak menyentuh database/users.db)
+#   ✔ Skema & trigger asli: ensure_library + ensure_folder_stats
+#     (counter mp3_folder_stats dijaga trigger di mp3_library)
+#   ✔ Seed N track (default 100k) → bandingkan query counter dengan
+#     COUNT(*) GROUP BY lama, hasil keduanya dicek sama
+#
+#   Jalankan dari root proyek:
+#     python -m core.bench_mp3_folders --tracks 100000 --folders 500
+# ============================================================================
+
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import statistics
+
+from app.routes.BMS_library.library_acl import ensure_library
+from app.routes.BMS_mp3.BMS_mp3_db import ensure_folder_stats
+
+# Query yang dipakai route /mp3/folders (BMS_mp3_routes.list_folders)
+FOLDERS_SQL = """
+    SELECT f.id, f.folder_name, s.total AS total_mp3
+    FROM mp3_folder_stats s
+    JOIN mp3_folders f ON f.id = s.folder_id
+    WHERE s.user_id = ? AND s.total > 0
+    ORDER BY f.folder_name ASC
+"""
+
+# Versi sebelum counter: agregasi penuh per request
+LEGACY_SQL = """
+    SELECT f.id, f.folder_name, COUNT(*) AS total_mp3
+    FROM mp3_library l
+    JOIN mp3_tracks t ON t.id = l.track_id
+    JOIN mp3_folders f ON f.id = t.folder_id
+    WHERE l.user_id = ?
+    GROUP BY f.id
+    ORDER BY f.folder_name ASC
+"""
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # Pragma sama dengan BMS_db_pool
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def create_schema(conn):
+    cur = conn.cursor()
+    # Kolom katalog yang dibaca trigger / query (lihat BMS_mp3_db.get_db)
+    cur.execute("""
+        CREATE TABLE mp3_folders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            folder_name TEXT,
+            folder_path TEXT UNIQUE
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE mp3_tracks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            folder_id INTEGER,
+            filename TEXT,
+            filepath TEXT UNIQUE,
+            FOREIGN KEY(folder_id) REFERENCES mp3_folders(id) ON DELETE CASCADE
+        )
+    """)
+    cur.execute("CREATE INDEX idx_mp3_tracks_folder ON mp3_tracks(folder_id)")
+    ensure_library(cur, "track")
+    ensure_folder_stats(cur)
+
+
+def seed(conn, tracks, folders, users, seed_value):
+    """
+    Isi katalog + pustaka setiap user. Return waktu insert pustaka (detik),
+    yaitu biaya trigger counter saat scan.
+    """
+    rnd = random.Random(seed_value)
+
+    conn.execute("BEGIN")
+    conn.executemany(
+        "INSERT INTO mp3_folders (id, folder_name, folder_path) VALUES (?,?,?)",
+        [(i, f"Folder {i:05d}", f"/music/f{i}") for i in range(1, folders + 1)]
+    )
+    conn.executemany(
+        "INSERT INTO mp3_tracks (id, folder_id, filename, filepath) VALUES (?,?,?,?)",
+        (
+            (i, rnd.randint(1, folders), f"{i}.mp3", f"/music/t/{i}.mp3")
+            for i in range(1, tracks + 1)
+        )
+    )
+    conn.execute("COMMIT")
+
+    start = time.perf_counter()
+    conn.execute("BEGIN")
+    for u in range(1, users + 1):
+        conn.execute("""
+            INSERT INTO mp3_library (user_id, track_id, added_at)
+            SELECT ?, id, '' FROM mp3_tracks
+        """, (str(u),))
+    conn.execute("COMMIT")
+    elapsed = time.perf_counter() - start
+
+    conn.execute("ANALYZE")
+    return elapsed
+
+
+def timeit(conn, sql, user_id, repeat):
+    times = []
+    rows = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = conn.execute(sql, (user_id,)).fetchall()
+        times.append(time.perf_counter() - start)
+    return times, [tuple(r) for r in rows]
+
+
+def _fmt(times):
+    ms = sorted(t * 1000 for t in times)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    return f"median {statistics.median(ms):8.3f} ms   p95 {p95:8.3f} ms"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark query /mp3/folders")
+    ap.add_argument("--tracks", type=int, default=100_000)
+    ap.add_argument("--folders", type=int, default=500)
+    ap.add_argument("--users", type=int, default=1)
+    ap.add_argument("--repeat", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bms-bench-") as tmp:
+        conn = _connect(os.path.join(tmp, "bench.db"))
+        create_schema(conn)
+
+        print(f"[i] Seed {args.tracks} track, {args.folders} folder, {args.users} user...")
+        library_time = seed(conn, args.tracks, args.folders, args.users, args.seed)
+        print(f"[i] Insert pustaka + trigger counter: {library_time:.2f} s")
+
+        fast, fast_rows = timeit(conn, FOLDERS_SQL, "1", args.repeat)
+        slow, slow_rows = timeit(conn, LEGACY_SQL, "1", args.repeat)
+
+        if fast_rows != slow_rows:
+            print("[!] Hasil counter berbeda dengan COUNT(*) — trigger tidak sinkron")
+            conn.close()
+            return 1
+
+        print(f"[✓] {len(fast_rows)} folder, total {sum(r[2] for r in fast_rows)} track")
+        print(f"    counter  : {_fmt(fast)}")
+        print(f"    COUNT(*) : {_fmt(slow)}")
+        conn.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())